@@ -1,17 +1,135 @@
-from flask import Flask, render_template, request, jsonify, session
+import time
+# Start of the import phase, reported with the other startup timings
+IMPORT_START = time.perf_counter()
+from flask import Flask, Response, render_template, request, jsonify, session, g
 import sys
+import json
 import os
 import uuid
-import shutil
+import numpy as np
 sys.path.append(os.path.join(os.path.dirname(__file__), 'static/src'))
-from static.src.rnd_xyz import parse_atom_sequence, generate_random_coordinates
-from static.src.optimizer import optimize_structure
+from static.src.rnd_xyz import parse_atom_sequence, generate_random_coordinates, generate_screened_coordinates, generate_cluster_coordinates, SHAPES
+from static.src.optimizer import optimize_coordinates, optimize_batch, METHODS, BATCH_METHODS
+from static.src.read_xyz import parse_xyz, parse_xyz_frames
+from static.src.write_xyz import format_xyz
+from static.src.transport import STRUCTURE_MIMETYPE, COMPRESSIBLE, MIN_COMPRESS_SIZE, pack_frames, unpack_frames, structure_etag, encodings, compress
+from static.src.vibrations import vibrational_analysis
+# Modules with process-wide state are imported by the names the optimizer uses,
+# otherwise Python loads a second copy with its own cache and counters
+from result_cache import result_cache
+from jobs import JobManager, QueueFullError, FINISHED, FAILED, DONE
+from workspace import WorkspaceStore, WorkspaceQuotaError
+from potentials.kernels import resolve_backend, warm_up
+from potentials.gupta import parameters, warm_potentials
+from metrics import http_request_seconds, span_seconds, span, record_optimization, render, start_profile, save_profile
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+span_seconds.observe(time.perf_counter() - IMPORT_START, span='startup_import')
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
+# Optimization methods accepted by the API
+OPTIMIZATION_METHODS = METHODS
+
+# Upper limits of the budgets a request may ask for
+MAX_GENERATIONS = 1000
+MAX_HOPS = 100000
+MAX_TIME = float(os.environ.get('CLUSTERWEBLAB_MAX_TIME', 600))
+MAX_BATCH = int(os.environ.get('CLUSTERWEBLAB_MAX_BATCH', 1000))
+
+# Global searches that /optimize runs in the job pool, as they take long or start their own
+# worker pools, and the seconds a search stopped at MAX_TIME may take to return its best structure
+POOLED_METHODS = ('basinhopping', 'parallel-basinhopping', 'monte-carlo', 'genetic')
+STOP_GRACE = 30.0
+
+# Worker processes of one batch request (default: one per CPU)
+BATCH_WORKERS = int(os.environ.get('CLUSTERWEBLAB_BATCH_WORKERS', 0)) or None
+
+# Per-session workspaces, created on the first write and evicted when idle (an empty
+# CLUSTERWEBLAB_WORKSPACE_DIR keeps them in memory). New sessions see the example cluster.
+EXAMPLE_FILE = os.path.join(app.root_path, 'static', 'examples', 'pd12pt1.xyz')
+workspaces = WorkspaceStore(
+    directory=os.environ.get('CLUSTERWEBLAB_WORKSPACE_DIR', os.path.join(app.root_path, 'static', 'tmp')) or None,
+    quota_bytes=int(float(os.environ.get('CLUSTERWEBLAB_WORKSPACE_QUOTA_MB', 4)) * 2**20),
+    max_bytes=int(float(os.environ.get('CLUSTERWEBLAB_WORKSPACE_MB', 512)) * 2**20),
+    max_sessions=int(os.environ.get('CLUSTERWEBLAB_WORKSPACE_SESSIONS', 10000)),
+    ttl=float(os.environ.get('CLUSTERWEBLAB_WORKSPACE_TTL', 2 * 24 * 3600)))
+
+# Record the metrics of the optimizations run by the job workers, which live in other processes
+def record_job(job):
+    if job.status == DONE and job.result is not None:
+        record_optimization(job.result, include_spans=True)
+    span_seconds.observe(job.started - job.submitted, span='queue_wait')
+
+# Worker pool for optimization jobs, sized from the environment (default: one worker per CPU)
+jobs = JobManager(max_workers=int(os.environ.get('CLUSTERWEBLAB_JOB_WORKERS', 0)) or None,
+                  max_pending=int(os.environ.get('CLUSTERWEBLAB_JOB_QUEUE', 16)),
+                  on_finish=record_job)
+
+# Compile the optional kernel backends and check them against the NumPy reference before serving
+with span('startup_kernels'):
+    print(f"Kernel backends ready: {', '.join(f'{name} ({seconds:.2f} sec)' for name, seconds in warm_up().items())}")
+
+# Compositions whose potentials are prepared before serving: by default the example
+# cluster and every supported metal at the closed-shell (magic) icosahedron sizes.
+# CLUSTERWEBLAB_PREWARM replaces them with a comma-separated list (e.g. "Pd13,Pd12Pt1"),
+# an empty value disables the warm-up.
+MAGIC_NUMBERS = (13, 55, 147)
+METALS = tuple(dict.fromkeys(pair.split('-')[0] for pair in parameters))
+
+def prewarm_structures():
+    sequences = os.environ.get('CLUSTERWEBLAB_PREWARM')
+    if sequences is None:
+        with open(EXAMPLE_FILE, 'r') as f:
+            yield parse_xyz(f.read())
+        sequences = ','.join(f'{metal}{n}' for n in MAGIC_NUMBERS for metal in METALS)
+    for sequence in filter(None, map(str.strip, sequences.split(','))):
+        atoms = parse_atom_sequence(sequence)
+        try:
+            if not atoms:
+                raise ValueError("no atoms")
+            yield atoms, generate_cluster_coordinates(atoms, shape='icosahedral', seed=0)
+        except (KeyError, ValueError) as e:
+            print(f"Skipping potential warm-up of {sequence}: {e}")
+
+with span('startup_potentials'):
+    warmed = warm_potentials(prewarm_structures())
+print(f"Startup: imports {span_seconds.total(span='startup_import'):.2f} sec, "
+      f"kernels {span_seconds.total(span='startup_kernels'):.2f} sec, "
+      f"{warmed} potentials {span_seconds.total(span='startup_potentials'):.2f} sec")
+
+# Time every request and profile a sample of them (CLUSTERWEBLAB_PROFILE_RATE)
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = start_profile()
+
+@app.after_request
+def observe_request(response):
+    # Route patterns keep the number of series bounded (/jobs/<job_id>, not every job id)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    if g.get('profiler') is not None:
+        save_profile(g.profiler, endpoint)
+    http_request_seconds.observe(time.perf_counter() - g.request_start,
+                                 endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+# Compress JSON, text and packed structure responses with the best encoding the client
+# accepts (brotli when installed, else gzip). Streams and small bodies are sent as is.
+@app.after_request
+def compress_response(response):
+    if (response.is_streamed or response.direct_passthrough or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding is None or (response.content_length or 0) < MIN_COMPRESS_SIZE:
+        return response
+    with span('compress'):
+        response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 # API endpoint to retrieve the unique user ID stored in the session
 @app.route('/get_user_uuid', methods=['GET'])
 def get_user_uuid():
@@ -19,7 +137,7 @@ def get_user_uuid():
         return jsonify({'error': 'User not identified'}), 400
     return jsonify({'user_id': session['user_id']})
 
-# Main route that renders the home page and initializes user session with temporary workspace
+# Main route that renders the home page and initializes the user session
 @app.route('/')
 def home():
     # Generate unique user ID if not already present in session
@@ -27,27 +145,8 @@ def home():
         session['user_id'] = str(uuid.uuid4())
     user_id = session['user_id']
 
-    # Create isolated temporary directory structure for each user session
-    user_tmp_dir = os.path.join(app.root_path, 'static', 'tmp', user_id)
-    os.makedirs(user_tmp_dir, exist_ok=True)
-
-    # Initialize user workspace with default example files (pd12pt1.xyz cluster)
-    source_file = os.path.join(app.root_path, 'static', 'examples', 'pd12pt1.xyz')
-    destination_file = os.path.join(user_tmp_dir, 'input.xyz')
-
-    opt_source_file = os.path.join(app.root_path, 'static', 'examples', 'pd12pt1.xyz')
-    opt_destination_file = os.path.join(user_tmp_dir, 'opt-input.xyz')
-
-    try:
-        # Copy example files to user's workspace for immediate visualization
-        if os.path.exists(source_file):
-            with open(source_file, 'r') as src, open(destination_file, 'w') as dest:
-                dest.write(src.read())
-        if os.path.exists(opt_source_file):
-            with open(opt_source_file, 'r') as src, open(opt_destination_file, 'w') as dest:
-                dest.write(src.read())
-    except Exception as e:
-        print(f"Error copying the file: {str(e)}")
+    # Point the workspace at the example cluster; nothing is copied until the user saves a file
+    workspaces.link(user_id, 'input.xyz', EXAMPLE_FILE)
 
     return render_template('index.html')
 
@@ -66,18 +165,34 @@ def upload_xyz():
         return jsonify({'error': 'XYZ content is required'}), 400
 
     try:
-        # Save uploaded XYZ content to user's isolated temporary workspace
-        user_tmp_dir = os.path.join('static', 'tmp', user_id)
-        os.makedirs(user_tmp_dir, exist_ok=True)
-
-        input_file_path = os.path.join(user_tmp_dir, 'input.xyz')
-        with open(input_file_path, 'w') as input_file:
-            input_file.write(xyz_content)
-
-        return jsonify({'message': f"File successfully saved to {input_file_path}"})
+        # Save uploaded XYZ content to user's isolated workspace
+        location = workspaces.write(user_id, 'input.xyz', xyz_content)
+        return jsonify({'message': f"File successfully saved to {location}"})
+    except WorkspaceQuotaError as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# API endpoint returning a file of the user's workspace, e.g. the last uploaded or generated
+# structure (input.xyz), which is the example cluster until the user saves one
+@app.route('/workspace/<name>', methods=['GET'])
+def workspace_file(name):
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+
+    try:
+        content = workspaces.read(session['user_id'], name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if content is None:
+        return jsonify({'error': f"File not found: {name}"}), 404
+    response = Response(content, mimetype='chemical/x-xyz')
+    try:
+        atoms, coords = parse_xyz(content)
+    except (IndexError, ValueError):
+        return response  # Not a single structure, sent without an ETag
+    return conditional_structure(response, atoms, coords)
+
 # API endpoint to generate random molecular clusters based on user-defined atomic composition
 @app.route('/generate_cluster', methods=['POST'])
 def generate_cluster():
@@ -88,107 +203,400 @@ def generate_cluster():
 
     data = request.json
     cluster_config = data.get('cluster_config')
+    # Optional compact starting shape, the default places atoms at random in a fixed box
+    shape = data.get('shape', 'random')
 
     if not cluster_config:
         return jsonify({'error': 'Cluster configuration is required'}), 400
+    if shape != 'random' and shape not in SHAPES:
+        return jsonify({'error': f"Unknown cluster shape: {shape}"}), 400
+    try:
+        # Optional number of random candidates to pre-screen by energy
+        prescreen = int(data.get('prescreen', 0))
+        if prescreen < 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({'error': 'prescreen must be a non-negative integer'}), 400
 
     try:
         # Parse atomic sequence and generate randomized 3D coordinates for cluster
         atoms = parse_atom_sequence(cluster_config)
-        coords = generate_random_coordinates(len(atoms))
+        with span('generate'):
+            if shape != 'random':
+                coords = generate_cluster_coordinates(atoms, shape=shape)
+            elif prescreen > 1:
+                coords = generate_screened_coordinates(atoms, num_candidates=min(prescreen, 100000))[0][0]
+            else:
+                coords = generate_random_coordinates(len(atoms))
 
         # Build XYZ file format with atom count header and atomic coordinates
-        xyz_content = f"{len(atoms)}\n\n"
-        for atom, coord in zip(atoms, coords):
-            xyz_content += f"{atom} {coord[0]:.4f} {coord[1]:.4f} {coord[2]:.4f}\n"
+        with span('format'):
+            xyz_content = format_xyz(atoms, coords, precision=4)
 
-        # Save generated cluster to user's temporary workspace
-        user_tmp_dir = os.path.join('static', 'tmp', user_id)
-        os.makedirs(user_tmp_dir, exist_ok=True)
+        # Save generated cluster to user's workspace
+        with span('write'):
+            location = workspaces.write(user_id, 'input.xyz', xyz_content)
 
-        temp_file_path = os.path.join(user_tmp_dir, 'input.xyz')
-        with open(temp_file_path, 'w') as temp_file:
-            temp_file.write(xyz_content)
-
-        return jsonify({'xyz_content': xyz_content, 'file_path': temp_file_path})
+        return structure_response({'file_path': location}, 'xyz_content', atoms, coords,
+                                  xyz_content=xyz_content)
+    except WorkspaceQuotaError as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Send a structure with its metadata. Clients accepting STRUCTURE_MIMETYPE get the packed
+# structure with the metadata as JSON in the X-Structure-Info header, the others JSON with
+# the XYZ text in `field`.
+def structure_response(payload, field, atoms, coords, energy=None, xyz_content=None):
+    binary = request.accept_mimetypes.best_match(['application/json', STRUCTURE_MIMETYPE]) == STRUCTURE_MIMETYPE
+    if binary:
+        response = Response(pack_frames([(atoms, coords, energy)]), mimetype=STRUCTURE_MIMETYPE)
+        response.headers['X-Structure-Info'] = json.dumps(payload, sort_keys=True)
+    else:
+        if xyz_content is None:
+            xyz_content = format_xyz(atoms, coords, '' if energy is None else str(energy))
+        response = jsonify({field: xyz_content, **payload})
+    response.vary.add('Accept')
+    return response
+
+# Answer a GET of a structure that does not change (a finished job, a workspace file) with a
+# weak ETag of its atoms and coordinates, or 304 Not Modified when the client already holds it
+def conditional_structure(response, atoms, coords):
+    response.set_etag(structure_etag(atoms, coords, response.mimetype), weak=True)
+    return response.make_conditional(request)
+
+# Parameters of a structure request: the JSON body, or the query string when the body is
+# a packed structure
+def request_parameters():
+    return request.args.to_dict() if request.mimetype == STRUCTURE_MIMETYPE else request.json
+
+# Structure of a request: the packed body or the XYZ text in `xyz_content`
+def request_structure(data):
+    if request.mimetype != STRUCTURE_MIMETYPE:
+        return parse_xyz(data['xyz_content'])
+    frames = unpack_frames(request.get_data())
+    if len(frames) != 1:
+        raise ValueError(f"Expected one packed structure but found {len(frames)}")
+    return frames[0][0], frames[0][1]
+
+# Build the JSON response of a finished optimization
+def optimization_response(result):
+    stopped = "<br>⏹️ Stopped early, best structure so far" if result.stopped else ""
+    cached = " (cached)" if result.cached else ""
+    success_message = f"✅ Optimization executed {result.timings['total']:.4f} sec{cached}.<br>⚡️ Old energy: {result.initial_energy:.4f} eV<br>⚡️ New energy: {result.energy:.4f} eV{stopped}"
+    minima = result.info.get('minima')
+    if minima:
+        success_message += f"<br>♻️ Known minima: {minima['known']} ({minima['avoided']} minimizations avoided)"
+    stop_reason = result.info.get('stop_reason')
+    if stop_reason:
+        steps = "generations" if result.method == 'genetic' else "hops"
+        success_message += f"<br>⛰️ {result.nit} {steps}, ended by {stop_reason}"
+    return {
+        'message': success_message,
+        'initial_energy': result.initial_energy,
+        'energy': result.energy,
+        'nfev': result.nfev,
+        'nit': result.nit,
+        'timings': result.timings,
+        'backend': result.backend,
+        'cached': result.cached,
+        'minima': minima,
+        'stop_reason': stop_reason,
+    }
+
+# Read the method specific budgets of an optimization request
+def optimization_options(data, method):
+    options = {}
+    max_time = data.get('max_time')
+    if method in ('genetic', 'basinhopping') and max_time is not None:
+        options['max_time'] = float(max_time)
+        if not 0 < options['max_time'] <= MAX_TIME:
+            raise ValueError(f"max_time must be between 0 and {MAX_TIME:g} seconds")
+    if method == 'genetic':
+        generations = data.get('generations')
+        if generations is not None:
+            options['generations'] = int(generations)
+            if not 1 <= options['generations'] <= MAX_GENERATIONS:
+                raise ValueError(f"generations must be between 1 and {MAX_GENERATIONS}")
+    elif method == 'basinhopping':
+        # Basin hopping always ends within MAX_TIME, early with a smaller budget or patience
+        options.setdefault('max_time', MAX_TIME)
+        for name in ('niter', 'patience'):
+            if data.get(name) is not None:
+                options[name] = int(data[name])
+                if not 1 <= options[name] <= MAX_HOPS:
+                    raise ValueError(f"{name} must be between 1 and {MAX_HOPS}")
+        if data.get('max_nfev') is not None:
+            options['max_nfev'] = int(data['max_nfev'])
+            if options['max_nfev'] < 1:
+                raise ValueError("max_nfev must be positive")
+        for name in ('stepsize', 'temperature'):
+            if data.get(name) is not None:
+                options[name] = float(data[name])
+                if not options[name] > 0:
+                    raise ValueError(f"{name} must be positive")
+        if data.get('adaptive') is not None:
+            # A JSON boolean, or a string when the options come from the query string
+            options['adaptive'] = str(data['adaptive']).lower() not in ('false', '0')
+    return options
+
 # API endpoint to perform molecular structure optimization using specified algorithms
 @app.route('/optimize', methods=['POST'])
 def optimize():
     # Validate user session before starting optimization process
     if 'user_id' not in session:
         return jsonify({'error': 'User not identified'}), 400
-    user_id = session['user_id']
 
-    data = request.json
-    xyz_content = data.get('xyz_content')
+    data = request_parameters()
     method = data.get('method', 'L-BFGS-B')  # Default optimization method
 
-    if not xyz_content:
+    if not data.get('xyz_content') and request.mimetype != STRUCTURE_MIMETYPE:
         return jsonify({'error': 'XYZ content is required'}), 400
+    if method not in OPTIMIZATION_METHODS:
+        return jsonify({'error': f"Unknown optimization method: {method}"}), 400
+    try:
+        options = optimization_options(data, method)
+        # Optional kernel backend ("numpy", "numba" or "auto"), default CLUSTERWEBLAB_KERNEL
+        backend = resolve_backend(data['backend']) if data.get('backend') else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Optimize the structure in memory, no files are written
+        with span('parse'):
+            atoms, coords = request_structure(data)
+        if method in POOLED_METHODS:
+            # Run in the bounded job pool and stop at MAX_TIME, keeping the best structure so far
+            job = jobs.submit(optimize_coordinates, atoms, coords, method=method, options=options,
+                              backend=backend, owner=session['user_id'])
+            if not jobs.join(job, MAX_TIME):
+                jobs.cancel(job.id)
+                jobs.join(job, STOP_GRACE)
+            if job.status == FAILED:
+                return jsonify({'error': job.error}), 500
+            if job.result is None:
+                return jsonify({'error': f"Optimization did not finish within {MAX_TIME:g} seconds"}), 503
+            result = job.result
+        else:
+            result = optimize_coordinates(atoms, coords, method=method, options=options, backend=backend)
+        with span('format'):
+            return structure_response(optimization_response(result), 'optimized_xyz_content',
+                                      result.atoms, result.coords, result.energy)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Read the structures of a batch request: a multi-frame XYZ text or a list of XYZ texts
+# or {"atoms": [...], "coords": [[x, y, z], ...]} objects
+def batch_structures(data):
+    if data.get('xyz_content'):
+        structures = [(atoms, coords) for atoms, coords, _ in parse_xyz_frames(data['xyz_content'])]
+    else:
+        structures = []
+        for item in data.get('structures') or []:
+            if isinstance(item, str):
+                structures.append(parse_xyz(item))
+            else:
+                atoms, coords = list(item['atoms']), np.asarray(item['coords'], dtype=float).reshape(-1, 3)
+                if len(atoms) != len(coords):
+                    raise ValueError(f"Expected {len(atoms)} coordinates but found {len(coords)}.")
+                structures.append((atoms, coords))
+    if not structures:
+        raise ValueError('XYZ content or structures are required')
+    if len(structures) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} structures per batch")
+    return structures
+
+# API endpoint optimizing many structures in parallel, streaming one JSON line per structure
+# as soon as it is optimized, then a summary line
+@app.route('/optimize_batch', methods=['POST'])
+def optimize_batch_route():
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
 
+    data = request.json
+    method = data.get('method', 'L-BFGS-B')
+    if method not in BATCH_METHODS:
+        return jsonify({'error': f"Method not available for batches: {method}"}), 400
     try:
-        # Setup user workspace and prepare input file for optimization
-        user_tmp_dir = os.path.join('static', 'tmp', user_id)
-        os.makedirs(user_tmp_dir, exist_ok=True)
+        options = optimization_options(data, method)
+        backend = resolve_backend(data['backend']) if data.get('backend') else None
+        with span('parse'):
+            structures = batch_structures(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    def stream():
+        start = time.perf_counter()
+        failed = 0
+        for index, result, error in optimize_batch(structures, method=method, options=options,
+                                                   workers=BATCH_WORKERS, backend=backend):
+            if error is not None:
+                failed += 1
+                yield json.dumps({'index': index, 'error': error}) + '\n'
+                continue
+            yield json.dumps({
+                'index': index,
+                'optimized_xyz_content': format_xyz(result.atoms, result.coords, str(result.energy)),
+                'initial_energy': result.initial_energy,
+                'energy': result.energy,
+                'nfev': result.nfev,
+                'nit': result.nit,
+                'cached': result.cached,
+                'time': result.timings['total'],
+            }) + '\n'
+        yield json.dumps({'done': True, 'count': len(structures), 'failed': failed,
+                          'wall_time': time.perf_counter() - start}) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# API endpoint computing the vibrational frequencies to verify that a structure is a true minimum
+@app.route('/frequencies', methods=['POST'])
+def frequencies():
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
 
-        temp_file_path = os.path.join(user_tmp_dir, 'input.xyz')
+    data = request.json
+    xyz_content = data.get('xyz_content')
+    num_modes = data.get('num_modes')
 
-        if not os.path.exists(temp_file_path):
-            return jsonify({'error': f"File not found: {temp_file_path}"}), 400
+    if not xyz_content:
+        return jsonify({'error': 'XYZ content is required'}), 400
 
-        # Update input file with current XYZ content to ensure optimization
-        # uses the most recent molecular structure for re-optimization scenarios
-        with open(temp_file_path, 'w') as f:
-            f.write(xyz_content)
+    try:
+        atoms, coords = parse_xyz(xyz_content)
+        analysis = vibrational_analysis(atoms, coords, num_modes=int(num_modes) if num_modes else None)
+        return jsonify(analysis)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Execute structure optimization and capture energy changes with timing metrics
-        (energy_values, execution_time) = optimize_structure(temp_file_path, method=method)
-        old_energy, new_energy = energy_values
+# API endpoint to queue an optimization job and return its identifier immediately
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+    user_id = session['user_id']
 
-        # Move optimized structure file to user's workspace for retrieval
-        optimized_file_source = os.path.join('opt-input.xyz')
-        optimized_file_destination = os.path.join(user_tmp_dir, 'opt-input.xyz')
-        os.rename(optimized_file_source, optimized_file_destination)
+    data = request_parameters()
+    method = data.get('method', 'L-BFGS-B')
 
-        # Read optimized structure content for client response
-        with open(optimized_file_destination, 'r') as optimized_file:
-            optimized_xyz_content = optimized_file.read()
+    if not data.get('xyz_content') and request.mimetype != STRUCTURE_MIMETYPE:
+        return jsonify({'error': 'XYZ content is required'}), 400
+    if method not in OPTIMIZATION_METHODS:
+        return jsonify({'error': f"Unknown optimization method: {method}"}), 400
+    try:
+        options = optimization_options(data, method)
+        # Optional kernel backend ("numpy", "numba" or "auto"), default CLUSTERWEBLAB_KERNEL
+        backend = resolve_backend(data['backend']) if data.get('backend') else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Format success message with optimization results and performance metrics
-        success_message = f"✅ Optimization executed {execution_time:.4f} sec.<br>⚡️ Old energy: {old_energy:.4f} eV<br>⚡️ New energy: {new_energy:.4f} eV"
-        return jsonify({'optimized_xyz_content': optimized_xyz_content, 'message': success_message})
+    try:
+        atoms, coords = request_structure(data)
+        job = jobs.submit(optimize_coordinates, atoms, coords, method=method, options=options,
+                          backend=backend, owner=user_id)
+        return jsonify({'job_id': job.id, 'status': job.status}), 202
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Background maintenance function to clean up all temporary user files and directories
-def delete_all_temp_files():
-    tmp_dir = os.path.join(app.root_path, 'static', 'tmp')
-    if (os.path.exists(tmp_dir)):
-        try:
-            # Recursively remove all user directories and files in temporary storage
-            for item in os.listdir(tmp_dir):
-                item_path = os.path.join(tmp_dir, item)
-                if os.path.isdir(item_path):
-                    shutil.rmtree(item_path)  # Remove user directories
-                else:
-                    os.remove(item_path)  # Remove standalone files
-            print(f"[{datetime.now()}] All temporary files deleted successfully.")
-        except Exception as e:
-            print(f"[{datetime.now()}] Error deleting temporary files: {str(e)}")
-    else:
-        print(f"[{datetime.now()}] Temporary directory does not exist.")
+# API endpoint reporting the state and progress of an optimization job
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+    job = jobs.get(job_id, owner=session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+# API endpoint returning the optimized structure of a finished job
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+    job = jobs.get(job_id, owner=session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status not in FINISHED:
+        return jsonify({'error': 'Job has not finished yet', 'status': job.status}), 409
+    if job.status == FAILED:
+        return jsonify({'error': job.error, 'status': job.status}), 500
+    if job.result is None:
+        return jsonify({'error': 'Job was cancelled before it started', 'status': job.status}), 409
+
+    try:
+        response = structure_response({**optimization_response(job.result), 'status': job.status},
+                                      'optimized_xyz_content', job.result.atoms, job.result.coords, job.result.energy)
+        return conditional_structure(response, job.result.atoms, job.result.coords)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-# Configure automated cleanup scheduler to run weekly maintenance on Sundays at midnight
+# API endpoint to cancel a queued job or stop a running one
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+    job = jobs.get(job_id, owner=session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'cancelled': jobs.cancel(job_id), 'status': job.status})
+
+# Server-sent events stream with the energy of every iteration of a job
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'User not identified'}), 400
+    job = jobs.get(job_id, owner=session['user_id'])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream():
+        seen = 0
+        while True:
+            energies, status = jobs.wait(job, seen)
+            for energy in energies:
+                yield f"data: {json.dumps({'iteration': seen, 'energy': energy})}\n\n"
+                seen += 1
+            if status in FINISHED:
+                yield f"event: {status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            if not energies:
+                yield ": keep-alive\n\n"
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# API endpoint exposing the hit and miss counters of the optimization result cache
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# API endpoint exposing the request, optimization and span metrics in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+# Finish the incremental workspace eviction regularly, also when there is no traffic
 scheduler = BackgroundScheduler()
-scheduler.add_job(delete_all_temp_files, 'cron', day_of_week='sun', hour=0, minute=0)
-scheduler.start()
+scheduler.add_job(workspaces.sweep, 'interval', minutes=15)
+
+def start_scheduler():
+    if not scheduler.running:
+        scheduler.start()
+
+# Threads do not survive a fork, so a preloading server starts the scheduler in one of
+# its workers (CLUSTERWEBLAB_SCHEDULER=manual, see gunicorn.conf.py)
+if os.environ.get('CLUSTERWEBLAB_SCHEDULER', 'import') == 'import':
+    start_scheduler()
 
 # Register cleanup handler to ensure scheduler shuts down gracefully on application exit
 import atexit
-atexit.register(lambda: scheduler.shutdown())
+atexit.register(lambda: scheduler.running and scheduler.shutdown())
+atexit.register(jobs.shutdown)
 
 # Application entry point - start Flask development server with debug mode enabled
 if __name__ == '__main__':
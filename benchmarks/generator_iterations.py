@@ -0,0 +1,86 @@
+# Benchmark: L-BFGS-B cost of relaxing structures from the different cluster generators
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import scipy.optimize as spo
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'src'))
+from potentials.gupta import get_potential
+from rnd_xyz import SHAPES, generate_cluster_coordinates, generate_random_coordinates, parse_atom_sequence
+
+
+def relax(atoms: list[str], coords: np.ndarray) -> spo.OptimizeResult:
+    """
+    Relax a structure with the L-BFGS-B settings of the optimizer.
+    """
+    gupta = get_potential(atoms)
+
+    def potential(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(-1, 3))
+        return energy, grad.ravel()
+
+    return spo.minimize(potential, coords.ravel(), method="L-BFGS-B", jac=True,
+                        options={"gtol": 1e-8, "maxiter": 1000})
+
+
+def benchmark(atoms: list[str], samples: int, seed: int) -> dict:
+    """
+    Relax `samples` structures of every generator and summarize the cost.
+
+    Returns:
+        A dictionary with the median iterations and evaluations, the mean time, the mean
+        and lowest final energies and the number of runs hitting the iteration limit,
+        per generator (dict).
+    """
+    np.random.seed(seed)  # generate_random_coordinates uses the global generator
+    generators = {"box": lambda k: generate_random_coordinates(len(atoms))}
+    generators.update({shape: (lambda k, shape=shape: generate_cluster_coordinates(atoms, shape, seed=seed + k))
+                       for shape in SHAPES})
+
+    summary = {}
+    for name, generate in generators.items():
+        nit, nfev, times, energies, unconverged = [], [], [], [], 0
+        for k in range(samples):
+            coords = generate(k)
+            start = time.perf_counter()
+            sol = relax(atoms, coords)
+            times.append(time.perf_counter() - start)
+            nit.append(sol.nit)
+            nfev.append(sol.nfev)
+            energies.append(sol.fun)
+            unconverged += sol.nit >= 1000
+        summary[name] = {"nit": float(np.median(nit)), "nfev": float(np.median(nfev)),
+                         "time": float(np.mean(times)), "energy": float(np.mean(energies)),
+                         "best_energy": float(np.min(energies)), "unconverged": int(unconverged)}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the L-BFGS-B cost of the cluster generators.")
+    parser.add_argument("--elements", type=str, nargs=2, default=["Pd", "Pt"], metavar=("A", "B"),
+                        help="Elements of the bimetallic clusters. Default is Pd Pt.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[13, 38, 55, 147],
+                        help="Cluster sizes. Default is 13 38 55 147.")
+    parser.add_argument("--samples", type=int, default=5, help="Structures per generator and size.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--json", type=str, default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        # Three quarters of the first element, the rest of the second
+        a = size - size // 4
+        atoms = parse_atom_sequence(f"{args.elements[0]}{a}{args.elements[1]}{size - a}")
+        results[size] = benchmark(atoms, args.samples, args.seed)
+
+        print(f"\n{size} atoms ({args.elements[0]}{a}{args.elements[1]}{size - a})")
+        print(f"{'generator':<12}{'nit':>8}{'nfev':>8}{'time (s)':>10}{'energy (eV)':>14}{'best (eV)':>12}{'maxiter':>9}")
+        for name, row in results[size].items():
+            print(f"{name:<12}{row['nit']:>8.0f}{row['nfev']:>8.0f}{row['time']:>10.3f}"
+                  f"{row['energy']:>14.3f}{row['best_energy']:>12.3f}{row['unconverged']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
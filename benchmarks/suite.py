@@ -0,0 +1,324 @@
+# Benchmark suite for the Gupta potential, the optimizers, the XYZ I/O and the HTTP endpoints
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import scipy
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'static', 'src'))
+from potentials.gupta import Gupta
+from potentials.kernels import DEFAULT_BACKEND, available_backends, use_backend
+from rnd_xyz import generate_cluster_coordinates
+from read_xyz import read_xyz_file, iter_xyz_frames
+from write_xyz import format_xyz, write_xyz_file, write_xyz_frames
+from transport import compress, pack_frames, unpack_frames
+from minima import clear_databases
+from optimizer import optimize_coordinates
+
+# Benchmark groups in the order they run
+GROUPS = ("gupta", "setup", "optimizer", "xyz", "http")
+
+# Cluster sizes of the potential benchmarks
+SIZES = (13, 55, 147, 309, 561, 1000)
+QUICK_SIZES = (13, 55, 147)
+
+# Largest cluster whose full sparse Hessian is assembled
+HESSIAN_LIMIT = 309
+
+
+def mixed_atoms(n: int) -> list[str]:
+    """
+    Ternary Pd/Pt/Au composition (50/30/20 %) with the elements interleaved.
+    """
+    counts = {"Pd": n - int(0.3 * n) - int(0.2 * n), "Pt": int(0.3 * n), "Au": int(0.2 * n)}
+    atoms = [atom for atom, count in counts.items() for _ in range(count)]
+    return [atoms[k] for k in np.random.default_rng(n).permutation(n)]
+
+
+def measure(func, repeat: int = 5, min_time: float = 0.05) -> float:
+    """
+    Seconds per call of `func`, the best of `repeat` rounds.
+
+    Each round calls `func` often enough to last at least `min_time`, so fast kernels
+    are not dominated by the timer resolution.
+    """
+    start = time.perf_counter()
+    func()
+    single = time.perf_counter() - start
+    number = max(1, int(min_time / single)) if single > 0 else 1000
+    best = single
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def metric(value: float, unit: str, kind: str = "time") -> dict:
+    """
+    One result of the suite. `kind` is "time" (lower is better, relative threshold),
+    "throughput" (higher is better, relative threshold) or "energy" (lower is better,
+    absolute tolerance).
+    """
+    return {"value": float(value), "unit": unit, "kind": kind}
+
+
+def bench_gupta(sizes, repeat: int) -> dict:
+    results = {}
+    for n in sizes:
+        atoms = mixed_atoms(n)
+        coords = generate_cluster_coordinates(atoms, "sphere", seed=0)
+        v = np.random.default_rng(0).normal(size=coords.shape)
+        dense = Gupta(atoms)
+        cutoff = Gupta(atoms, cutoff=(5.5, 7.0))
+        cutoff.energy_and_forces(coords)  # Build the neighbor list
+
+        results[f"gupta.potential.N={n}"] = metric(measure(lambda: dense.potential(coords), repeat), "s")
+        # The unqualified names measure the NumPy reference, the other backends get a suffix
+        for backend in available_backends():
+            suffix = "" if backend == "numpy" else f".{backend}"
+            with use_backend(backend):
+                results[f"gupta.energy_and_forces{suffix}.N={n}"] = metric(
+                    measure(lambda: dense.energy_and_forces(coords), repeat), "s")
+                results[f"gupta.energy_and_forces_cutoff{suffix}.N={n}"] = metric(
+                    measure(lambda: cutoff.energy_and_forces(coords), repeat), "s")
+        results[f"gupta.hessian_vector_product.N={n}"] = metric(measure(lambda: dense.hessian_vector_product(coords, v), repeat), "s")
+        if n <= HESSIAN_LIMIT:
+            results[f"gupta.sparse_hessian.N={n}"] = metric(measure(lambda: dense.sparse_hessian(coords), repeat), "s")
+
+        batch = np.stack([coords + 0.01 * k for k in range(16)])
+        seconds = measure(lambda: dense.potential_batch(batch), repeat)
+        results[f"gupta.potential_batch.N={n}"] = metric(len(batch) / seconds, "structures/s", "throughput")
+    return results
+
+
+def bench_setup(sizes, repeat: int) -> dict:
+    # Construct new instances, bypassing the get_potential cache
+    return {f"setup.gupta_init.N={n}": metric(measure(lambda: Gupta(mixed_atoms(n)), repeat), "s")
+            for n in sizes}
+
+
+def bench_optimizer(quick: bool) -> dict:
+    results = {}
+    cases = [("L-BFGS-B", n, {}) for n in ((13, 38) if quick else (13, 38, 55, 147))]
+    cases += [("basinhopping", n, {"seed": 0, "niter": 25 if quick else 100}) for n in ((13,) if quick else (13, 38))]
+    for method, n, options in cases:
+        atoms = mixed_atoms(n)
+        coords = generate_cluster_coordinates(atoms, "sphere", seed=0)
+        clear_databases()
+
+        # Time at which the final energy was first reached
+        history = []
+        start = time.perf_counter()
+        result = optimize_coordinates(atoms, coords, method=method, options=options, use_cache=False,
+                                      callback=lambda energy: history.append((time.perf_counter() - start, energy)))
+        total = time.perf_counter() - start
+        solved = next((t for t, energy in history if energy <= result.energy + 1e-4), total)
+
+        name = f"optimizer.{method}.N={n}"
+        results[f"{name}.time"] = metric(total, "s")
+        results[f"{name}.time_to_solution"] = metric(solved, "s")
+        results[f"{name}.energy"] = metric(result.energy, "eV", "energy")
+        results[f"{name}.nfev"] = metric(result.nfev, "evaluations")
+    clear_databases()
+    return results
+
+
+def bench_xyz(repeat: int) -> dict:
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        atoms = mixed_atoms(1000)
+        coords = generate_cluster_coordinates(atoms, "fcc", seed=0)
+        path = os.path.join(directory, "single.xyz")
+        results["xyz.write_xyz_file.N=1000"] = metric(
+            1000 / measure(lambda: write_xyz_file(path, atoms, coords), repeat), "atoms/s", "throughput")
+        results["xyz.read_xyz_file.N=1000"] = metric(
+            1000 / measure(lambda: read_xyz_file(path), repeat), "atoms/s", "throughput")
+
+        # Trajectory of 1000 frames with 147 atoms
+        atoms = mixed_atoms(147)
+        coords = generate_cluster_coordinates(atoms, "icosahedral", seed=0)
+        frames = [(atoms, coords + 0.001 * k, f"frame {k}") for k in range(1000)]
+        path = os.path.join(directory, "trajectory.xyz")
+        seconds = measure(lambda: write_xyz_frames(path, frames), max(1, repeat // 2))
+        size = os.path.getsize(path) / 2**20
+        results["xyz.write_xyz_frames"] = metric(size / seconds, "MB/s", "throughput")
+        seconds = measure(lambda: sum(1 for _ in iter_xyz_frames(path)), max(1, repeat // 2))
+        results["xyz.iter_xyz_frames"] = metric(size / seconds, "MB/s", "throughput")
+
+        # Binary transport of the same trajectory, and its size relative to the XYZ text
+        packed_frames = [(atoms, frame, None) for atoms, frame, _ in frames]
+        packed = pack_frames(packed_frames)
+        results["xyz.pack_frames"] = metric(
+            len(frames) / measure(lambda: pack_frames(packed_frames), max(1, repeat // 2)), "frames/s", "throughput")
+        results["xyz.unpack_frames"] = metric(
+            len(frames) / measure(lambda: unpack_frames(packed), max(1, repeat // 2)), "frames/s", "throughput")
+        results["xyz.packed_size_ratio"] = metric(len(packed) / os.path.getsize(path), "ratio")
+        results["xyz.packed_gzip_size_ratio"] = metric(len(compress(packed, "gzip")) / os.path.getsize(path), "ratio")
+
+        # Text of one 1000-atom response at the precision of /generate_cluster
+        atoms = mixed_atoms(1000)
+        coords = generate_cluster_coordinates(atoms, "fcc", seed=0)
+        results["xyz.format_xyz.N=1000"] = metric(
+            1000 / measure(lambda: format_xyz(atoms, coords, precision=4), repeat), "atoms/s", "throughput")
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def bench_http(requests: int) -> dict:
+    from app import app, jobs
+    client = app.test_client()
+    client.get('/')
+    with client.session_transaction() as session:
+        user_id = session['user_id']
+
+    atoms, coords = read_xyz_file(os.path.join(ROOT, 'static', 'examples', 'pd12pt1.xyz'))
+    rng = np.random.default_rng(0)
+    endpoints = {
+        # Perturb the structure so every request misses the result cache
+        "optimize": lambda: client.post('/optimize', json={
+            'xyz_content': f"{len(atoms)}\n\n" + "".join(
+                f"{atom} {x:.6f} {y:.6f} {z:.6f}\n"
+                for atom, (x, y, z) in zip(atoms, coords + rng.normal(scale=0.01, size=coords.shape))),
+            'method': 'L-BFGS-B'}),
+        "generate_cluster": lambda: client.post('/generate_cluster', json={'cluster_config': 'Pd12Pt1'}),
+        "generate_cluster_sphere": lambda: client.post('/generate_cluster', json={'cluster_config': 'Pd40Pt15',
+                                                                                 'shape': 'sphere'}),
+    }
+
+    results = {}
+    try:
+        for name, request in endpoints.items():
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = request()
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/{name} returned {response.status_code}: {response.get_data(as_text=True)}")
+            results[f"http.{name}.p50"] = metric(np.percentile(latencies, 50), "s")
+            results[f"http.{name}.p95"] = metric(np.percentile(latencies, 95), "s")
+    finally:
+        shutil.rmtree(os.path.join(ROOT, 'static', 'tmp', user_id), ignore_errors=True)
+        jobs.shutdown()
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {"timestamp": datetime.now(timezone.utc).isoformat(), "commit": commit,
+            "python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "kernel_backend": DEFAULT_BACKEND,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+
+def run(groups, quick: bool) -> dict:
+    """
+    Run the selected benchmark groups.
+
+    Returns:
+        A dictionary with the `environment` and the flat `results` (dict).
+    """
+    repeat = 3 if quick else 5
+    sizes = QUICK_SIZES if quick else SIZES
+    benchmarks = {
+        "gupta": lambda: bench_gupta(sizes, repeat),
+        "setup": lambda: bench_setup(sizes, repeat),
+        "optimizer": lambda: bench_optimizer(quick),
+        "xyz": lambda: bench_xyz(repeat),
+        "http": lambda: bench_http(10 if quick else 30),
+    }
+    results = {}
+    for group in groups:
+        start = time.perf_counter()
+        results.update(benchmarks[group]())
+        print(f"{group}: {time.perf_counter() - start:.1f} sec", file=sys.stderr)
+    return {"environment": environment(), "results": results}
+
+
+def compare(base: dict, new: dict, threshold: float = 0.15, energy_tolerance: float = 1e-3) -> list[dict]:
+    """
+    Compare two runs of the suite.
+
+    Times and throughputs regress when they get worse by more than `threshold`
+    (relative); energies regress when they rise by more than `energy_tolerance` eV.
+
+    Returns:
+        One row per metric present in both runs with the old and new values, the
+        relative `change` and a `status` of "regression", "improvement" or "ok" (list[dict]).
+    """
+    rows = []
+    for name, old in base["results"].items():
+        if name not in new["results"]:
+            continue
+        a, b = old["value"], new["results"][name]["value"]
+        change = (b - a) / abs(a) if a else 0.0
+        if old["kind"] == "energy":
+            worse, better = b - a > energy_tolerance, a - b > energy_tolerance
+        elif old["kind"] == "throughput":
+            worse, better = change < -threshold, change > threshold
+        else:
+            worse, better = change > threshold, change < -threshold
+        status = "regression" if worse else "improvement" if better else "ok"
+        rows.append({"name": name, "old": a, "new": b, "unit": old["unit"], "change": change, "status": status})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ClusterWebLab benchmarks or compare two runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write the results as JSON.")
+    run_parser.add_argument("--output", type=str, default=None,
+                            help="Output JSON file. Default is benchmarks/results/<timestamp>.json.")
+    run_parser.add_argument("--only", type=str, nargs="+", choices=GROUPS, default=list(GROUPS),
+                            help="Benchmark groups to run. Default is all of them.")
+    run_parser.add_argument("--quick", action="store_true", help="Smaller sizes and fewer repeats.")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files.")
+    compare_parser.add_argument("base", type=str, help="Results of the reference run.")
+    compare_parser.add_argument("new", type=str, help="Results of the new run.")
+    compare_parser.add_argument("--threshold", type=float, default=0.15,
+                                help="Relative slowdown reported as a regression. Default is 0.15.")
+    compare_parser.add_argument("--energy-tolerance", type=float, default=1e-3,
+                                help="Energy increase (eV) reported as a regression. Default is 1e-3.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.only, args.quick)
+        output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                             datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        for name, result in report["results"].items():
+            print(f"{name:<50}{result['value']:>14.6g} {result['unit']}")
+        print(f"Results saved to {output}")
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare(base, new, args.threshold, args.energy_tolerance)
+        for row in rows:
+            flag = {"regression": "REGRESSION", "improvement": "improved", "ok": ""}[row["status"]]
+            print(f"{row['name']:<50}{row['old']:>12.4g}{row['new']:>12.4g} {row['unit']:<12}"
+                  f"{100 * row['change']:>+8.1f}%  {flag}")
+        regressions = sum(row["status"] == "regression" for row in rows)
+        print(f"{len(rows)} metrics compared, {regressions} regressions")
+        sys.exit(1 if regressions else 0)
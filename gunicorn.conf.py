@@ -0,0 +1,49 @@
+# Gunicorn settings: gunicorn -c gunicorn.conf.py app:app
+import fcntl
+import os
+import tempfile
+import time
+
+# Import Flask, NumPy and SciPy, compile the kernels and prepare the potentials once in
+# the master. Forked workers share these pages copy-on-write and serve warm from the start.
+preload_app = True
+
+# Jobs and workspaces are kept in the web process, so one worker with threads by default
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Threads started in the master do not survive the fork, the workspace scheduler is
+# started in one worker by post_fork instead
+os.environ.setdefault("CLUSTERWEBLAB_SCHEDULER", "manual")
+
+_started = time.perf_counter()
+
+
+def _lock_path(server):
+    # One lock per master, held by the worker that runs the scheduler
+    return os.path.join(tempfile.gettempdir(), f"clusterweblab-scheduler-{server.pid}.lock")
+
+
+def when_ready(server):
+    server.log.info("Application preloaded in %.2f sec", time.perf_counter() - _started)
+
+
+def post_fork(server, worker):
+    lock = open(_lock_path(server), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()  # Another worker runs the scheduler
+        return
+    # The lock is released when this worker exits, so its replacement takes over
+    worker.scheduler_lock = lock
+    from app import start_scheduler
+    start_scheduler()
+    server.log.info("Worker %s runs the workspace scheduler", worker.pid)
+
+
+def on_exit(server):
+    try:
+        os.remove(_lock_path(server))
+    except OSError:
+        pass
@@ -122,8 +122,8 @@ function fetchAndLoadFile(filePath, colorscheme = "Jmol") {
     viewer.render();
 }
 
-// Initialize application with default structure
-fetchAndLoadFile("/static/examples/pd12pt1.xyz");
+// Initialize application with the structure of the session (the example cluster for new sessions)
+fetchAndLoadFile("/workspace/input.xyz");
 setTimeout(() => showNotification("🔬 Welcome to ClusterWebLab - Advanced Molecular Analysis Platform", "info", 6000), 1000);
 
 /* ============================================ */
@@ -216,7 +216,10 @@ document.getElementById('generate-button').addEventListener('click', () => {
     fetch('/generate_cluster', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ cluster_config: clusterInput }),
+        body: JSON.stringify({
+            cluster_config: clusterInput,
+            shape: document.getElementById('cluster-shape').value,
+        }),
     })
     .then(response => response.json())
     .then(data => {
@@ -251,50 +254,58 @@ document.getElementById('optimize-button').addEventListener('click', () => {
     button.classList.add('loading');
     showNotification("⚙️ Optimizing molecular structure...", "info", 15000);
 
-    // Send structure for computational optimization
-    fetch('/optimize', {
+    // Queue the structure for optimization and follow the job until it finishes
+    fetch('/jobs', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ xyz_content: xyzContent, method: selectedMethod }),
     })
     .then(response => response.json())
-    .then(async (data) => {
-        setTimeout(async () => {
-            button.classList.remove('loading');
-            if (data.error) {
-                showNotification(`❌ Error: ${data.error}`, "error", 8000);
-                console.error("Error optimizing structure:", data.error);
-            } else {
-                showNotification(data.message, "success", 15000);
-                console.log(data.message);
-
-                // Load optimized structure automatically
-                try {
-                    const response = await fetch('/get_user_uuid');
-                    if (!response.ok) {
-                        throw new Error('Failed to fetch user UUID');
-                    }
-                    const userData = await response.json();
-                    const userId = userData.user_id;
-
-                    const optimizedFilePath = `/static/tmp/${userId}/opt-input.xyz`;
-                    fetchAndLoadFile(optimizedFilePath);
-                    console.log(`Optimized file loaded from ${optimizedFilePath}`);
-                } catch (error) {
-                    console.error('Error loading optimized structure:', error);
-                }
-            }
-        }, 1000);
+    .then(data => {
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        return waitForJob(data.job_id);
+    })
+    .then(data => {
+        button.classList.remove('loading');
+        if (data.error) {
+            showNotification(`❌ Error: ${data.error}`, "error", 8000);
+            console.error("Error optimizing structure:", data.error);
+        } else {
+            showNotification(data.message, "success", 15000);
+            console.log(data.message);
+
+            // Load optimized structure returned by the job
+            loadModelIntoViewer(data.optimized_xyz_content);
+        }
     })
     .catch(error => {
-        setTimeout(() => {
-            button.classList.remove('loading');
-            showNotification("❌ Error optimizing structure", "error");
-            console.error("Error:", error);
-        }, 1000);
+        button.classList.remove('loading');
+        showNotification(`❌ Error optimizing structure: ${error.message}`, "error", 8000);
+        console.error("Error:", error);
     });
 });
 
+// Poll an optimization job until it finishes and return its result
+async function waitForJob(jobId, interval = 500) {
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const status = await response.json();
+        if (status.error) {
+            return status;
+        }
+        if (['done', 'failed', 'cancelled'].includes(status.status)) {
+            const result = await fetch(`/jobs/${jobId}/result`);
+            return result.json();
+        }
+        if (status.energy !== null) {
+            console.log(`Job ${jobId}: iteration ${status.iterations}, energy ${status.energy.toFixed(4)} eV`);
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+}
+
 /* ============================================ */
 /* VISUALIZATION CONTROLS                      */
 /* ============================================ */
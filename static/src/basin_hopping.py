@@ -0,0 +1,154 @@
+# Basin hopping with adaptive step size and temperature, budgets and early stopping
+import threading
+import time
+import numpy as np
+import scipy.optimize as spo
+from potentials.gupta import get_potential
+from minima import get_database
+from typing import Callable, Optional
+
+# Probability with which the adaptive temperature accepts a typical uphill hop
+UPHILL_ACCEPTANCE = 0.3
+
+# Smallest energy decrease (eV) that counts as an improvement for `patience`
+IMPROVEMENT = 1e-6
+
+
+def adaptive_basinhopping(atoms: list[str], coords: np.ndarray, niter: int = 250, stepsize: float = 0.5,
+                          temperature: float = 1.0, adaptive: bool = True, target_acceptance: float = 0.5,
+                          interval: int = 10, max_time: Optional[float] = None,
+                          max_nfev: Optional[int] = None, patience: Optional[int] = None,
+                          seed: Optional[int] = None, cutoff: Optional[tuple[float, float]] = None,
+                          callback: Optional[Callable[[float], bool]] = None,
+                          cancel: Optional[threading.Event] = None) -> spo.OptimizeResult:
+    """
+    Basin hopping that stops on a wall-clock or evaluation budget, after `patience` hops
+    without improvement, or when cancelled, always returning the lowest minimum found.
+
+    Every hop displaces all atoms by up to `stepsize` and relaxes the result with
+    L-BFGS-B (short-circuited in known minima), then accepts it with the Metropolis
+    criterion. With `adaptive`, every `interval` hops the step size grows when more than
+    `target_acceptance` of the hops were accepted and shrinks otherwise, and the
+    temperature moves towards the value that accepts the median uphill hop of the
+    interval with probability UPHILL_ACCEPTANCE, within 0.01x to 10x of `temperature`.
+    The budgets and the cancellation are also checked inside the local minimizations,
+    so a large cluster does not overrun them by a whole relaxation.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Initial coordinates with shape (n, 3).
+        niter: Maximum number of hops.
+        stepsize: Initial maximum displacement of an atom coordinate (Å).
+        temperature: Initial Metropolis temperature (eV).
+        adaptive: Tune the step size and the temperature during the run.
+        target_acceptance: Acceptance rate of hops the step size is tuned to.
+        interval: Hops between two adaptations.
+        max_time: Optional wall-clock budget in seconds.
+        max_nfev: Optional budget of energy and gradient evaluations.
+        patience: Optional number of hops without improvement after which the search stops.
+        seed: Random seed, for reproducible runs.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+        callback: Called with the energy of every hop; returning True stops the search.
+        cancel: Optional event that stops the search once it is set.
+
+    Returns:
+        An OptimizeResult with the lowest minimum (`x`, `fun`), the number of
+        evaluations (`nfev`) and hops (`nit`), the final `stepsize` and `temperature`,
+        the `acceptance_rate`, the reason the search ended (`stop_reason`: "niter",
+        "max_time", "max_nfev", "patience" or "cancelled") and the `wall_time`.
+    """
+    rng = np.random.default_rng(seed)
+    gupta = get_potential(atoms, cutoff=cutoff)
+    minimizer = get_database(atoms, cutoff=cutoff).minimizer(atoms)
+    n = len(atoms)
+    start = time.perf_counter()
+    deadline = start + max_time if max_time is not None else None
+    nfev = 0
+    stop_reason = None
+
+    def potential(x):
+        nonlocal nfev
+        nfev += 1
+        energy, grad = gupta.energy_and_forces(x.reshape(n, 3))
+        return energy, grad.ravel()
+
+    def exhausted():
+        # Reason to stop now, checked between hops and every local iteration
+        if cancel is not None and cancel.is_set():
+            return "cancelled"
+        if deadline is not None and time.perf_counter() > deadline:
+            return "max_time"
+        if max_nfev is not None and nfev >= max_nfev:
+            return "max_nfev"
+        return None
+
+    def check(intermediate_result):
+        nonlocal stop_reason
+        stop_reason = stop_reason or exhausted()
+        if stop_reason:
+            raise StopIteration
+
+    def relax(x):
+        sol = spo.minimize(potential, x, method=minimizer, jac=True, callback=check)
+        return sol.x, float(sol.fun)
+
+    x, energy = relax(np.asarray(coords, dtype=float).ravel())
+    best_x, best_energy = x, energy
+    low, high = 0.01 * temperature, 10.0 * temperature
+    accepted = 0
+    window = [0, 0]  # Hops attempted and accepted since the last adaptation
+    uphill = []  # Energy increases of the trial minima since the last adaptation
+    since_improvement = 0
+    hop = 0
+    while stop_reason is None:
+        if hop >= niter:
+            stop_reason = "niter"
+            break
+        if patience is not None and since_improvement >= patience:
+            stop_reason = "patience"
+            break
+        stop_reason = exhausted()
+        if stop_reason:
+            break
+
+        hop += 1
+        trial_x, trial_energy = relax(x + rng.uniform(-stepsize, stepsize, x.shape))
+        delta = trial_energy - energy
+        window[0] += 1
+        if delta > 0.0:
+            uphill.append(delta)
+        # An interrupted relaxation still counts for the best structure, not for the walk
+        if stop_reason is None and (delta <= 0.0 or rng.random() < np.exp(-delta / temperature)):
+            x, energy = trial_x, trial_energy
+            accepted += 1
+            window[1] += 1
+        if trial_energy < best_energy - IMPROVEMENT:
+            since_improvement = 0
+        else:
+            since_improvement += 1
+        if trial_energy < best_energy:
+            best_x, best_energy = trial_x, trial_energy
+
+        if adaptive and hop % interval == 0:
+            # Grow the step when too many hops are accepted, shrink it otherwise
+            stepsize *= 1.0 / 0.9 if window[1] / window[0] > target_acceptance else 0.9
+            if uphill:
+                target = np.median(uphill) / -np.log(UPHILL_ACCEPTANCE)
+                temperature = float(np.clip(np.sqrt(temperature * target), low, high))
+            window, uphill = [0, 0], []
+
+        if callback is not None and callback(trial_energy):
+            stop_reason = "cancelled"
+
+    return spo.OptimizeResult(
+        x=best_x,
+        fun=best_energy,
+        nfev=nfev,
+        nit=hop,
+        stepsize=float(stepsize),
+        temperature=float(temperature),
+        acceptance_rate=accepted / hop if hop else 0.0,
+        stop_reason=stop_reason,
+        wall_time=time.perf_counter() - start,
+        success=True,
+        message=f"Basin hopping stopped: {stop_reason}")
@@ -0,0 +1,293 @@
+# Genetic algorithm global optimization with Deaven-Ho cut-and-splice crossover
+import multiprocessing
+import threading
+import time
+import numpy as np
+import scipy.optimize as spo
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from potentials.gupta import get_potential
+from potentials.kernels import active_backend, use_backend
+from rnd_xyz import generate_screened_coordinates
+from minima import MinimaDatabase, get_database
+from jobs import worker_share
+from typing import Callable, Optional
+
+# Seconds between two checks of the budget while the offspring are relaxed
+POLL_INTERVAL = 0.1
+
+# Set in the worker processes to interrupt their relaxations, see _init_relax
+_stop = None
+
+
+def _init_relax(stop) -> None:
+    global _stop
+    _stop = stop
+
+
+def _relax(atoms: list[str], coords: np.ndarray, cutoff: Optional[tuple[float, float]],
+           backend: str) -> tuple:
+    """
+    Relax a batch of structures with L-BFGS-B (executed in a worker process) using the
+    kernel backend of the parent, single-threaded. Once the stop event of the pool is
+    set, the running relaxation is abandoned and the rest of the batch skipped.
+
+    Returns:
+        The coordinates of the completed relaxations with shape (b, n, 3), their
+        energies and the total number of evaluations.
+    """
+    gupta = get_potential(atoms, cutoff=cutoff)
+
+    def potential(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(-1, 3))
+        return energy, grad.ravel()
+
+    def check(intermediate_result):
+        if _stop is not None and _stop.is_set():
+            raise StopIteration
+
+    relaxed, energies = [], []
+    nfev = 0
+    with use_backend(backend, parallel=False):
+        for x in coords:
+            sol = spo.minimize(potential, x.ravel(), method="L-BFGS-B", jac=True, callback=check,
+                               options={"gtol": 1e-6, "maxiter": 1000})
+            nfev += int(sol.nfev)
+            if _stop is not None and _stop.is_set():
+                break
+            relaxed.append(sol.x.reshape(-1, 3))
+            energies.append(sol.fun)
+    return np.array(relaxed).reshape(-1, *coords.shape[1:]), np.array(energies, dtype=float), nfev
+
+
+def _random_rotation(rng: np.random.Generator) -> np.ndarray:
+    # QR decomposition of a Gaussian matrix gives a uniformly distributed rotation
+    q, r = np.linalg.qr(rng.normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    return q if np.linalg.det(q) > 0 else -q
+
+
+def cut_and_splice(atoms: list[str], parent_a: np.ndarray, parent_b: np.ndarray,
+                   rng: np.random.Generator) -> np.ndarray:
+    """
+    Deaven-Ho crossover: join the upper part of one randomly rotated parent with the
+    lower part of the other.
+
+    Both parents are centred and rotated randomly. For every element the child takes
+    the atoms of parent A above a random horizontal plane and fills up with the
+    lowest atoms of that element in parent B, so the composition is preserved.
+
+    Args:
+        atoms: List of atomic symbols.
+        parent_a, parent_b: Coordinates of the parents with shape (n, 3).
+        rng: Random number generator.
+
+    Returns:
+        The coordinates of the child with shape (n, 3) (np.ndarray).
+    """
+    a = (parent_a - parent_a.mean(axis=0)) @ _random_rotation(rng).T
+    b = (parent_b - parent_b.mean(axis=0)) @ _random_rotation(rng).T
+    plane = rng.uniform(*np.percentile(a[:, 2], [25, 75]))
+
+    child = np.empty_like(a)
+    symbols = np.array(atoms)
+    for element in np.unique(symbols):
+        index = np.flatnonzero(symbols == element)
+        upper = index[np.argsort(-a[index, 2])]
+        lower = index[np.argsort(b[index, 2])]
+        k = int(np.sum(a[index, 2] > plane))
+        child[index] = np.concatenate([a[upper[:k]], b[lower[:len(index) - k]]])
+    return child
+
+
+def mutate(atoms: list[str], coords: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Apply one random mutation: rattle a few atoms, twist the upper half around the
+    vertical axis or, for several elements, exchange two unlike atoms.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Coordinates with shape (n, 3).
+        rng: Random number generator.
+
+    Returns:
+        The mutated coordinates with shape (n, 3) (np.ndarray).
+    """
+    coords = coords - coords.mean(axis=0)
+    symbols = np.array(atoms)
+    kinds = ["rattle", "twist"] + (["swap"] if len(set(atoms)) > 1 else [])
+    kind = kinds[rng.integers(len(kinds))]
+    if kind == "rattle":
+        chosen = rng.random(len(coords)) < 0.2
+        coords[chosen] += rng.normal(scale=0.5, size=(int(chosen.sum()), 3))
+    elif kind == "twist":
+        coords = coords @ _random_rotation(rng).T
+        angle = rng.uniform(0.0, 2.0 * np.pi)
+        c, s = np.cos(angle), np.sin(angle)
+        upper = coords[:, 2] > 0.0
+        coords[upper] = coords[upper] @ np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]]).T
+    else:
+        i = int(rng.integers(len(coords)))
+        others = np.flatnonzero(symbols != symbols[i])
+        j = int(others[rng.integers(len(others))])
+        coords[[i, j]] = coords[[j, i]]
+    return coords
+
+
+def genetic_algorithm(atoms: list[str], coords: np.ndarray, population: int = 20,
+                      generations: int = 50, offspring: Optional[int] = None,
+                      mutation_rate: float = 0.2, max_time: Optional[float] = None,
+                      workers: Optional[int] = None, seed: Optional[int] = None,
+                      cutoff: Optional[tuple[float, float]] = None,
+                      callback: Optional[Callable[[float], bool]] = None,
+                      cancel: Optional[threading.Event] = None) -> spo.OptimizeResult:
+    """
+    Global optimization with a genetic algorithm using cut-and-splice crossover.
+
+    The population is seeded with the input structure and the lowest of many random
+    structures from `generate_random_coordinates`, screened with one bulk energy
+    evaluation. Every generation twice the needed offspring are bred from parents
+    chosen by exponential energy fitness, evaluated in bulk, and the better half is
+    relaxed in parallel worker processes. Relaxed offspring that match a structure
+    seen before (same energy and fingerprint) are discarded to keep the population
+    diverse, and the lowest `population` distinct structures survive.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Initial coordinates with shape (n, 3).
+        population: Number of structures in the population.
+        generations: Maximum number of generations.
+        offspring: Offspring relaxed per generation. Default is half the population.
+        mutation_rate: Probability that an offspring is also mutated.
+        max_time: Optional wall-clock budget in seconds, also checked while the offspring
+                  are relaxed; relaxations still running at the deadline are abandoned.
+        workers: Number of worker processes. Default is the CPU count, divided among the
+                 jobs running at once inside a job worker.
+        seed: Random seed of the initial population, the crossover and the mutations.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+        callback: Called with the best energy after every generation; returning True
+                  stops the search and keeps the best structure found so far.
+        cancel: Optional event that stops the search once it is set, also during the
+                relaxations.
+
+    Returns:
+        An OptimizeResult with the best structure (`x`, `fun`), the total `nfev`, the
+        number of generations (`nit`), the final `population_energies`, the number of
+        `duplicates` discarded, the `wall_time` and the reason the search ended
+        (`stop_reason`: "generations", "max_time" or "cancelled").
+    """
+    rng = np.random.default_rng(seed)
+    gupta = get_potential(atoms, cutoff=cutoff)
+    workers = workers or worker_share()
+    population = max(2, population)
+    offspring = offspring or max(1, population // 2)
+    n = len(atoms)
+
+    # Seed with the input and the best of many random structures, all screened in bulk
+    random_coords = generate_screened_coordinates(atoms, num_candidates=4 * population,
+                                                  keep=population - 1, rng=rng)[0]
+    candidates = np.concatenate([np.asarray(coords, dtype=float).reshape(1, n, 3), random_coords])
+
+    # Structures seen during this run, used to reject duplicates
+    seen = MinimaDatabase()
+    duplicates = 0
+    nfev = 0
+
+    start = time.perf_counter()
+    deadline = start + max_time if max_time is not None else None
+    stop = multiprocessing.Event()
+    stop_reason = "generations"
+
+    def exhausted():
+        if cancel is not None and cancel.is_set():
+            return "cancelled"
+        if deadline is not None and time.perf_counter() > deadline:
+            return "max_time"
+        return None
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_relax, initargs=(stop,)) as executor:
+
+        def relax(batch):
+            # One task per structure, so the budget is checked as every result comes in
+            nonlocal nfev, stop_reason
+            futures = [executor.submit(_relax, atoms, batch[k:k + 1], cutoff, active_backend())
+                       for k in range(len(batch))]
+            pending = futures
+            while pending:
+                pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED).not_done
+                reason = exhausted()
+                if reason and not stop.is_set():
+                    # Interrupt the running relaxations and drop the queued ones
+                    stop_reason = reason
+                    stop.set()
+                    for future in pending:
+                        future.cancel()
+            results = [future.result() for future in futures if not future.cancelled()]
+            nfev += sum(result[2] for result in results)
+            return (np.concatenate([np.empty((0, n, 3))] + [result[0] for result in results]),
+                    np.concatenate([np.empty(0)] + [result[1] for result in results]))
+
+        def distinct(batch, energies):
+            nonlocal duplicates
+            added = [seen.add(atoms, batch[k], energies[k]) for k in range(len(batch))]
+            keep = [k for k, (_, new) in enumerate(added) if new]
+            duplicates += sum(index >= 0 and not new for index, new in added)
+            return batch[keep], energies[keep]
+
+        pool, energies = distinct(*relax(candidates))
+        if not len(pool):
+            # Stopped before any relaxation finished, keep the input structure
+            pool = np.asarray(coords, dtype=float).reshape(1, n, 3)
+            energies = np.array([gupta.energy_and_forces(pool[0])[0]])
+        generation = 0
+        while generation < generations and not stop.is_set():
+            generation += 1
+            # Exponential fitness of the normalized energies
+            spread = energies.max() - energies.min()
+            fitness = np.exp(-3.0 * (energies - energies.min()) / spread) if spread > 0 else np.ones(len(energies))
+            probability = fitness / fitness.sum()
+
+            children = []
+            for _ in range(2 * offspring):
+                if len(pool) > 1:
+                    i, j = rng.choice(len(pool), size=2, replace=False, p=probability)
+                    child = cut_and_splice(atoms, pool[i], pool[j], rng)
+                else:
+                    child = pool[0].copy()
+                if len(pool) == 1 or rng.random() < mutation_rate:
+                    child = mutate(atoms, child, rng)
+                children.append(child)
+
+            # Relax only the better half of the offspring, judged by one bulk evaluation
+            children = np.array(children)
+            order = np.argsort(gupta.potential_batch(children))[:offspring]
+            children, child_energies = distinct(*relax(children[order]))
+
+            # The lowest distinct structures survive
+            pool = np.concatenate([pool, children])
+            energies = np.concatenate([energies, child_energies])
+            survivors = np.argsort(energies)[:population]
+            pool, energies = pool[survivors], energies[survivors]
+
+            if stop.is_set():
+                break
+            if callback is not None and callback(float(energies[0])):
+                stop_reason = "cancelled"
+                break
+            if reason := exhausted():
+                stop_reason = reason
+                break
+    wall_time = time.perf_counter() - start
+
+    # Share the minima found with the other global methods
+    get_database(atoms, cutoff=cutoff).merge(seen.export())
+    return spo.OptimizeResult(
+        x=pool[0].ravel(),
+        fun=float(energies[0]),
+        nfev=nfev,
+        nit=generation,
+        population_energies=energies.tolist(),
+        duplicates=duplicates,
+        wall_time=wall_time,
+        stop_reason=stop_reason,
+        success=True,
+        message="Genetic algorithm finished")
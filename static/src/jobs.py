@@ -0,0 +1,339 @@
+# Background job queue that runs optimizations in a pool of worker processes
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+try:
+    import numba
+except ImportError:  # Numba is optional, see potentials.kernels
+    numba = None
+
+# Job states; the last three are final
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Channels shared with the worker processes, set by _init_worker
+_progress = None
+_cancelled = None
+
+# Number of jobs that run at once in the pool of this process, 1 outside a job pool
+_pool_size = 1
+
+# Seconds between two checks of a running job for a cancellation
+CANCEL_POLL = 0.2
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+class Job:
+    '''State of one submitted job as seen by the web process.
+
+    Args:
+        owner: (str | None) Identifier of the user who submitted the job.
+        meta: (dict | None) Extra data kept with the job by the caller.
+    '''
+
+    def __init__(self, owner: Optional[str] = None, meta: Optional[dict] = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.energies: list[float] = []
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future = None
+
+
+    def to_dict(self) -> dict:
+        """
+        Summarize the job for the status endpoint.
+
+        Returns:
+            A JSON serializable dictionary (dict).
+        """
+        now = time.time()
+        started = self.started or (self.finished if self.status in FINISHED else None)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "iterations": len(self.energies),
+            "energy": self.energies[-1] if self.energies else None,
+            "best_energy": min(self.energies) if self.energies else None,
+            "queue_time": (started or now) - self.submitted,
+            "run_time": ((self.finished or now) - self.started) if self.started else 0.0,
+            "error": self.error,
+        }
+
+
+def _init_worker(progress, cancelled, pool_size: int = 1) -> None:
+    global _progress, _cancelled, _pool_size
+    _progress, _cancelled, _pool_size = progress, cancelled, pool_size
+    if numba is not None:
+        # Parallel kernels of concurrent jobs share the CPUs instead of each using all of them
+        numba.set_num_threads(min(worker_share(), numba.config.NUMBA_NUM_THREADS))
+
+
+def worker_share() -> int:
+    """
+    Default size of a process pool started inside this process (parallel walkers,
+    genetic algorithm workers): the CPUs divided among the jobs that run at once, so
+    nested pools do not oversubscribe the machine.
+
+    Returns:
+        The number of worker processes, at least 1 (int).
+    """
+    return max(1, (os.cpu_count() or 1) // _pool_size)
+
+
+def _run_job(job_id: str, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """
+    Worker side of a job: run `func` with a callback that streams the energies back
+    to the web process and stops the optimization once the job is cancelled. The
+    `cancel` event passed to `func` is also set on a cancellation, so long phases
+    without iterations (e.g. a round of parallel walkers) can stop early.
+    """
+    _progress.put((job_id, RUNNING, None))
+    buffer = []
+    last_flush = 0.0
+    cancel = threading.Event()
+
+    def watch() -> None:
+        while not cancel.wait(CANCEL_POLL):
+            if job_id in _cancelled:
+                cancel.set()
+
+    def callback(energy: float) -> bool:
+        nonlocal last_flush
+        buffer.append(float(energy))
+        # Batch the messages so fast iterations do not flood the queue
+        now = time.monotonic()
+        if now - last_flush < 0.1:
+            return False
+        last_flush = now
+        _progress.put((job_id, "energies", buffer[:]))
+        buffer.clear()
+        return job_id in _cancelled
+
+    threading.Thread(target=watch, name="job-cancel", daemon=True).start()
+    try:
+        return func(*args, callback=callback, cancel=cancel, **kwargs)
+    finally:
+        cancel.set()  # Also ends the watcher
+        if buffer:
+            _progress.put((job_id, "energies", buffer))
+
+
+class JobManager:
+    '''Bounded queue of optimization jobs executed by a local process pool.
+
+    The pool is created lazily on the first submission, so importing the web
+    application does not fork any process. Job state lives in this process:
+    deploy a single web process (with threads) in front of the pool.
+
+    Args:
+        max_workers: (int | None) Number of worker processes. Default is the CPU count.
+        max_pending: (int) Jobs allowed to wait for a free worker before submissions
+            are rejected with QueueFullError.
+        max_finished: (int) Finished jobs kept for the result endpoints.
+        on_finish: (Callable[[Job], None] | None) Called in this process with every
+            job that reaches a final state, e.g. to record metrics.
+
+    Example:
+        jobs = JobManager(max_workers=4)
+        job = jobs.submit(optimize_structure, "input.xyz", method="basinhopping")
+        jobs.get(job.id).to_dict()
+        jobs.cancel(job.id)
+    '''
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 16,
+                 max_finished: int = 256, on_finish: Optional[Callable[[Job], None]] = None) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.on_finish = on_finish
+        self._jobs: dict[str, Job] = {}
+        self._condition = threading.Condition()
+        self._executor = None
+        self._manager = None
+
+
+    def _start(self) -> None:
+        # Called with the condition held
+        if self._executor is not None:
+            return
+        self._manager = multiprocessing.Manager()
+        self._progress = multiprocessing.Queue()
+        self._cancelled = self._manager.dict()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(self._progress, self._cancelled, self.max_workers))
+        threading.Thread(target=self._drain, name="job-progress", daemon=True).start()
+
+
+    def _drain(self) -> None:
+        # Move the messages sent by the workers into the job records
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            job_id, kind, payload = message
+            with self._condition:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                if kind == RUNNING and job.status == QUEUED:
+                    job.status = RUNNING
+                    job.started = time.time()
+                elif kind == "energies":
+                    job.energies.extend(payload)
+                self._condition.notify_all()
+
+
+    def submit(self, func: Callable, *args, owner: Optional[str] = None,
+               meta: Optional[dict] = None, **kwargs) -> Job:
+        """
+        Queue `func(*args, callback=..., cancel=..., **kwargs)` for execution in a worker process.
+
+        Args:
+            func: Picklable function accepting a `callback(energy) -> bool` and a
+                `cancel` (threading.Event) keyword.
+            owner: Identifier of the user submitting the job.
+            meta: Extra data kept with the job (not sent to the worker).
+
+        Returns:
+            The new job (Job).
+
+        Raises:
+            QueueFullError: If too many jobs are already queued or running.
+        """
+        with self._condition:
+            active = sum(job.status not in FINISHED for job in self._jobs.values())
+            if active >= self.max_workers + self.max_pending:
+                raise QueueFullError("Too many optimizations in progress, try again later.")
+            self._start()
+            job = Job(owner, meta)
+            self._jobs[job.id] = job
+            self._evict()
+            job.future = self._executor.submit(_run_job, job.id, func, args, kwargs)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+
+    def _finish(self, job: Job, future) -> None:
+        with self._condition:
+            if job.started is None:
+                job.started = time.time()
+            try:
+                job.result = future.result()
+                job.status = CANCELLED if job.id in self._cancelled else DONE
+            except CancelledError:
+                job.status = CANCELLED
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+            job.finished = time.time()
+            self._cancelled.pop(job.id, None)
+            self._condition.notify_all()
+        if self.on_finish is not None:
+            self.on_finish(job)
+
+
+    def _evict(self) -> None:
+        # Forget the oldest finished jobs beyond the retention limit
+        finished = [job for job in self._jobs.values() if job.status in FINISHED]
+        for job in sorted(finished, key=lambda job: job.finished)[:-self.max_finished or None]:
+            del self._jobs[job.id]
+
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """
+        Look up a job, hiding jobs that belong to another user.
+
+        Args:
+            job_id: Identifier returned by `submit`.
+            owner: Identifier of the requesting user.
+
+        Returns:
+            The job or None if it does not exist (Job | None).
+        """
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued job or ask a running one to stop at its next iteration.
+        A stopped job keeps the best structure found so far as its result.
+
+        Args:
+            job_id: Identifier returned by `submit`.
+
+        Returns:
+            False if the job had already finished (bool).
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            self._cancelled[job_id] = True
+        job.future.cancel()
+        return True
+
+
+    def wait(self, job: Job, seen: int, timeout: float = 15.0) -> tuple[list[float], str]:
+        """
+        Block until the job reports new energies or finishes.
+
+        Args:
+            job: Job to watch.
+            seen: Number of energies the caller has already received.
+            timeout: Maximum waiting time in seconds.
+
+        Returns:
+            The new energies and the current job status (tuple[list[float], str]).
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(job.energies) > seen or job.status in FINISHED, timeout)
+            return job.energies[seen:], job.status
+
+
+    def join(self, job: Job, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the job reaches a final state.
+
+        Args:
+            job: Job to wait for.
+            timeout: Maximum waiting time in seconds, None waits indefinitely.
+
+        Returns:
+            True if the job has finished (bool).
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: job.status in FINISHED, timeout)
+
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker pool, cancelling the jobs that have not started yet.
+        """
+        if self._executor is None:
+            return
+        for job_id in list(self._jobs):
+            self._cancelled[job_id] = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._progress.put(None)
+        self._manager.shutdown()
+        self._executor = None
@@ -0,0 +1,291 @@
+# Lightweight instrumentation: spans, counters and histograms exported in Prometheus text format
+import bisect
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Latency buckets (seconds) of the histograms
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Atom count buckets used as a label, so the number of series stays bounded
+SIZE_LABELS = ((16, "1-16"), (64, "17-64"), (256, "65-256"), (1024, "257-1024"))
+
+
+def size_label(num_atoms: int) -> str:
+    """
+    Label of the atom count bucket of a structure (e.g. "17-64").
+    """
+    for limit, label in SIZE_LABELS:
+        if num_atoms <= limit:
+            return label
+    return f">{SIZE_LABELS[-1][0]}"
+
+
+# Every metric created, in the order of the exposition
+REGISTRY: list = []
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    '''Monotonic counter with optional labels.
+
+    Args:
+        name: (str) Metric name.
+        help: (str) Description shown in the exposition.
+        labels: (tuple[str, ...]) Label names.
+
+    Example:
+        evaluations = Counter("evaluations_total", "Energy evaluations", ("method",))
+        evaluations.inc(120, method="L-BFGS-B")
+    '''
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+
+    def render(self) -> list[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value:g}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    '''Histogram of observed values with cumulative buckets, a sum and a count.
+
+    Args:
+        name: (str) Metric name.
+        help: (str) Description shown in the exposition.
+        labels: (tuple[str, ...]) Label names.
+        buckets: (tuple[float, ...]) Upper bounds of the buckets.
+
+    Example:
+        latency = Histogram("request_seconds", "Request latency", ("endpoint",))
+        latency.observe(0.25, endpoint="/optimize")
+    '''
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts[0][index] += 1
+            counts[1] += value
+            counts[2] += 1
+
+
+    def total(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return self._values[key][1] if key in self._values else 0.0
+
+
+    def render(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    labels = _format_labels(self.labels, key, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+span_seconds = Histogram("clusterweblab_span_seconds", "Duration of named phases", ("span",))
+http_request_seconds = Histogram("clusterweblab_http_request_seconds", "HTTP request latency",
+                                 ("endpoint", "method", "status"))
+optimization_seconds = Histogram("clusterweblab_optimization_seconds", "Optimization wall time",
+                                 ("method", "atoms"))
+optimizations_total = Counter("clusterweblab_optimizations_total", "Finished optimizations",
+                              ("method", "atoms", "cached"))
+evaluations_total = Counter("clusterweblab_function_evaluations_total",
+                            "Energy and gradient evaluations", ("method",))
+iterations_total = Counter("clusterweblab_iterations_total", "Optimizer iterations or hops", ("method",))
+cache_requests_total = Counter("clusterweblab_result_cache_requests_total", "Result cache lookups", ("result",))
+minimizations_avoided_total = Counter("clusterweblab_minimizations_avoided_total",
+                                      "Minimizations short-circuited by the minima database", ("method",))
+profiles_total = Counter("clusterweblab_profiles_total", "Requests captured with cProfile", ("endpoint",))
+
+# Spans of the current request or optimization, see `trace`
+_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time a named phase, e.g. `with span("parse"): ...`.
+
+    The duration is observed in `clusterweblab_span_seconds` and added to the
+    active `trace`, if any.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        span_seconds.observe(elapsed, span=name)
+        spans = _trace.get()
+        if spans is not None:
+            spans[name] = spans.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def trace() -> Iterator[dict]:
+    """
+    Collect the durations of the spans run inside the block (by name, summed).
+
+    Example:
+        with trace() as spans:
+            with span("parse"):
+                ...
+        spans # {"parse": 0.002}
+    """
+    spans: dict = {}
+    token = _trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+
+def record_optimization(result, include_spans: bool = False) -> None:
+    """
+    Update the optimization metrics from an OptimizationResult.
+
+    Args:
+        result: The finished OptimizationResult.
+        include_spans: Also observe the phases in `result.timings`. Used when the
+                       optimization ran in another process (e.g. a job worker),
+                       whose own metrics are not visible here.
+    """
+    method, atoms = result.method, size_label(len(result.atoms))
+    optimizations_total.inc(method=method, atoms=atoms, cached=str(result.cached).lower())
+    optimization_seconds.observe(result.timings.get("total", 0.0), method=method, atoms=atoms)
+    evaluations_total.inc(result.nfev, method=method)
+    iterations_total.inc(result.nit, method=method)
+    cache_requests_total.inc(result="hit" if result.cached else "miss")
+    minimizations_avoided_total.inc(result.info.get("minima", {}).get("avoided", 0), method=method)
+    if include_spans:
+        for name, seconds in result.timings.items():
+            if name != "total":
+                span_seconds.observe(seconds, span=name)
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# cProfile capture of a random sample of requests, written as .prof files
+PROFILE_RATE = float(os.environ.get("CLUSTERWEBLAB_PROFILE_RATE", 0))
+PROFILE_DIR = os.environ.get("CLUSTERWEBLAB_PROFILE_DIR",
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                          ".cache", "profiles"))
+PROFILE_KEEP = 50
+
+
+def start_profile(rate: Optional[float] = None) -> Optional[cProfile.Profile]:
+    """
+    Start a cProfile capture with probability `rate` (default CLUSTERWEBLAB_PROFILE_RATE).
+
+    Returns:
+        The running profiler, or None when this call is not sampled.
+    """
+    rate = PROFILE_RATE if rate is None else rate
+    if rate <= 0.0 or random.random() >= rate:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler: cProfile.Profile, name: str) -> None:
+    """
+    Stop a profiler and save its statistics to PROFILE_DIR as a .prof file, keeping
+    the newest PROFILE_KEEP files. Inspect them with `python -m pstats <file>`.
+
+    Args:
+        profiler: Profiler returned by `start_profile`.
+        name: Name of the profiled operation, used in the file name (e.g. "optimize").
+    """
+    profiler.disable()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe = "".join(c if c.isalnum() else "_" for c in name.strip("/")) or "root"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{stamp}-{safe}-{os.getpid()}-{random.getrandbits(32):08x}.prof"))
+        profiles_total.inc(endpoint=name)
+        for old in sorted(os.listdir(PROFILE_DIR))[:-PROFILE_KEEP]:
+            os.remove(os.path.join(PROFILE_DIR, old))
+    except OSError as e:
+        print(f"Saving the profile failed: {e}")
+
+
+@contextmanager
+def profiled(name: str, rate: Optional[float] = None) -> Iterator[Optional[cProfile.Profile]]:
+    """
+    Run the block under cProfile for a sample of the calls, see `start_profile`. Also
+    works as a decorator, e.g. `@profiled("optimize_structure")`.
+
+    Yields:
+        The active profiler, or None when the block is not sampled.
+    """
+    profiler = start_profile(rate)
+    try:
+        yield profiler
+    finally:
+        if profiler is not None:
+            save_profile(profiler, name)
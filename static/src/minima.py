@@ -0,0 +1,361 @@
+# Database of known local minima with invariant structural fingerprints
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, replace
+import numpy as np
+import scipy.optimize as spo
+from typing import Callable, Optional
+
+# Number of distance quantiles kept per element pair in a fingerprint
+FINGERPRINT_SIZE = 128
+
+# Number of compositions whose databases are kept per process by get_database
+DATABASE_CACHE_SIZE = 32
+
+
+def fingerprint(atoms: list[str], coords: np.ndarray, size: int = FINGERPRINT_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rotation, translation and permutation invariant description of a structure.
+
+    The distances between every pair of elements (Pd-Pd, Pd-Pt, Pt-Pt, ...) are sorted
+    separately, so exchanging atoms of the same element, rotating or moving the cluster
+    gives the same fingerprint, while homotops with a different element ordering differ.
+    Large clusters keep `size` evenly spaced quantiles per element pair.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Coordinates with shape (n, 3).
+        size: Maximum number of distances kept per element pair.
+
+    Returns:
+        The sorted principal moments of the gyration tensor with shape (3,) and the
+        concatenated distance quantiles (np.ndarray).
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    centered = coords - coords.mean(axis=0)
+    moments = np.linalg.eigvalsh(centered.T @ centered / len(coords))
+
+    species = sorted(set(atoms))
+    types = np.array([species.index(atom) for atom in atoms])
+    ai, aj = np.triu_indices(len(coords), k=1)
+    dist = np.linalg.norm(coords[ai] - coords[aj], axis=1)
+    lo, hi = np.minimum(types[ai], types[aj]), np.maximum(types[ai], types[aj])
+
+    parts = []
+    for a in range(len(species)):
+        for b in range(a, len(species)):
+            d = np.sort(dist[(lo == a) & (hi == b)])
+            if len(d) > size:
+                d = np.interp(np.linspace(0, len(d) - 1, size), np.arange(len(d)), d)
+            parts.append(d)
+    return moments, np.concatenate(parts).astype(np.float32)
+
+
+@dataclass
+class Minimum:
+    """
+    A local minimum stored in a MinimaDatabase.
+
+    Attributes:
+        energy (float): Energy of the minimum (eV).
+        coords (np.ndarray): Coordinates with the atoms sorted by element.
+        moments (np.ndarray): Principal moments of the gyration tensor.
+        distances (np.ndarray): Distance quantiles of the fingerprint.
+        visits (int): Number of times the minimum was found again.
+    """
+    energy: float
+    coords: np.ndarray
+    moments: np.ndarray
+    distances: np.ndarray
+    visits: int = 1
+
+
+class MinimaDatabase:
+    '''Store of the local minima found for one composition.
+
+    Two structures are the same minimum when their energies agree within
+    `energy_tolerance` and their fingerprints (see `fingerprint`) within
+    `distance_tolerance`. Coordinates are stored with the atoms sorted by element,
+    so a minimum can be returned for any ordering of the same composition.
+
+    `minimizer` returns an L-BFGS-B method for `scipy.optimize.minimize` that stops
+    as soon as a nearly converged iterate matches a known minimum and returns that
+    minimum instead, which skips the tail of redundant minimizations.
+
+    Args:
+        max_entries: (int) Number of minima kept, the highest ones are dropped first.
+        energy_tolerance: (float) Largest energy difference of equal minima (eV).
+        distance_tolerance: (float) Largest fingerprint difference of equal minima (Å).
+
+    Example:
+        database = get_database(atoms)
+        database.add(atoms, coords, energy) # Returns (index, True) for a new minimum
+        sol = spo.basinhopping(potential, x0, minimizer_kwargs={"method": database.minimizer(atoms), "jac": True})
+        database.stats() # Number of minima and avoided minimizations
+    '''
+
+    def __init__(self, max_entries: int = 1000, energy_tolerance: float = 1e-3,
+                 distance_tolerance: float = 2e-2) -> None:
+        self.max_entries = max_entries
+        self.energy_tolerance = energy_tolerance
+        self.distance_tolerance = distance_tolerance
+        self.minima: list[Minimum] = []
+        self.lookups = 0
+        self.avoided = 0
+        self.duplicates = 0
+        self._energies = np.zeros(0)
+        self._lock = threading.Lock()
+
+
+    def __len__(self) -> int:
+        return len(self.minima)
+
+
+    def _match(self, energy: float, moments: np.ndarray, distances: np.ndarray) -> Optional[int]:
+        # Called with the lock held
+        candidates = np.flatnonzero(np.abs(self._energies - energy) <= self.energy_tolerance)
+        for k in candidates:
+            minimum = self.minima[k]
+            if (len(minimum.distances) == len(distances)
+                    and np.all(np.abs(np.sqrt(minimum.moments) - np.sqrt(moments)) <= self.distance_tolerance)
+                    and np.max(np.abs(minimum.distances - distances), initial=0.0) <= self.distance_tolerance):
+                return int(k)
+        return None
+
+
+    def lookup(self, atoms: list[str], coords: np.ndarray, energy: float, visit: bool = False) -> Optional[Minimum]:
+        """
+        Find a known minimum matching the structure.
+
+        The match is copied while the lock is held, so it stays consistent when other
+        threads add or drop minima (which shifts the indices of the stored ones).
+
+        Args:
+            atoms: List of atomic symbols.
+            coords: Coordinates with shape (n, 3).
+            energy: Energy of the structure (eV).
+            visit: Count a visit of the matching minimum.
+
+        Returns:
+            A copy of the matching minimum or None (Minimum | None).
+        """
+        moments, distances = fingerprint(atoms, coords)
+        with self._lock:
+            self.lookups += 1
+            k = self._match(energy, moments, distances)
+            if k is None:
+                return None
+            if visit:
+                self.minima[k].visits += 1
+            return replace(self.minima[k])
+
+
+    def add(self, atoms: list[str], coords: np.ndarray, energy: float) -> tuple[int, bool]:
+        """
+        Record a minimum, or count a new visit of a known one.
+
+        Args:
+            atoms: List of atomic symbols.
+            coords: Coordinates with shape (n, 3).
+            energy: Energy of the minimum (eV).
+
+        Returns:
+            The index of the minimum and whether it was stored as a new one. A minimum
+            that is not stored because the database is full and it is higher than every
+            stored one gives (-1, False) (tuple[int, bool]).
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        moments, distances = fingerprint(atoms, coords)
+        order = np.argsort(atoms, kind="stable")
+        with self._lock:
+            k = self._match(energy, moments, distances)
+            if k is not None:
+                self.minima[k].visits += 1
+                self.duplicates += 1
+                return k, False
+            if len(self.minima) >= self.max_entries:
+                # Make room by dropping the highest minimum
+                worst = int(np.argmax(self._energies))
+                if energy >= self._energies[worst]:
+                    return -1, False
+                del self.minima[worst]
+                self._energies = np.delete(self._energies, worst)
+            self.minima.append(Minimum(float(energy), coords[order], moments, distances))
+            self._energies = np.append(self._energies, float(energy))
+            return len(self.minima) - 1, True
+
+
+    @staticmethod
+    def coordinates(minimum: Minimum, atoms: list[str]) -> np.ndarray:
+        """
+        Coordinates of a stored minimum in the atom order of `atoms`.
+
+        Args:
+            minimum: The minimum, e.g. returned by `lookup`.
+            atoms: List of atomic symbols with the same composition.
+
+        Returns:
+            The coordinates with shape (n, 3) (np.ndarray).
+        """
+        coords = np.empty_like(minimum.coords)
+        coords[np.argsort(atoms, kind="stable")] = minimum.coords
+        return coords
+
+
+    def minimizer(self, atoms: list[str], check_gradient: float = 1e-2) -> Callable:
+        """
+        Build a local minimization method that short-circuits known minima.
+
+        The returned callable is passed as `method` to `scipy.optimize.minimize` (or in
+        the `minimizer_kwargs` of basin hopping). It runs L-BFGS-B and, the first time the
+        largest gradient component falls below `check_gradient`, looks the iterate up in
+        the database. On a match the minimization stops and the stored minimum is
+        returned; otherwise it runs to convergence and the new minimum is added. A
+        minimization stopped by the caller's callback (StopIteration) is not added.
+
+        Args:
+            atoms: List of atomic symbols of the structures being minimized.
+            check_gradient: Largest gradient component (eV/Å) at which the lookup is made.
+
+        Returns:
+            A custom minimization method for `scipy.optimize.minimize` (Callable).
+        """
+        def minimize(fun, x0, args=(), jac=None, callback=None, **options):
+            match = None
+            interrupted = False
+
+            def check(intermediate_result):
+                nonlocal match, interrupted
+                if callback is not None:
+                    try:
+                        callback(intermediate_result)
+                    except StopIteration:
+                        # Stopped by the caller: the iterate is not a minimum
+                        interrupted = True
+                        raise
+                if match is not None or np.abs(jac(intermediate_result.x, *args)).max() > check_gradient:
+                    return
+                match = self.lookup(atoms, intermediate_result.x, intermediate_result.fun, visit=True)
+                if match is None:
+                    match = False  # Checked once, keep minimizing
+                else:
+                    raise StopIteration
+
+            sol = spo.minimize(fun, x0, args=args, jac=jac, method="L-BFGS-B", callback=check,
+                               options={"gtol": 1e-8, "maxiter": 1000})
+            if match:
+                with self._lock:
+                    self.avoided += 1
+                # Energy and coordinates from the same snapshot of the minimum
+                sol.x = self.coordinates(match, atoms).ravel()
+                sol.fun = match.energy
+                sol.success = True
+                sol.message = "Matched a known minimum"
+                return sol
+            if not interrupted:
+                self.add(atoms, sol.x, float(sol.fun))
+            return sol
+
+        return minimize
+
+
+    def best(self, atoms: list[str]) -> Optional[tuple[float, np.ndarray]]:
+        """
+        The lowest stored minimum in the atom order of `atoms`.
+
+        Returns:
+            The energy and coordinates of the lowest minimum, or None when empty.
+        """
+        with self._lock:
+            if not self.minima:
+                return None
+            k = int(np.argmin(self._energies))
+            return self.minima[k].energy, self.coordinates(self.minima[k], atoms)
+
+
+    def export(self, start: int = 0) -> list[Minimum]:
+        """
+        Copy of the stored minima from index `start`, e.g. to send them to worker processes.
+        """
+        with self._lock:
+            return list(self.minima[start:])
+
+
+    def merge(self, minima: list[Minimum], counters: Optional[dict] = None) -> int:
+        """
+        Add minima exported from another database, skipping known ones.
+
+        Args:
+            minima: Minima returned by `export`.
+            counters: Optional `lookups`, `avoided` and `duplicates` counts of the other
+                      database to add to this one.
+
+        Returns:
+            The number of new minima (int).
+        """
+        added = 0
+        with self._lock:
+            for name in ("lookups", "avoided", "duplicates"):
+                setattr(self, name, getattr(self, name) + (counters or {}).get(name, 0))
+            for minimum in minima:
+                if self._match(minimum.energy, minimum.moments, minimum.distances) is not None:
+                    continue
+                if len(self.minima) >= self.max_entries:
+                    break
+                self.minima.append(Minimum(minimum.energy, minimum.coords, minimum.moments,
+                                           minimum.distances, minimum.visits))
+                self._energies = np.append(self._energies, minimum.energy)
+                added += 1
+        return added
+
+
+    def stats(self) -> dict:
+        """
+        Counters of the database.
+
+        Returns:
+            A dictionary with the number of stored `minima`, the `lookups`, the
+            short-circuited minimizations (`avoided`) and the completed minimizations
+            that ended in a known minimum (`duplicates`) (dict).
+        """
+        with self._lock:
+            return {"minima": len(self.minima), "lookups": self.lookups,
+                    "avoided": self.avoided, "duplicates": self.duplicates}
+
+
+_databases: OrderedDict[tuple, MinimaDatabase] = OrderedDict()
+_databases_lock = threading.Lock()
+
+
+def get_database(atoms: list[str], cutoff: Optional[tuple[float, float]] = None) -> MinimaDatabase:
+    """
+    Return the process-wide minima database of a composition.
+
+    Databases are keyed by the element counts (not the atom order) and the cutoff, so
+    every request for the same composition reuses the minima found before. The least
+    recently used compositions are dropped beyond DATABASE_CACHE_SIZE.
+
+    Args:
+        atoms: List of atomic symbols.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+
+    Returns:
+        The minima database (MinimaDatabase).
+    """
+    key = (tuple(sorted(Counter(atoms).items())), None if cutoff is None else tuple(cutoff))
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = MinimaDatabase()
+        _databases.move_to_end(key)
+        while len(_databases) > DATABASE_CACHE_SIZE:
+            _databases.popitem(last=False)
+        return database
+
+
+def clear_databases() -> None:
+    """
+    Forget the minima of every composition (e.g. between benchmark runs).
+    """
+    with _databases_lock:
+        _databases.clear()
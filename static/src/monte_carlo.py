@@ -0,0 +1,114 @@
+# Metropolis Monte Carlo with single-atom moves and homotop swaps using incremental energy updates
+import time
+import numpy as np
+import scipy.optimize as spo
+from potentials.gupta import get_potential
+from potentials.incremental import IncrementalGupta
+from minima import get_database
+from typing import Callable, Optional
+
+
+def monte_carlo(atoms: list[str], coords: np.ndarray, nsteps: int = 20000, temperature: float = 0.05,
+                stepsize: float = 0.2, swap_probability: float = 0.3, target_acceptance: float = 0.4,
+                seed: Optional[int] = None, cutoff: Optional[tuple[float, float]] = None,
+                callback: Optional[Callable[[float], bool]] = None,
+                report_interval: int = 500) -> spo.OptimizeResult:
+    """
+    Metropolis Monte Carlo search over positions and homotops (element orderings).
+
+    Every step either displaces one random atom or, for clusters with more than one
+    element, exchanges two atoms of different elements. The energy change of each trial
+    is computed in O(n) with `IncrementalGupta`, so a step is much cheaper than a full
+    evaluation. The displacement size adapts towards `target_acceptance`. The lowest
+    structure visited is relaxed with L-BFGS-B at the end.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Initial coordinates with shape (n, 3).
+        nsteps: Number of Monte Carlo steps.
+        temperature: Metropolis temperature kT (eV).
+        stepsize: Initial maximum displacement of an atom (Å).
+        swap_probability: Fraction of the steps that are swaps.
+        target_acceptance: Acceptance rate of displacements the step size is tuned to.
+        seed: Random seed, for reproducible runs.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+        callback: Called with the best energy every `report_interval` steps; returning
+                  True stops the search and keeps the best structure found so far.
+        report_interval: Steps between progress reports and step size updates.
+
+    Returns:
+        An OptimizeResult with the relaxed best structure (`x`, `fun`), its element
+        order (`atoms`), the number of steps (`nit`), the evaluations of the final
+        relaxation (`nfev`) and the move statistics (`moves`, `swaps`, `stepsize`,
+        `mc_time`).
+    """
+    rng = np.random.default_rng(seed)
+    state = IncrementalGupta(atoms, coords, cutoff=cutoff)
+    n = len(state.coords)
+    can_swap = len(state.species) > 1 and swap_probability > 0.0
+
+    best_energy, best_coords, best_types = state.energy, state.coords.copy(), state.types.copy()
+    moves = {"attempted": 0, "accepted": 0}
+    swaps = {"attempted": 0, "accepted": 0}
+    window = [0, 0]  # Displacements attempted and accepted since the last step size update
+
+    start = time.perf_counter()
+    step = 0
+    for step in range(1, nsteps + 1):
+        if can_swap and rng.random() < swap_probability:
+            a = int(rng.integers(n))
+            others = np.flatnonzero(state.types != state.types[a])
+            b = int(others[rng.integers(len(others))])
+            delta = state.propose_swap(a, b)
+            counter = swaps
+        else:
+            k = int(rng.integers(n))
+            delta = state.propose_move(k, state.coords[k] + rng.uniform(-stepsize, stepsize, 3))
+            counter = moves
+            window[0] += 1
+
+        counter["attempted"] += 1
+        if delta <= 0.0 or rng.random() < np.exp(-delta / temperature):
+            state.accept()
+            counter["accepted"] += 1
+            if counter is moves:
+                window[1] += 1
+            if state.energy < best_energy:
+                best_energy, best_coords, best_types = state.energy, state.coords.copy(), state.types.copy()
+        else:
+            state.rollback()
+
+        if step % report_interval == 0:
+            # Grow the step when too many displacements are accepted, shrink it otherwise
+            if window[0]:
+                stepsize *= 1.1 if window[1] / window[0] > target_acceptance else 0.9
+            window = [0, 0]
+            if callback is not None and callback(best_energy):
+                break
+    mc_time = time.perf_counter() - start
+
+    # Relax the lowest structure visited to the bottom of its basin
+    best_atoms = [state.species[t] for t in best_types]
+    gupta = get_potential(best_atoms, cutoff=cutoff)
+
+    def potential(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(n, 3))
+        return energy, grad.ravel()
+
+    # Known minima of this composition end the relaxation early
+    minimizer = get_database(best_atoms, cutoff=cutoff).minimizer(best_atoms)
+    sol = spo.minimize(potential, best_coords.ravel(), method=minimizer, jac=True)
+    for counter in (moves, swaps):
+        counter["acceptance_rate"] = counter["accepted"] / counter["attempted"] if counter["attempted"] else 0.0
+    return spo.OptimizeResult(
+        x=sol.x,
+        fun=float(sol.fun),
+        atoms=best_atoms,
+        nfev=int(sol.nfev),
+        nit=step,
+        moves=moves,
+        swaps=swaps,
+        stepsize=float(stepsize),
+        mc_time=mc_time,
+        success=True,
+        message="Monte Carlo finished")
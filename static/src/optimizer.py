@@ -1,38 +1,72 @@
 # Script to optimize atomic structures from an XYZ file using the Gupta potential
 import argparse
+import json
+import os
+import signal
+import threading
+import time
+import numpy as np
 import scipy.optimize as spo
-from autograd import elementwise_grad as egrad
-from potentials.gupta import Gupta
-from read_xyz import read_xyz_file
-from write_xyz import write_xyz_file
+from potentials.gupta import get_potential
+from read_xyz import iter_xyz_frames, read_xyz_file
+from write_xyz import write_xyz_file, write_xyz_frames
+from basin_hopping import adaptive_basinhopping
+from walkers import parallel_basinhopping
+from monte_carlo import monte_carlo
+from genetic import genetic_algorithm
+from minima import get_database
+from jobs import worker_share
+from result_cache import cache_key, result_cache
+from metrics import profiled, record_optimization, span, trace
+from potentials.kernels import active_backend, available_backends, resolve_backend, use_backend
 from static.src.timer import timeit
-from typing import Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
-@timeit
-def optimize_structure(file_path: str, method: str = "L-BFGS-B") -> Tuple[float, float]:
-    """
-    Optimize the atomic structure from an XYZ file using the Gupta potential.
+METHODS = ("L-BFGS-B", "trust-ncg", "Newton-CG", "basinhopping", "parallel-basinhopping", "monte-carlo", "genetic")
 
-    Args:
-        file_path (str): Path to the input XYZ file containing atomic structure.
-        method (str): Optimization method to use. Options are "L-BFGS-B" or "basinhopping".
-                      Default is "L-BFGS-B".
+# Methods of optimize_batch; the parallel global methods already use every core for one structure
+BATCH_METHODS = ("L-BFGS-B", "trust-ncg", "Newton-CG", "basinhopping", "monte-carlo")
 
-    Returns:
-        Tuple[float, float]: A tuple containing the old energy and the new energy of the structure.
+# Structures of one composition optimized together by a batch worker, which prepares
+# their potential once
+BATCH_CHUNK = 8
+
+# Batch process pools that run at once in this process, further batches wait for a free one
+BATCH_POOLS = int(os.environ.get("CLUSTERWEBLAB_BATCH_POOLS", 1))
+_batch_pools = threading.BoundedSemaphore(BATCH_POOLS)
+
+# Randomized methods, their results are only cached for a fixed `seed`
+STOCHASTIC_METHODS = ("basinhopping", "parallel-basinhopping", "monte-carlo", "genetic")
+
+def _minimize(atoms: list[str], coords: np.ndarray, method: str,
+              cutoff: Optional[Tuple[float, float]], callback: Optional[Callable[[float], bool]],
+              options: dict, cancel: Optional[threading.Event] = None) -> spo.OptimizeResult:
     """
-    # Read atomic data and coordinates from the XYZ file
-    atoms, coords = read_xyz_file(file_path)
-    
-    # Initialize the Gupta potential with the atomic data
-    gupta = Gupta(atoms)
-    
-    # Define the potential energy function
-    potential = lambda x: gupta.potential(x.reshape(len(coords), 3))
+    Run the selected optimization method from the given coordinates.
+    """
+    # Get the Gupta potential for the atomic data (cached per atom list)
+    gupta = get_potential(atoms, cutoff=cutoff)
+
+    # Minima found by earlier requests for this composition, shared by the global methods
+    database = get_database(atoms, cutoff=cutoff)
+    before = database.stats()
     
-    # Calculate the initial energy of the structure
-    old_energy = potential(coords.flatten())
+    # Define the potential energy function returning the energy and its gradient
+    def potential(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(len(coords), 3))
+        return energy, grad.ravel()
     
+    # Report the energy of every iteration and stop when the callback asks for it
+    def on_iteration(intermediate_result):
+        if callback(intermediate_result.fun):
+            raise StopIteration
+
+    # Exact Hessian-vector products for the Newton-type methods
+    def hessp(x, p):
+        return gupta.hessian_vector_product(x.reshape(len(coords), 3), p.reshape(len(coords), 3)).ravel()
+
     # Perform optimization based on the selected method
     if method == "L-BFGS-B":
         # Use the L-BFGS-B optimization method
@@ -40,45 +74,468 @@ def optimize_structure(file_path: str, method: str = "L-BFGS-B") -> Tuple[float,
             potential,
             coords.flatten(),
             method='L-BFGS-B',
-            jac=egrad(potential),  # Gradient of the potential
+            jac=True,  # The potential also returns its gradient
+            callback=on_iteration if callback else None,
             options={
                 "gtol": 1e-8,  # Gradient tolerance
                 "maxiter": 1000,  # Maximum number of iterations
                 "disp": False,  # Suppress output
             })
+    elif method in ("trust-ncg", "Newton-CG"):
+        # Newton-type methods using the analytic Hessian, for tight final convergence
+        sol = spo.minimize(
+            potential,
+            coords.flatten(),
+            method=method,
+            jac=True,
+            hessp=hessp,
+            callback=on_iteration if callback else None,
+            options={
+                "gtol" if method == "trust-ncg" else "xtol": 1e-10,  # Gradient / step tolerance
+                "maxiter": 500,  # Maximum number of iterations
+            })
     elif method == 'basinhopping':
-        # Use the basinhopping optimization method
-        sol = spo.basinhopping(
-                potential,
-                coords.flatten(),
-                minimizer_kwargs={
-                    "method": "L-BFGS-B",
-                    "jac": egrad(potential),
-                },
-                niter=250,  # Number of iterations for basinhopping
-                disp=False)  # Suppress output
-        
-    # Extract the optimized coordinates and energy
-    new_coords = sol.x.reshape(-1, 3)
-    new_energy = sol.fun
+        # Basin hopping with adaptive step size and temperature within the time/evaluation budgets
+        sol = adaptive_basinhopping(atoms, coords, cutoff=cutoff, callback=callback, cancel=cancel, **options)
+    elif method == 'parallel-basinhopping':
+        # Run independent basin hopping walkers in parallel worker processes
+        sol = parallel_basinhopping(atoms, coords, cutoff=cutoff, callback=callback, cancel=cancel, **options)
+    elif method == 'monte-carlo':
+        # Metropolis sampling of atom moves and homotop swaps with O(n) energy updates
+        sol = monte_carlo(atoms, coords, cutoff=cutoff, callback=callback, **options)
+    elif method == 'genetic':
+        # Cut-and-splice genetic algorithm with offspring relaxed in worker processes
+        sol = genetic_algorithm(atoms, coords, cutoff=cutoff, callback=callback, cancel=cancel, **options)
+    else:
+        raise ValueError(f"Unknown optimization method: {method}")
+
+    if method in ("basinhopping", "parallel-basinhopping", "monte-carlo", "genetic"):
+        # Report how many minimizations the minima database avoided in this run
+        after = database.stats()
+        sol["minima"] = {"known": after["minima"], "new": after["minima"] - before["minima"],
+                         **{name: after[name] - before[name] for name in ("lookups", "avoided", "duplicates")}}
+    return sol
+
+@dataclass
+class OptimizationResult:
+    """
+    Result of an in-memory optimization.
+
+    Attributes:
+        atoms (list[str]): Atomic symbols.
+        coords (np.ndarray): Optimized coordinates with shape (n, 3).
+        initial_energy (float): Energy of the input structure (eV).
+        energy (float): Energy of the optimized structure (eV).
+        method (str): Optimization method used.
+        nfev (int): Number of energy/gradient evaluations.
+        nit (int): Number of iterations (or hops for the global methods).
+        timings (dict): Wall-clock seconds spent in the "setup", "cache" and "minimize"
+                        spans and in "total".
+        backend (str): Kernel backend that evaluated the energies ("numpy" or "numba").
+        cached (bool): True if the result was taken from the result cache.
+        stopped (bool): True if the callback, the cancel event or the wall-clock budget
+                        stopped the optimization early (such results are not cached).
+        info (dict): Method specific statistics (e.g. the walkers of "parallel-basinhopping"
+                     or the `minima` database counters of the global methods).
+    """
+    atoms: list[str]
+    coords: np.ndarray
+    initial_energy: float
+    energy: float
+    method: str
+    nfev: int = 0
+    nit: int = 0
+    timings: dict = field(default_factory=dict)
+    backend: str = "numpy"
+    cached: bool = False
+    stopped: bool = False
+    info: dict = field(default_factory=dict)
+
+# Fields of the scipy results that are not reported in OptimizationResult.info
+_SCIPY_FIELDS = {"x", "fun", "atoms", "jac", "hess_inv", "nfev", "njev", "nit", "status", "success",
+                 "message", "lowest_optimization_result", "minimization_failures"}
+
+def optimize_coordinates(atoms: list[str], coords: np.ndarray, method: str = "L-BFGS-B",
+                         options: Optional[dict] = None,
+                         cutoff: Optional[Tuple[float, float]] = None,
+                         callback: Optional[Callable[[float], bool]] = None,
+                         use_cache: bool = True,
+                         backend: Optional[str] = None,
+                         cancel: Optional[threading.Event] = None) -> OptimizationResult:
+    """
+    Optimize an atomic structure held in memory using the Gupta potential.
+
+    Args:
+        atoms (list[str]): Atomic symbols.
+        coords (np.ndarray): Initial coordinates with shape (n, 3).
+        method (str): Optimization method to use. Options are "L-BFGS-B", "trust-ncg",
+                      "Newton-CG" (exact Hessian-vector products), "basinhopping",
+                      "parallel-basinhopping", "monte-carlo" (atom moves and homotop
+                      swaps, may reorder the elements) or "genetic" (cut-and-splice
+                      genetic algorithm). Default is "L-BFGS-B".
+        options (Optional[dict]): Method specific settings, e.g. `niter`, `stepsize`,
+                      `temperature`, `adaptive`, `max_time`, `max_nfev`, `patience` or
+                      `seed` for "basinhopping" (see `adaptive_basinhopping`), `walkers`, `niter`, `rounds`, `stepsize` or `seed`
+                      for "parallel-basinhopping", `nsteps`,
+                      `temperature`, `swap_probability` or `seed` for "monte-carlo", and
+                      `population`, `generations`, `max_time`, `workers` or `seed` for "genetic".
+        cutoff (Optional[Tuple[float, float]]): Optional (r_on, r_off) radii in Å for a smooth
+                      cutoff of the Gupta potential. Default is None (all pairs are evaluated).
+        callback (Optional[Callable[[float], bool]]): Called with the current energy after
+                      every iteration (L-BFGS-B) or hop (basinhopping). Returning True stops
+                      the optimization early and keeps the best structure found so far.
+        use_cache (bool): Reuse the result of an identical earlier optimization from the
+                      result cache. Default is True. Runs of the STOCHASTIC_METHODS without
+                      a `seed` are never cached.
+        backend (Optional[str]): Kernel backend of the energy and gradient evaluations,
+                      "numpy", "numba" or "auto". Default is CLUSTERWEBLAB_KERNEL.
+        cancel (Optional[threading.Event]): Setting the event stops the optimization at
+                      its next iteration (or local iteration for "basinhopping") and
+                      keeps the best structure found so far.
+
+    Returns:
+        OptimizationResult: The optimized structure, its energies and statistics.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown optimization method: {method}")
+    options = options or {}
+    coords = np.asarray(coords, dtype=float)
+    start = time.perf_counter()
+    # An unseeded random search gives a new result every time, caching would freeze the first one
+    use_cache = use_cache and not (method in STOCHASTIC_METHODS and options.get("seed") is None)
+
+    # Remember whether the callback stopped the run, partial results are not cached
+    stopped = False
+
+    def report(energy):
+        nonlocal stopped
+        stopped = stopped or bool(callback and callback(energy)) or bool(cancel and cancel.is_set())
+        return stopped
+
+    with use_backend(backend) as backend, trace() as spans:
+        # Calculate the initial energy of the structure
+        with span("setup"):
+            initial_energy = get_potential(atoms, cutoff=cutoff).energy_and_forces(coords)[0]
+
+        # Reuse the result of an identical optimization when it is in the cache
+        with span("cache"):
+            key = cache_key(atoms, coords, method, {"cutoff": cutoff, **options}) if use_cache else None
+            cached = result_cache.get(key) if key else None
+        if cached is not None:
+            if callback:
+                callback(cached["energy"])
+            result = OptimizationResult(cached.get("atoms", atoms), np.array(cached["coords"], dtype=float),
+                                        initial_energy, cached["energy"], method, cached=True)
+        else:
+            with span("minimize"):
+                sol = _minimize(atoms, coords, method, cutoff, report if callback or cancel else None,
+                                options, cancel)
+            # Results cut short by the clock or a cancellation depend on the timing, not the inputs
+            stopped = stopped or sol.get("stop_reason") in ("max_time", "cancelled")
+            result = OptimizationResult(
+                list(sol.get("atoms", atoms)), sol.x.reshape(-1, 3), initial_energy, float(sol.fun), method,
+                nfev=int(sol.get("nfev", 0)), nit=int(sol.get("nit", 0)), stopped=stopped,
+                info={key: value for key, value in sol.items() if key not in _SCIPY_FIELDS})
+            if key and not stopped:
+                result_cache.put(key, {"atoms": result.atoms, "coords": result.coords.tolist(),
+                                       "energy": result.energy})
+
+    result.timings = {**spans, "total": time.perf_counter() - start}
+    result.backend = backend
+    record_optimization(result)
+    return result
+
+def _optimize_batch_chunk(atoms: list[str], chunk: list[Tuple[int, np.ndarray]], method: str, options: dict,
+                          cutoff: Optional[Tuple[float, float]], use_cache: bool,
+                          backend: str) -> list[Tuple[int, Optional[OptimizationResult], Optional[str]]]:
+    # Worker side of optimize_batch: structures of one composition, single-threaded kernels
+    # since the workers run in parallel
+    results = []
+    with use_backend(backend, parallel=False):
+        for index, coords in chunk:
+            try:
+                results.append((index, optimize_coordinates(atoms, coords, method=method, options=options,
+                                                            cutoff=cutoff, use_cache=use_cache), None))
+            except Exception as e:
+                results.append((index, None, str(e)))
+    return results
+
+def optimize_batch(structures: Iterable[Tuple[list[str], np.ndarray]], method: str = "L-BFGS-B",
+                   options: Optional[dict] = None,
+                   cutoff: Optional[Tuple[float, float]] = None,
+                   workers: Optional[int] = None,
+                   use_cache: bool = True,
+                   backend: Optional[str] = None) -> Iterator[Tuple[int, Optional[OptimizationResult], Optional[str]]]:
+    """
+    Optimize many structures in a pool of worker processes, yielding the results as
+    they are ready (not in input order).
+
+    Structures with the same composition are put in one canonical element order and
+    sent to the workers in chunks of up to BATCH_CHUNK, so a worker prepares the
+    potential of a composition once per chunk (and reuses it for later chunks, see
+    `get_potential`). The results of a chunk are yielded together, in the atom order
+    of the input. At most BATCH_POOLS batches run a process pool at once in a process;
+    the others wait for a free one.
+
+    Args:
+        structures (Iterable[Tuple[list[str], np.ndarray]]): Atomic symbols and coordinates
+                      with shape (n, 3) of every structure.
+        method (str): One of BATCH_METHODS, see `optimize_coordinates`. Default is "L-BFGS-B".
+        options (Optional[dict]): Method specific settings, see `optimize_coordinates`.
+        cutoff (Optional[Tuple[float, float]]): Optional smooth cutoff radii in Å.
+        workers (Optional[int]): Number of worker processes, 1 optimizes in this process.
+                      Default is the CPU share of this process (see `worker_share`).
+        use_cache (bool): Reuse cached results. Default is True.
+        backend (Optional[str]): Kernel backend, see `optimize_coordinates`.
+
+    Yields:
+        Tuple[int, Optional[OptimizationResult], Optional[str]]: The input index of the
+        structure and either its result or the error message of a failed optimization.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Method not available for batches: {method}")
+    options = options or {}
+    backend = resolve_backend(backend) if backend else active_backend()
+
+    # Group by composition, with the atoms of every structure sorted by element
+    groups: dict = {}
+    orders = {}
+    for index, (atoms, coords) in enumerate(structures):
+        order = np.argsort(atoms, kind="stable")
+        orders[index] = order
+        composition = tuple(atoms[k] for k in order)
+        groups.setdefault(composition, []).append((index, np.asarray(coords, dtype=float)[order]))
+    workers = max(1, min(workers or worker_share(), len(orders)))
+
+    # Split the groups into chunks, small enough that every worker gets one
+    tasks = []
+    for composition, group in groups.items():
+        size = max(1, min(BATCH_CHUNK, -(-len(group) // workers)))
+        tasks += [(list(composition), group[k:k + size]) for k in range(0, len(group), size)]
+
+    def restore(result, order):
+        # Undo the canonical ordering of the atoms
+        atoms = np.empty(len(order), dtype=object)
+        coords = np.empty_like(result.coords)
+        atoms[order], coords[order] = result.atoms, result.coords
+        result.atoms, result.coords = atoms.tolist(), coords
+        return result
+
+    if workers == 1:
+        for atoms, chunk in tasks:
+            for index, coords in chunk:
+                try:
+                    result = optimize_coordinates(atoms, coords, method=method, options=options, cutoff=cutoff,
+                                                  use_cache=use_cache, backend=backend)
+                except Exception as e:
+                    yield index, None, str(e)
+                    continue
+                yield index, restore(result, orders[index]), None
+        return
+
+    # Keep a few chunks queued per worker so results stream while the rest waits here
+    with _batch_pools:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            queue = iter(tasks)
+            pending = {}
+            while True:
+                for atoms, chunk in queue:
+                    future = executor.submit(_optimize_batch_chunk, atoms, chunk, method, options, cutoff,
+                                             use_cache, backend)
+                    pending[future] = [index for index, _ in chunk]
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        for index in indices:
+                            yield index, None, str(e)
+                        continue
+                    for index, result, error in results:
+                        if error is not None:
+                            yield index, None, error
+                            continue
+                        # The metrics of the workers are not visible in this process
+                        record_optimization(result, include_spans=True)
+                        yield index, restore(result, orders[index]), None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+@timeit
+@profiled("optimize_structure")
+def optimize_structure(file_path: str, method: str = "L-BFGS-B",
+                       cutoff: Optional[Tuple[float, float]] = None,
+                       output_file: Optional[str] = None,
+                       callback: Optional[Callable[[float], bool]] = None,
+                       options: Optional[dict] = None,
+                       use_cache: bool = True,
+                       backend: Optional[str] = None,
+                       cancel: Optional[threading.Event] = None) -> Tuple[float, float]:
+    """
+    Optimize the atomic structure from an XYZ file using the Gupta potential.
+
+    Reads the file, calls `optimize_coordinates` and writes the optimized structure.
+    A sample of the calls (CLUSTERWEBLAB_PROFILE_RATE) runs under cProfile, see `profiled`.
+
+    Args:
+        file_path (str): Path to the input XYZ file containing atomic structure.
+        method (str): Optimization method to use, see `optimize_coordinates`.
+        cutoff (Optional[Tuple[float, float]]): Optional smooth cutoff radii in Å.
+        output_file (Optional[str]): Path of the optimized XYZ file. Default is
+                      "opt-<input name>" in the working directory.
+        callback (Optional[Callable[[float], bool]]): Progress callback, see `optimize_coordinates`.
+        options (Optional[dict]): Method specific settings, see `optimize_coordinates`.
+        use_cache (bool): Reuse cached results. Default is True.
+        backend (Optional[str]): Kernel backend, see `optimize_coordinates`.
+        cancel (Optional[threading.Event]): Stops the optimization early, see `optimize_coordinates`.
+
+    Returns:
+        Tuple[float, float]: A tuple containing the old energy and the new energy of the structure.
+    """
+    # Read atomic data and coordinates from the XYZ file
+    with span("read"):
+        atoms, coords = read_xyz_file(file_path)
+
+    result = optimize_coordinates(atoms, coords, method=method, options=options, cutoff=cutoff,
+                                  callback=callback, use_cache=use_cache, backend=backend, cancel=cancel)
+    if result.cached:
+        print("Result taken from the cache")
+    for walker in result.info.get("walkers", []):
+        print(f"Walker {walker['walker']}: best {walker['best_energy']:.6f} eV | "
+              f"step {walker['stepsize']:.3f} | acceptance {walker['acceptance_rate']:.2f} | "
+              f"nfev {walker['nfev']} | {walker['cpu_time']:.2f} CPU sec")
+    for name in ("moves", "swaps"):
+        if name in result.info:
+            stats = result.info[name]
+            print(f"Monte Carlo {name}: {stats['accepted']}/{stats['attempted']} accepted "
+                  f"({stats['acceptance_rate']:.2f})")
+    if result.method == "basinhopping" and "stop_reason" in result.info:
+        print(f"Basin hopping: {result.nit} hops | step {result.info['stepsize']:.3f} | "
+              f"temperature {result.info['temperature']:.3f} eV | acceptance {result.info['acceptance_rate']:.2f} | "
+              f"stopped by {result.info['stop_reason']}")
+    if "population_energies" in result.info:
+        print(f"Generations: {result.nit} (stopped by {result.info['stop_reason']}) | "
+              f"Duplicates discarded: {result.info['duplicates']} | "
+              f"Population {result.info['population_energies'][0]:.6f} to {result.info['population_energies'][-1]:.6f} eV")
+    if "minima" in result.info:
+        minima = result.info["minima"]
+        print(f"Minima database: {minima['known']} known ({minima['new']} new) | "
+              f"{minima['avoided']} minimizations avoided | {minima['duplicates']} duplicates")
+    print(f"Kernel backend {result.backend} | "
+          + " | ".join(f"{name} {seconds:.3f} sec" for name, seconds in result.timings.items()))
+    if "speedup" in result.info:
+        print(f"Wall time {result.info['wall_time']:.2f} sec | "
+              f"Walker CPU time {result.info['cpu_time']:.2f} sec | Speedup {result.info['speedup']:.2f}x | "
+              f"stopped by {result.info['stop_reason']}")
     
     # Generate the output file name and save the optimized structure
-    output_file = f"opt-{file_path.split('/')[-1]}"
-    write_xyz_file(output_file, atoms, new_coords, new_energy)
+    if output_file is None:
+        output_file = f"opt-{file_path.split('/')[-1]}"
+    with span("write"):
+        write_xyz_file(output_file, result.atoms, result.coords, result.energy)
     
     # Print the results of the optimization
-    print(f"Old energy: {old_energy} eV | New energy: {new_energy} eV")
+    print(f"Old energy: {result.initial_energy} eV | New energy: {result.energy} eV")
     print(f"Optimization complete. Output saved to {output_file}")
     
-    return (old_energy, new_energy)
+    return (result.initial_energy, result.energy)
+
+def optimize_batch_file(file_path: str, method: str = "L-BFGS-B",
+                        cutoff: Optional[Tuple[float, float]] = None,
+                        output_file: Optional[str] = None,
+                        options: Optional[dict] = None,
+                        workers: Optional[int] = None,
+                        use_cache: bool = True,
+                        backend: Optional[str] = None) -> int:
+    """
+    Optimize every frame of a multi-frame XYZ file with `optimize_batch`.
+
+    A JSON line is printed for every structure as soon as it is optimized. The
+    optimized frames are written in input order, with their energies as comments.
+
+    Args:
+        file_path (str): Path to the multi-frame XYZ file.
+        method (str): One of BATCH_METHODS. Default is "L-BFGS-B".
+        cutoff (Optional[Tuple[float, float]]): Optional smooth cutoff radii in Å.
+        output_file (Optional[str]): Path of the optimized XYZ file. Default is
+                      "opt-<input name>" in the working directory.
+        options (Optional[dict]): Method specific settings, see `optimize_coordinates`.
+        workers (Optional[int]): Number of worker processes. Default is the CPU count.
+        use_cache (bool): Reuse cached results. Default is True.
+        backend (Optional[str]): Kernel backend, see `optimize_coordinates`.
+
+    Returns:
+        int: The number of structures that could not be optimized.
+    """
+    frames = [(atoms, coords) for atoms, coords, _ in iter_xyz_frames(file_path)]
+    results = [None] * len(frames)
+    failed = 0
+    start = time.perf_counter()
+    for index, result, error in optimize_batch(frames, method=method, options=options, cutoff=cutoff,
+                                               workers=workers, use_cache=use_cache, backend=backend):
+        if error is not None:
+            failed += 1
+            print(json.dumps({"index": index, "error": error}), flush=True)
+            continue
+        results[index] = result
+        print(json.dumps({"index": index, "initial_energy": result.initial_energy, "energy": result.energy,
+                          "nfev": result.nfev, "nit": result.nit, "cached": result.cached,
+                          "time": result.timings["total"]}), flush=True)
+
+    # Failed structures are written unchanged so the frames keep their positions
+    if output_file is None:
+        output_file = f"opt-{file_path.split('/')[-1]}"
+    write_xyz_frames(output_file, ((result.atoms, result.coords, str(result.energy)) if result is not None
+                                   else (atoms, coords, "failed") for result, (atoms, coords) in zip(results, frames)))
+    print(f"Optimized {len(frames) - failed}/{len(frames)} structures in {time.perf_counter() - start:.2f} sec. "
+          f"Output saved to {output_file}")
+    return failed
 
 if __name__ == "__main__":
     try:
         # Set up argument parser for command-line usage
         parser = argparse.ArgumentParser(description="Optimize atomic structure from an XYZ file.")
         parser.add_argument("file", type=str, help="Path to the XYZ file.")
-        parser.add_argument("--method", type=str, default="L-BFGS-B", choices=["L-BFGS-B", "basinhopping"],
+        parser.add_argument("--method", type=str, default="L-BFGS-B", choices=METHODS,
                             help="Optimization method to use. Default is 'L-BFGS-B'.")
+        parser.add_argument("--cutoff", type=float, nargs=2, default=None, metavar=("R_ON", "R_OFF"),
+                            help="Smooth cutoff radii in Å. Default is no cutoff.")
+        parser.add_argument("--walkers", type=int, default=None,
+                            help="Number of parallel walkers for 'parallel-basinhopping' or worker processes for 'genetic' and --batch. Default is the CPU count.")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Random seed for the global methods.")
+        parser.add_argument("--steps", type=int, default=None,
+                            help="Number of Monte Carlo steps for 'monte-carlo'.")
+        parser.add_argument("--temperature", type=float, default=None,
+                            help="Temperature kT in eV for 'monte-carlo' and the initial temperature for 'basinhopping'.")
+        parser.add_argument("--niter", type=int, default=None,
+                            help="Maximum number of hops for 'basinhopping'.")
+        parser.add_argument("--stepsize", type=float, default=None,
+                            help="Initial step size in Å for 'basinhopping'.")
+        parser.add_argument("--fixed-step", action="store_true",
+                            help="Keep the step size and temperature of 'basinhopping' constant.")
+        parser.add_argument("--max-nfev", type=int, default=None,
+                            help="Budget of energy evaluations for 'basinhopping'.")
+        parser.add_argument("--patience", type=int, default=None,
+                            help="Stop 'basinhopping' after this many hops without improvement.")
+        parser.add_argument("--population", type=int, default=None,
+                            help="Population size for 'genetic'.")
+        parser.add_argument("--generations", type=int, default=None,
+                            help="Maximum number of generations for 'genetic'.")
+        parser.add_argument("--max-time", type=float, default=None,
+                            help="Wall-clock budget in seconds for 'basinhopping' and 'genetic'.")
+        parser.add_argument("--backend", type=str, default=None, choices=["auto", *available_backends()],
+                            help="Kernel backend of the energy evaluations. Default is CLUSTERWEBLAB_KERNEL or 'auto'.")
+        parser.add_argument("--batch", action="store_true",
+                            help="Optimize every frame of a multi-frame XYZ file in parallel, printing one JSON line per structure.")
+        parser.add_argument("--no-cache", action="store_true",
+                            help="Always optimize, ignoring the result cache.")
         args = parser.parse_args()
         
         # Ensure a file path is provided
@@ -86,7 +543,46 @@ if __name__ == "__main__":
             raise ValueError("No file path provided. Please specify the path to an XYZ file.")
         
         # Call the optimization function with the provided arguments
-        optimize_structure(args.file, method=args.method)
+        options = {}
+        if args.method == "basinhopping":
+            options = {"seed": args.seed, "adaptive": not args.fixed_step}
+            for name in ("niter", "stepsize", "temperature", "max_time", "max_nfev", "patience"):
+                if getattr(args, name) is not None:
+                    options[name] = getattr(args, name)
+        elif args.method == "parallel-basinhopping":
+            options = {"walkers": args.walkers, "seed": args.seed}
+        elif args.method == "monte-carlo":
+            options = {"seed": args.seed}
+            if args.steps is not None:
+                options["nsteps"] = args.steps
+            if args.temperature is not None:
+                options["temperature"] = args.temperature
+        elif args.method == "genetic":
+            options = {"workers": args.walkers, "seed": args.seed, "max_time": args.max_time}
+            if args.population is not None:
+                options["population"] = args.population
+            if args.generations is not None:
+                options["generations"] = args.generations
+        if args.batch:
+            optimize_batch_file(args.file, method=args.method,
+                                cutoff=tuple(args.cutoff) if args.cutoff else None,
+                                options=options, workers=args.walkers, use_cache=not args.no_cache,
+                                backend=args.backend)
+        else:
+            # The first Ctrl+C stops the search and saves the best structure so far
+            cancel = threading.Event()
+
+            def interrupt(signum, frame):
+                if cancel.is_set():
+                    raise KeyboardInterrupt
+                print("Stopping, the best structure so far will be saved (Ctrl+C again to abort)")
+                cancel.set()
+
+            signal.signal(signal.SIGINT, interrupt)
+            optimize_structure(args.file, method=args.method,
+                               cutoff=tuple(args.cutoff) if args.cutoff else None,
+                               options=options, use_cache=not args.no_cache, backend=args.backend,
+                               cancel=cancel)
     except Exception as e:
         # Handle and display any errors that occur
         print(f"Error: {e}")
@@ -1,6 +1,11 @@
-import autograd.numpy as np
-from autograd import elementwise_grad as egrad
-from autograd import hessian as hess
+import os
+import threading
+from functools import lru_cache
+from typing import Iterable
+import numpy as np
+from scipy import sparse
+from .neighbors import NeighborList
+from .kernels import BACKENDS, active_backend
 
 
 parameters = {
@@ -56,6 +61,11 @@ class Gupta:
     
     Args:
         atoms: (list[str]) List of atomic symbols.
+        cutoff: (tuple[float, float] | None) Optional (r_on, r_off) radii in Å. Pair
+            terms are smoothly switched off between both radii with a quintic
+            polynomial tail and only pairs from a neighbor list are evaluated,
+            so each evaluation costs O(n). Without a cutoff every pair is used.
+        skin: (float) Neighbor list buffer distance in Å (only with a cutoff).
         
     Example:
         Variables:
@@ -65,59 +75,62 @@ class Gupta:
                               [0.0, 0.0, 1.0]])
         Instance:
             gupta = Gupta(atoms)
+            gupta = Gupta(atoms, cutoff=(5.5, 7.0)) # Smooth cutoff with a neighbor list
         Methods:
             potential = gupta.potential(coord) # Calculate the potential energy (float)
+            energy, gradient = gupta.energy_and_forces(coord) # Energy and gradient in one pass
             gradient = gupta.gradient(coord) # Calculate the gradient vector (np.ndarray)
+            energies = gupta.potential_batch(coords) # Energies of a (b, n, 3) stack (np.ndarray)
             hessian = gupta.hessian(coord) # Calculate the hessian matrix (np.ndarray)
+            hv = gupta.hessian_vector_product(coord, v) # Hessian times a (n, 3) vector
+            H = gupta.sparse_hessian(coord) # Sparse (3n, 3n) Hessian (scipy.sparse.csr_matrix)
     '''
 
-    def __init__(self, atoms: list[str]) -> None:
+    def __init__(self, atoms: list[str], cutoff: tuple[float, float] | None = None,
+                 skin: float = 0.5) -> None:
         self.atoms = atoms
-        
+        self.cutoff = cutoff
+        self.neighbors = None
+
+        # Map every element to an index and keep a (species, species, 5) parameter table
+        self.species = sorted(set(atoms))
+        index = {atom: k for k, atom in enumerate(self.species)}
+        self.types = np.array([index[atom] for atom in atoms], dtype=int)
+        self.table = np.array([[parameters[f"{a}-{b}"] for b in self.species]
+                               for a in self.species], dtype=float)
+
+        if cutoff is not None:
+            r_on, r_off = cutoff
+            if not 0.0 < r_on < r_off:
+                raise ValueError("The cutoff must satisfy 0 < r_on < r_off.")
+            # Pairs are taken from a neighbor list that is refreshed on demand
+            self.neighbors = NeighborList(r_off, skin)
+            self._lock = threading.Lock()
+            self._pairs = None
+            self._version = -1
+            return
+
         n = len(atoms)
-        idx_ij = []
-        atom_ij = []
 
         # https://docs.scipy.org/doc/scipy/reference/spatial.distance.html also
         # uses this ordering
-        for i in range(n - 1):
-            for j in range(i + 1, n):
-                idx_ij.append([i, j])
-                atom_ij.append((atoms[i], atoms[j]))
-        
-        arr_ij = np.array(idx_ij, dtype=int)
-        self.ai = arr_ij[:, 0]
-        self.aj = arr_ij[:, 1]
-
-        # Access parameters using a more readable format with tuples
-        self.A, self.XI, self.P, self.Q, self.R0 = zip(*[
-            parameters[f"{aij[0]}-{aij[1]}"] for aij in atom_ij
-        ])
-
-        # Convert to numpy arrays for calculations
-        self.A = np.array(self.A, dtype=float)
-        self.XI = np.array(self.XI, dtype=float)
-        self.P = np.array(self.P, dtype=float)
-        self.Q = np.array(self.Q, dtype=float)
-        self.R0 = np.array(self.R0, dtype=float)
+        self.ai, self.aj = np.triu_indices(n, k=1)
+
+        # Gather the parameters of every pair from the species table
+        self.A, self.XI, self.P, self.Q, self.R0 = self._parameters(self.ai, self.aj)
 
         # Calculate these once instead of every time in potential
         self.XI2 = self.XI**2
         self.nP = -self.P
         self.nQ2 = -self.Q * 2
 
-        # Ensure i < j for correct position in the upper triangular matrix
-        def idx(i, j):
-            if j < i:
-                i, j = j, i
-            return n * i + j - ((i + 2) * (i + 1)) // 2
-        
-        # Create a pairwise interaction matrix
-        self.pairwise = np.array([[idx(i, j) for j in range(n) if i != j] for i in range(n)])
-
-        # Precompute the gradient and hessian functions of the potential
-        self.gradient = egrad(self.potential)
-        self.hessian = hess(self.potential)
+        # Create a pairwise interaction matrix: row i holds the index of the pair
+        # (i, j) for every j != i, with i and j swapped so that i < j
+        rows = np.arange(n)[:, None]
+        cols = np.arange(n - 1)[None, :]
+        cols = cols + (cols >= rows)
+        lo, hi = np.minimum(rows, cols), np.maximum(rows, cols)
+        self.pairwise = n * lo + hi - ((lo + 2) * (lo + 1)) // 2
 
 
     def potential(self, coords: np.ndarray) -> float:
@@ -136,6 +149,9 @@ class Gupta:
                 Phys. Rev. B 23, 6265 - Published 15 June 1981
                 https://doi.org/10.1103/PhysRevB.23.6265
         """
+        if self.neighbors is not None:
+            return self.energy_and_forces(coords)[0]
+
         dist = np.linalg.norm(coords[self.ai] - coords[self.aj], axis=1)
         norm = dist / self.R0 - 1.0
         Ub = self.XI2 * np.exp(self.nQ2 * norm)
@@ -145,6 +161,313 @@ class Gupta:
         return U
     
 
+    def energy_and_forces(self, coords: np.ndarray) -> tuple[float, np.ndarray]:
+        """
+        Calculate the potential energy and its analytic gradient in a single pass.
+
+        The pair arrays are evaluated once and reused for both the energy and the
+        derivative, so this is the kernel used by the optimizers. Note that the
+        returned array is the gradient dU/dx (the forces are its negative).
+
+        The evaluation is done by the active kernel backend (see
+        `kernels.use_backend`); this method body is the NumPy reference.
+
+        Args:
+            coords: A matrix with shape (n, 3) (np.ndarray).
+
+        Returns:
+            A tuple with the potential energy (float) and the gradient matrix
+            with shape (n, 3) (np.ndarray).
+        """
+        kernel = BACKENDS[active_backend()]
+        if kernel is not None:
+            return kernel(self, coords)
+
+        n = len(self.atoms)
+        ai, aj, A, XI2, nP, nQ2, R0 = self._pair_arrays(coords)
+        rij = coords[ai] - coords[aj]
+        dist = np.sqrt(np.sum(rij * rij, axis=1))
+        norm = dist / R0 - 1.0
+        Ub = XI2 * np.exp(nQ2 * norm)
+        Ur = A * np.exp(nP * norm)
+        dUb = nQ2 / R0 * Ub
+        dUr = nP / R0 * Ur
+
+        if self.neighbors is not None:
+            # Apply the smooth tail: d(U S)/dr = U' S + U S'
+            S, dS, _ = self._switch(dist)
+            dUb = dUb * S + Ub * dS
+            dUr = dUr * S + Ur * dS
+            Ub = Ub * S
+            Ur = Ur * S
+
+        # Band density of every atom, accumulated from both ends of each pair
+        rho = np.bincount(ai, Ub, n) + np.bincount(aj, Ub, n)
+        sqrt_rho = np.sqrt(rho)
+        U = 2.0 * np.sum(Ur) - np.sum(sqrt_rho)
+
+        # dU/dr for every pair: repulsive part plus the embedding term of both atoms.
+        # Isolated atoms (no neighbors within the cutoff) have no embedding force.
+        inv_sqrt = np.divide(0.5, sqrt_rho, out=np.zeros(n), where=sqrt_rho > 0.0)
+        dU = 2.0 * dUr - (inv_sqrt[ai] + inv_sqrt[aj]) * dUb
+
+        # Project on the pair vectors and scatter back onto the atoms
+        fij = (dU / dist)[:, None] * rij
+        grad = np.zeros((n, 3))
+        for k in range(3):
+            grad[:, k] = np.bincount(ai, fij[:, k], n) - np.bincount(aj, fij[:, k], n)
+        return float(U), grad
+
+
+    def potential_batch(self, coords_batch: np.ndarray, chunk_size: int | None = None) -> np.ndarray:
+        """
+        Calculate the potential energy of many configurations of the same atoms at once.
+
+        Args:
+            coords_batch: A stack of coordinates with shape (b, n, 3) (np.ndarray).
+            chunk_size: Configurations evaluated together. Default keeps every chunk
+                        below BATCH_PAIR_BUDGET pair evaluations to bound memory.
+
+        Returns:
+            The potential energies with shape (b,) (np.ndarray).
+        """
+        return self._batch(coords_batch, chunk_size, with_gradient=False)[0]
+
+
+    def energy_and_forces_batch(self, coords_batch: np.ndarray,
+                                chunk_size: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the energies and gradients of many configurations at once.
+
+        Args:
+            coords_batch: A stack of coordinates with shape (b, n, 3) (np.ndarray).
+            chunk_size: Configurations evaluated together, see `potential_batch`.
+
+        Returns:
+            The potential energies with shape (b,) and the gradients with shape
+            (b, n, 3) (np.ndarray).
+        """
+        return self._batch(coords_batch, chunk_size, with_gradient=True)
+
+
+    def _batch(self, coords_batch: np.ndarray, chunk_size: int | None,
+               with_gradient: bool) -> tuple[np.ndarray, np.ndarray | None]:
+        coords_batch = np.asarray(coords_batch, dtype=float)
+        b, n = coords_batch.shape[:2]
+        energies = np.zeros(b)
+        grads = np.zeros((b, n, 3)) if with_gradient else None
+
+        # Neighbor lists differ between configurations, so evaluate them one by one
+        if self.neighbors is not None:
+            for k in range(b):
+                energies[k], grad = self.energy_and_forces(coords_batch[k])
+                if with_gradient:
+                    grads[k] = grad
+            return energies, grads
+
+        if chunk_size is None:
+            chunk_size = max(1, BATCH_PAIR_BUDGET // max(1, len(self.ai)))
+        for start in range(0, b, chunk_size):
+            coords = coords_batch[start:start + chunk_size]
+            c = len(coords)
+            rij = coords[:, self.ai] - coords[:, self.aj]
+            dist = np.sqrt(np.sum(rij * rij, axis=2))
+            norm = dist / self.R0 - 1.0
+            Ub = self.XI2 * np.exp(self.nQ2 * norm)
+            Ur = self.A * np.exp(self.nP * norm)
+
+            # Offset the atom indices of every configuration to accumulate all
+            # band densities with a single bincount
+            offset = (n * np.arange(c))[:, None]
+            bi = (self.ai + offset).ravel()
+            bj = (self.aj + offset).ravel()
+            rho = (np.bincount(bi, Ub.ravel(), c * n) + np.bincount(bj, Ub.ravel(), c * n)).reshape(c, n)
+            sqrt_rho = np.sqrt(rho)
+            energies[start:start + c] = 2.0 * np.sum(Ur, axis=1) - np.sum(sqrt_rho, axis=1)
+            if not with_gradient:
+                continue
+
+            inv_sqrt = np.divide(0.5, sqrt_rho, out=np.zeros((c, n)), where=sqrt_rho > 0.0)
+            dUr = self.nP / self.R0 * Ur
+            dUb = self.nQ2 / self.R0 * Ub
+            dU = 2.0 * dUr - (inv_sqrt[:, self.ai] + inv_sqrt[:, self.aj]) * dUb
+            fij = (dU / dist)[:, :, None] * rij
+            for k in range(3):
+                fk = fij[:, :, k].ravel()
+                grads[start:start + c, :, k] = (np.bincount(bi, fk, c * n) - np.bincount(bj, fk, c * n)).reshape(c, n)
+        return energies, grads
+
+
+    def _pair_arrays(self, coords: np.ndarray) -> tuple:
+        """
+        Return the pair indices and per-pair parameters used for an evaluation.
+
+        Without a cutoff these are the arrays built at construction time. With a
+        cutoff the neighbor list is refreshed and the parameters are gathered from
+        the species table again only when the list has been rebuilt.
+        """
+        if self.neighbors is None:
+            return self.ai, self.aj, self.A, self.XI2, self.nP, self.nQ2, self.R0
+
+        with self._lock:
+            ai, aj = self.neighbors.update(coords)
+            if self._version != self.neighbors.rebuilds:
+                A, XI, P, Q, R0 = self._parameters(ai, aj)
+                self._pairs = (ai, aj, A, XI**2, -P, -Q * 2, R0)
+                self._version = self.neighbors.rebuilds
+            return self._pairs
+
+
+    def _parameters(self, ai: np.ndarray, aj: np.ndarray) -> tuple[np.ndarray, ...]:
+        """
+        Look up the (A, XI, P, Q, R0) parameters of the given pairs in the species table.
+
+        Args:
+            ai, aj: Atom indices of every pair (np.ndarray).
+
+        Returns:
+            Five contiguous arrays with one value per pair (np.ndarray).
+        """
+        pair = self.table[self.types[ai], self.types[aj]]
+        return tuple(np.ascontiguousarray(column) for column in pair.T)
+
+
+    def _switch(self, dist: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Quintic switching function going smoothly from 1 at r_on to 0 at r_off.
+
+        Args:
+            dist: Pair distances (np.ndarray).
+
+        Returns:
+            The switching values S(r) and their first and second derivatives (np.ndarray).
+        """
+        r_on, r_off = self.cutoff
+        width = r_off - r_on
+        x = np.clip((dist - r_on) / width, 0.0, 1.0)
+        S = 1.0 + x**3 * (-10.0 + x * (15.0 - 6.0 * x))
+        dS = -30.0 * x**2 * (1.0 - x)**2 / width
+        d2S = -60.0 * x * (1.0 - x) * (1.0 - 2.0 * x) / width**2
+        return S, dS, d2S
+
+
+    def _second_order_terms(self, coords: np.ndarray) -> tuple:
+        """
+        Pair and atom terms shared by the Hessian-vector product and the sparse Hessian.
+
+        The energy is written as a sum of effective pair terms phi(r_ij), whose
+        embedding part uses the first derivative of F(rho) = -sqrt(rho), plus the
+        curvature of the embedding, sum_i F''(rho_i) grad(rho_i) grad(rho_i)^T.
+
+        Returns:
+            The pair indices (ai, aj), unit pair vectors u, distances, phi'(r), phi''(r),
+            the band density derivative vectors w = dUb/dr * u of every pair and F''(rho)
+            of every atom.
+        """
+        n = len(self.atoms)
+        ai, aj, A, XI2, nP, nQ2, R0 = self._pair_arrays(coords)
+        rij = coords[ai] - coords[aj]
+        dist = np.sqrt(np.sum(rij * rij, axis=1))
+        u = rij / dist[:, None]
+        norm = dist / R0 - 1.0
+        Ub = XI2 * np.exp(nQ2 * norm)
+        Ur = A * np.exp(nP * norm)
+        kb, kr = nQ2 / R0, nP / R0
+        dUb, d2Ub = kb * Ub, kb**2 * Ub
+        dUr, d2Ur = kr * Ur, kr**2 * Ur
+
+        if self.neighbors is not None:
+            # (U S)'' = U'' S + 2 U' S' + U S''
+            S, dS, d2S = self._switch(dist)
+            d2Ub = d2Ub * S + 2.0 * dUb * dS + Ub * d2S
+            d2Ur = d2Ur * S + 2.0 * dUr * dS + Ur * d2S
+            dUb = dUb * S + Ub * dS
+            dUr = dUr * S + Ur * dS
+            Ub = Ub * S
+
+        rho = np.bincount(ai, Ub, n) + np.bincount(aj, Ub, n)
+        positive = rho > 0.0
+        safe = np.where(positive, rho, 1.0)
+        dF = np.where(positive, -0.5 / np.sqrt(safe), 0.0)
+        d2F = np.where(positive, 0.25 / safe**1.5, 0.0)
+
+        embedding = dF[ai] + dF[aj]
+        d1 = 2.0 * dUr + embedding * dUb
+        d2 = 2.0 * d2Ur + embedding * d2Ub
+        w = dUb[:, None] * u
+        return ai, aj, u, dist, d1, d2, w, d2F
+
+
+    def hessian_vector_product(self, coords: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """
+        Multiply the analytic Hessian at the given coordinates by a vector without
+        building the matrix (O(number of pairs) time and memory).
+
+        Args:
+            coords: A matrix with shape (n, 3) (np.ndarray).
+            v: The vector to multiply, with shape (n, 3) (np.ndarray).
+
+        Returns:
+            The product H v with shape (n, 3) (np.ndarray).
+        """
+        n = len(self.atoms)
+        v = np.asarray(v, dtype=float).reshape(n, 3)
+        ai, aj, u, dist, d1, d2, w, d2F = self._second_order_terms(coords)
+
+        # Pair blocks K = phi'' u u^T + phi'/r (I - u u^T) acting on v_i - v_j
+        dv = v[ai] - v[aj]
+        udv = np.sum(u * dv, axis=1)
+        Kdv = (d2 - d1 / dist)[:, None] * udv[:, None] * u + (d1 / dist)[:, None] * dv
+
+        # Embedding curvature: sum_c F''(rho_c) g_c (g_c . v)
+        wdv = np.sum(w * dv, axis=1)
+        t = d2F * (np.bincount(ai, wdv, n) + np.bincount(aj, wdv, n))
+        contribution = Kdv + (t[ai] + t[aj])[:, None] * w
+
+        out = np.zeros((n, 3))
+        for k in range(3):
+            out[:, k] = np.bincount(ai, contribution[:, k], n) - np.bincount(aj, contribution[:, k], n)
+        return out
+
+
+    def sparse_hessian(self, coords: np.ndarray) -> sparse.csr_matrix:
+        """
+        Assemble the analytic Hessian as a sparse matrix from 3x3 pair blocks plus the
+        embedding curvature term. With a cutoff only atoms within two cutoff radii are
+        coupled, so the matrix stays sparse for large clusters.
+
+        Args:
+            coords: A matrix with shape (n, 3) (np.ndarray).
+
+        Returns:
+            The Hessian matrix with shape (3n, 3n) (scipy.sparse.csr_matrix).
+        """
+        n = len(self.atoms)
+        ai, aj, u, dist, d1, d2, w, d2F = self._second_order_terms(coords)
+
+        # Pair blocks: +K on (i, i) and (j, j), -K on (i, j) and (j, i)
+        uu = u[:, :, None] * u[:, None, :]
+        K = (d2 - d1 / dist)[:, None, None] * uu + (d1 / dist)[:, None, None] * np.eye(3)
+        a = np.arange(3)
+        rows_i = np.broadcast_to(3 * ai[:, None, None] + a[None, :, None], K.shape)
+        rows_j = np.broadcast_to(3 * aj[:, None, None] + a[None, :, None], K.shape)
+        cols_i = np.broadcast_to(3 * ai[:, None, None] + a[None, None, :], K.shape)
+        cols_j = np.broadcast_to(3 * aj[:, None, None] + a[None, None, :], K.shape)
+        rows = np.concatenate([rows_i, rows_j, rows_i, rows_j], axis=None)
+        cols = np.concatenate([cols_i, cols_j, cols_j, cols_i], axis=None)
+        data = np.concatenate([K, K, -K, -K], axis=None)
+        H = sparse.coo_matrix((data, (rows, cols)), shape=(3 * n, 3 * n)).tocsr()
+
+        # Gradients of the band densities as the rows of G, then H += G^T diag(F'') G
+        g_rows = np.concatenate([np.repeat(ai, 3), np.repeat(ai, 3), np.repeat(aj, 3), np.repeat(aj, 3)])
+        col_i = (3 * ai[:, None] + a).ravel()
+        col_j = (3 * aj[:, None] + a).ravel()
+        g_cols = np.concatenate([col_i, col_j, col_i, col_j])
+        g_data = np.concatenate([w.ravel(), -w.ravel(), w.ravel(), -w.ravel()])
+        G = sparse.coo_matrix((g_data, (g_rows, g_cols)), shape=(n, 3 * n)).tocsr()
+        return (H + G.T @ sparse.diags(d2F) @ G).tocsr()
+
+
     def gradient(self, coords: np.ndarray) -> np.ndarray:
         """
         Compute the gradient of the potential with respect to atomic coordinates.
@@ -155,7 +478,7 @@ class Gupta:
         Returns:
             The gradient matrix of the potential with shape (n, 3) (np.ndarray).
         """
-        return egrad(self.potential)(coords)
+        return self.energy_and_forces(coords)[1]
 
 
     def hessian(self, coords: np.ndarray) -> np.ndarray:
@@ -163,9 +486,59 @@ class Gupta:
         Calculate the Hessian matrix of the potential at the given coordinates.
 
         Args:
-            coords: A matrix with shape (3n, 3n) (np.ndarray).
+            coords: A matrix with shape (n, 3) (np.ndarray).
 
         Returns:
             The Hessian matrix of the potential with shape (3n, 3n) (np.ndarray).
         """
-        return hess(self.potential)(coords)
+        return self.sparse_hessian(coords).toarray()
+
+
+# Maximum number of pair terms evaluated together by the batched methods
+BATCH_PAIR_BUDGET = 2_000_000
+
+# Number of prepared potentials kept per process by get_potential (CLUSTERWEBLAB_POTENTIAL_CACHE),
+# large enough to hold the compositions warmed at startup next to the ones in use
+POTENTIAL_CACHE_SIZE = int(os.environ.get("CLUSTERWEBLAB_POTENTIAL_CACHE", 64))
+
+
+@lru_cache(maxsize=POTENTIAL_CACHE_SIZE)
+def _cached_potential(atoms: tuple[str, ...], cutoff: tuple[float, float] | None) -> Gupta:
+    return Gupta(list(atoms), cutoff=cutoff)
+
+
+def get_potential(atoms: list[str], cutoff: tuple[float, float] | None = None) -> Gupta:
+    """
+    Return a prepared Gupta potential for the atom list, reusing a cached instance.
+
+    Potentials are kept in a process-wide LRU cache keyed by the ordered atom list
+    (and the cutoff), so repeated optimizations of the same cluster skip the setup.
+
+    Args:
+        atoms: List of atomic symbols.
+        cutoff: Optional (r_on, r_off) radii in Å, see `Gupta`.
+
+    Returns:
+        The Gupta potential for these atoms (Gupta).
+    """
+    return _cached_potential(tuple(atoms), None if cutoff is None else tuple(cutoff))
+
+
+def warm_potentials(structures: Iterable[tuple[list[str], np.ndarray]],
+                    cutoff: tuple[float, float] | None = None) -> int:
+    """
+    Prepare the cached potentials of the structures and evaluate each one once, so the
+    first optimization of one of these atom lists skips the setup.
+
+    Args:
+        structures: Iterable of (atoms, coords) tuples.
+        cutoff: Optional (r_on, r_off) radii in Å, see `Gupta`.
+
+    Returns:
+        The number of potentials warmed (int).
+    """
+    count = 0
+    for atoms, coords in structures:
+        get_potential(atoms, cutoff=cutoff).energy_and_forces(np.asarray(coords, dtype=float))
+        count += 1
+    return count
@@ -0,0 +1,170 @@
+import numpy as np
+from .gupta import get_potential
+
+
+class IncrementalGupta:
+    '''Stateful Gupta evaluator with O(n) updates for Monte Carlo moves.
+
+    The band density of every atom and the total repulsive energy are cached,
+    so the energy change of moving one atom or swapping two atoms of different
+    elements only needs the pair terms of the changed atoms. A move is first
+    proposed, which returns the energy change without touching the state, and
+    then either accepted or rolled back.
+
+    Args:
+        atoms: (list[str]) List of atomic symbols.
+        coords: (np.ndarray) Coordinates with shape (n, 3).
+        cutoff: (tuple[float, float] | None) Optional (r_on, r_off) radii in Å, see `Gupta`.
+        refresh_interval: (int) Accepted moves after which the cached terms are
+            recomputed from scratch to remove accumulated rounding errors.
+
+    Example:
+        state = IncrementalGupta(atoms, coords)
+        delta = state.propose_move(3, coords[3] + 0.1) # Energy change of moving atom 3
+        delta = state.propose_swap(0, 12) # Energy change of exchanging atoms 0 and 12
+        state.accept() # or state.rollback()
+        state.energy # Current energy (float)
+    '''
+
+    def __init__(self, atoms: list[str], coords: np.ndarray,
+                 cutoff: tuple[float, float] | None = None, refresh_interval: int = 1000) -> None:
+        self.gupta = get_potential(atoms, cutoff=cutoff)
+        self.species = self.gupta.species
+        self.table = self.gupta.table
+        self.types = self.gupta.types.copy()
+        self.coords = np.array(coords, dtype=float).reshape(-1, 3)
+        self.refresh_interval = refresh_interval
+        self._pending = None
+        self._accepted = 0
+        self.refresh()
+
+
+    @property
+    def atoms(self) -> list[str]:
+        """
+        Current atomic symbols (they change with accepted swaps).
+        """
+        return [self.species[t] for t in self.types]
+
+
+    def refresh(self) -> float:
+        """
+        Recompute the cached band densities, repulsive energy and total energy.
+
+        Returns:
+            The energy of the current state (float).
+        """
+        n = len(self.coords)
+        ai, aj = np.triu_indices(n, k=1)
+        Ub, Ur = self._pair_terms(self.coords[ai] - self.coords[aj], self.types[ai], self.types[aj])
+        self.rho = np.bincount(ai, Ub, n) + np.bincount(aj, Ub, n)
+        self.repulsive = float(np.sum(Ur))
+        self.energy = 2.0 * self.repulsive - float(np.sum(np.sqrt(self.rho)))
+        self._pending = None
+        return self.energy
+
+
+    def _pair_terms(self, rij: np.ndarray, ti: np.ndarray, tj: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Band (XI^2 exp(...)) and repulsive (A exp(...)) terms of the given pairs.
+        """
+        A, XI, P, Q, R0 = np.moveaxis(self.table[ti, tj], -1, 0)
+        dist = np.sqrt(np.sum(rij * rij, axis=-1))
+        norm = dist / R0 - 1.0
+        Ub = XI**2 * np.exp(-2.0 * Q * norm)
+        Ur = A * np.exp(-P * norm)
+        if self.gupta.cutoff is not None:
+            S = self.gupta._switch(dist)[0]
+            Ub, Ur = Ub * S, Ur * S
+        return Ub, Ur
+
+
+    def _contributions(self, changed: np.ndarray, coords: np.ndarray,
+                       types: np.ndarray) -> tuple[np.ndarray, float]:
+        """
+        Band density and repulsive energy of all pairs involving the changed atoms.
+
+        Returns:
+            The band density contributed to every atom with shape (n,) and the summed
+            repulsive terms (float).
+        """
+        n = len(coords)
+        m = len(changed)
+        Ub, Ur = self._pair_terms(coords[None, :, :] - coords[changed][:, None, :],
+                                  types[changed][:, None], types[None, :])
+
+        # Count every pair once: skip the atom itself and changed atoms of earlier rows
+        mask = np.ones((m, n), dtype=bool)
+        for r in range(m):
+            mask[r:, changed[r]] = False
+        Ub = np.where(mask, Ub, 0.0)
+        Ur = np.where(mask, Ur, 0.0)
+
+        rho = np.sum(Ub, axis=0)
+        np.add.at(rho, changed, np.sum(Ub, axis=1))
+        return rho, float(np.sum(Ur))
+
+
+    def _propose(self, changed: np.ndarray, coords: np.ndarray, types: np.ndarray) -> float:
+        old_rho, old_rep = self._contributions(changed, self.coords, self.types)
+        new_rho, new_rep = self._contributions(changed, coords, types)
+        rho = np.maximum(self.rho - old_rho + new_rho, 0.0)
+        repulsive = self.repulsive - old_rep + new_rep
+        energy = 2.0 * repulsive - float(np.sum(np.sqrt(rho)))
+        self._pending = (coords, types, rho, repulsive, energy)
+        return energy - self.energy
+
+
+    def propose_move(self, k: int, position: np.ndarray) -> float:
+        """
+        Energy change of moving atom `k` to a new position, in O(n).
+
+        Args:
+            k: Index of the atom.
+            position: New position with shape (3,).
+
+        Returns:
+            The energy change in eV (float).
+        """
+        coords = self.coords.copy()
+        coords[k] = position
+        return self._propose(np.array([k]), coords, self.types)
+
+
+    def propose_swap(self, a: int, b: int) -> float:
+        """
+        Energy change of exchanging the elements of atoms `a` and `b`, in O(n).
+
+        Args:
+            a, b: Indices of the atoms.
+
+        Returns:
+            The energy change in eV (float).
+        """
+        types = self.types.copy()
+        types[a], types[b] = self.types[b], self.types[a]
+        return self._propose(np.array([a, b]), self.coords, types)
+
+
+    def accept(self) -> float:
+        """
+        Apply the last proposed move.
+
+        Returns:
+            The new energy (float).
+        """
+        if self._pending is None:
+            raise RuntimeError("No move has been proposed.")
+        self.coords, self.types, self.rho, self.repulsive, self.energy = self._pending
+        self._pending = None
+        self._accepted += 1
+        if self._accepted % self.refresh_interval == 0:
+            self.refresh()
+        return self.energy
+
+
+    def rollback(self) -> None:
+        """
+        Discard the last proposed move, keeping the current state.
+        """
+        self._pending = None
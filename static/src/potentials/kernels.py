@@ -0,0 +1,313 @@
+# Pluggable energy and gradient kernels of the Gupta potential
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Numba is optional, the NumPy kernel is always available
+    numba = None
+
+# Atoms from which the all-pairs Numba kernel runs its loops in parallel threads. It
+# visits every pair twice, so it needs more than two threads to beat the serial kernel.
+PARALLEL_THRESHOLD = 256
+
+
+def _switch(d: float, r_on: float, r_off: float) -> tuple[float, float]:
+    # Quintic switching function and its derivative, see Gupta._switch
+    width = r_off - r_on
+    x = min(max((d - r_on) / width, 0.0), 1.0)
+    S = 1.0 + x**3 * (-10.0 + x * (15.0 - 6.0 * x))
+    dS = -30.0 * x**2 * (1.0 - x)**2 / width
+    return S, dS
+
+
+def _pair_kernel(coords, types, table, ai, aj, r_on, r_off):
+    """
+    Energy and gradient over an explicit pair list, one pass for the band densities
+    and one for the gradient. Only (n,) and (n, 3) arrays are allocated; r_off <= 0
+    disables the smooth cutoff.
+    """
+    n = coords.shape[0]
+    smooth = r_off > 0.0
+    rho = np.zeros(n)
+    energy = 0.0
+    for p in range(ai.shape[0]):
+        i, j = ai[p], aj[p]
+        t = table[types[i], types[j]]
+        A, XI, P, Q, R0 = t[0], t[1], t[2], t[3], t[4]
+        dx = coords[i, 0] - coords[j, 0]
+        dy = coords[i, 1] - coords[j, 1]
+        dz = coords[i, 2] - coords[j, 2]
+        d = np.sqrt(dx * dx + dy * dy + dz * dz)
+        x = d / R0 - 1.0
+        Ub = XI * XI * np.exp(-2.0 * Q * x)
+        Ur = A * np.exp(-P * x)
+        if smooth:
+            S, dS = _switch(d, r_on, r_off)
+            Ub *= S
+            Ur *= S
+        rho[i] += Ub
+        rho[j] += Ub
+        energy += 2.0 * Ur
+
+    inv_sqrt = np.zeros(n)
+    for i in range(n):
+        if rho[i] > 0.0:
+            s = np.sqrt(rho[i])
+            energy -= s
+            inv_sqrt[i] = 0.5 / s
+
+    grad = np.zeros((n, 3))
+    for p in range(ai.shape[0]):
+        i, j = ai[p], aj[p]
+        t = table[types[i], types[j]]
+        A, XI, P, Q, R0 = t[0], t[1], t[2], t[3], t[4]
+        dx = coords[i, 0] - coords[j, 0]
+        dy = coords[i, 1] - coords[j, 1]
+        dz = coords[i, 2] - coords[j, 2]
+        d = np.sqrt(dx * dx + dy * dy + dz * dz)
+        x = d / R0 - 1.0
+        Ub = XI * XI * np.exp(-2.0 * Q * x)
+        Ur = A * np.exp(-P * x)
+        dUb = -2.0 * Q / R0 * Ub
+        dUr = -P / R0 * Ur
+        if smooth:
+            S, dS = _switch(d, r_on, r_off)
+            dUb = dUb * S + Ub * dS
+            dUr = dUr * S + Ur * dS
+        f = (2.0 * dUr - (inv_sqrt[i] + inv_sqrt[j]) * dUb) / d
+        grad[i, 0] += f * dx
+        grad[i, 1] += f * dy
+        grad[i, 2] += f * dz
+        grad[j, 0] -= f * dx
+        grad[j, 1] -= f * dy
+        grad[j, 2] -= f * dz
+    return energy, grad
+
+
+def _all_pairs_kernel(coords, types, table):
+    """
+    Energy and gradient over all pairs with one parallel loop per atom. Every pair is
+    visited from both ends, so each thread only writes the rows of its own atoms.
+    """
+    n = coords.shape[0]
+    rho = np.zeros(n)
+    repulsive = np.zeros(n)
+    for i in numba.prange(n):
+        ti = types[i]
+        r = 0.0
+        u = 0.0
+        for j in range(n):
+            if j == i:
+                continue
+            t = table[ti, types[j]]
+            A, XI, P, Q, R0 = t[0], t[1], t[2], t[3], t[4]
+            dx = coords[i, 0] - coords[j, 0]
+            dy = coords[i, 1] - coords[j, 1]
+            dz = coords[i, 2] - coords[j, 2]
+            x = np.sqrt(dx * dx + dy * dy + dz * dz) / R0 - 1.0
+            r += XI * XI * np.exp(-2.0 * Q * x)
+            u += A * np.exp(-P * x)
+        rho[i] = r
+        repulsive[i] = u
+
+    energy = 0.0
+    inv_sqrt = np.zeros(n)
+    for i in range(n):
+        energy += repulsive[i]
+        if rho[i] > 0.0:
+            s = np.sqrt(rho[i])
+            energy -= s
+            inv_sqrt[i] = 0.5 / s
+
+    grad = np.zeros((n, 3))
+    for i in numba.prange(n):
+        ti = types[i]
+        gx = 0.0
+        gy = 0.0
+        gz = 0.0
+        for j in range(n):
+            if j == i:
+                continue
+            t = table[ti, types[j]]
+            A, XI, P, Q, R0 = t[0], t[1], t[2], t[3], t[4]
+            dx = coords[i, 0] - coords[j, 0]
+            dy = coords[i, 1] - coords[j, 1]
+            dz = coords[i, 2] - coords[j, 2]
+            d = np.sqrt(dx * dx + dy * dy + dz * dz)
+            x = d / R0 - 1.0
+            dUb = -2.0 * Q / R0 * XI * XI * np.exp(-2.0 * Q * x)
+            dUr = -P / R0 * A * np.exp(-P * x)
+            f = (2.0 * dUr - (inv_sqrt[i] + inv_sqrt[j]) * dUb) / d
+            gx += f * dx
+            gy += f * dy
+            gz += f * dz
+        grad[i, 0] = gx
+        grad[i, 1] = gy
+        grad[i, 2] = gz
+    return energy, grad
+
+
+if numba is not None:
+    # TBB, preferred by Numba when installed, leaves the process hanging at exit once the
+    # job and walker pools have forked it. The workqueue layer is fork-safe.
+    if "NUMBA_THREADING_LAYER" not in os.environ:
+        numba.config.THREADING_LAYER = "workqueue"
+    _switch = numba.njit(cache=True, inline="always")(_switch)
+    _pair_kernel = numba.njit(cache=True)(_pair_kernel)
+    _all_pairs_kernel = numba.njit(cache=True, parallel=True)(_all_pairs_kernel)
+
+# The workqueue threading layer of Numba does not allow concurrent parallel
+# launches, so web threads take turns on the parallel kernel
+_parallel_lock = threading.Lock()
+
+
+def numba_energy_and_forces(gupta, coords: np.ndarray) -> tuple[float, np.ndarray]:
+    """
+    Energy and gradient of a Gupta potential with the compiled Numba kernels.
+
+    Args:
+        gupta: The Gupta potential.
+        coords: A matrix with shape (n, 3) (np.ndarray).
+
+    Returns:
+        The potential energy (float) and the gradient with shape (n, 3) (np.ndarray).
+    """
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    if gupta.neighbors is not None:
+        ai, aj = gupta._pair_arrays(coords)[:2]
+        r_on, r_off = gupta.cutoff
+        energy, grad = _pair_kernel(coords, gupta.types, gupta.table, ai, aj, float(r_on), float(r_off))
+    elif len(coords) >= PARALLEL_THRESHOLD and _parallel.get() and numba.get_num_threads() > 2:
+        with _parallel_lock:
+            energy, grad = _all_pairs_kernel(coords, gupta.types, gupta.table)
+    else:
+        energy, grad = _pair_kernel(coords, gupta.types, gupta.table, gupta.ai, gupta.aj, 0.0, 0.0)
+    return float(energy), grad
+
+
+# Kernels by backend name. "numpy" is the reference implementation in Gupta itself.
+BACKENDS = {"numpy": None}
+if numba is not None:
+    BACKENDS["numba"] = numba_energy_and_forces
+
+
+def resolve_backend(name: str) -> str:
+    """
+    Resolve a backend name, "auto" selects Numba when it is installed.
+
+    Raises:
+        ValueError: If the backend is unknown or not available here.
+    """
+    if name == "auto":
+        return "numba" if "numba" in BACKENDS else "numpy"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable kernel backend: {name} "
+                         f"(available: {', '.join(available_backends())})")
+    return name
+
+
+def available_backends() -> list[str]:
+    """
+    Names of the backends that can be selected in this process.
+    """
+    return list(BACKENDS)
+
+
+def _default_backend() -> str:
+    name = os.environ.get("CLUSTERWEBLAB_KERNEL", "auto")
+    try:
+        return resolve_backend(name)
+    except ValueError as e:
+        print(f"{e}, using numpy")
+        return "numpy"
+
+
+# Process-wide default from CLUSTERWEBLAB_KERNEL (auto, numpy or numba)
+DEFAULT_BACKEND = _default_backend()
+
+# Backend and threading of the current request, see `use_backend`
+_backend: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("kernel_backend", default=None)
+_parallel: contextvars.ContextVar[bool] = contextvars.ContextVar("kernel_parallel", default=True)
+
+
+def active_backend() -> str:
+    """
+    Backend used by `Gupta.energy_and_forces` in the current context.
+    """
+    return _backend.get() or DEFAULT_BACKEND
+
+
+@contextmanager
+def use_backend(name: Optional[str] = None, parallel: Optional[bool] = None) -> Iterator[str]:
+    """
+    Select the kernel backend for the code run inside the block.
+
+    Args:
+        name: Backend name ("numpy", "numba" or "auto"). Default keeps the active backend.
+        parallel: Allow multithreaded kernels. Disable it in worker processes that
+                  already run in parallel. Default keeps the active setting.
+
+    Yields:
+        The resolved backend name.
+
+    Raises:
+        ValueError: If the backend is unknown or not available here.
+    """
+    name = active_backend() if name is None else resolve_backend(name)
+    backend_token = _backend.set(name)
+    parallel_token = _parallel.set(_parallel.get() if parallel is None else parallel)
+    try:
+        yield name
+    finally:
+        _parallel.reset(parallel_token)
+        _backend.reset(backend_token)
+
+
+def warm_up(tolerance: float = 1e-8) -> dict[str, float]:
+    """
+    Compile every backend and verify it against the NumPy reference implementation on
+    small clusters with and without a cutoff, and on one large enough for the
+    parallel kernel. A backend that disagrees is removed from BACKENDS.
+
+    Args:
+        tolerance: Largest accepted relative error of the energy and the gradient.
+
+    Returns:
+        The warm-up time in seconds of every verified backend (dict[str, float]).
+    """
+    global DEFAULT_BACKEND
+    from .gupta import Gupta
+
+    rng = np.random.default_rng(0)
+    cases = []
+    for n, cutoff in ((13, None), (38, (4.0, 5.5)), (PARALLEL_THRESHOLD, None)):
+        atoms = ["Pd", "Pt", "Au"] * (n // 3) + ["Pd"] * (n % 3)
+        coords = rng.uniform(-1.0, 1.0, (n, 3)) * 1.6 * n ** (1.0 / 3.0)
+        reference = Gupta(atoms, cutoff=cutoff)
+        with use_backend("numpy"):
+            cases.append((reference, coords, *reference.energy_and_forces(coords)))
+
+    timings = {}
+    for name in available_backends():
+        start = time.perf_counter()
+        try:
+            with use_backend(name):
+                for gupta, coords, energy, grad in cases:
+                    e, g = gupta.energy_and_forces(coords)
+                    if (abs(e - energy) > tolerance * abs(energy)
+                            or np.max(np.abs(g - grad)) > tolerance * max(1.0, np.max(np.abs(grad)))):
+                        raise ValueError(f"energy {e} vs {energy}, gradient error {np.max(np.abs(g - grad)):.3e}")
+        except Exception as e:
+            print(f"Kernel backend {name} disabled, it does not match the reference: {e}")
+            del BACKENDS[name]
+            if DEFAULT_BACKEND == name:
+                DEFAULT_BACKEND = "numpy"
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
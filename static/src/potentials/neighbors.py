@@ -0,0 +1,69 @@
+import threading
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class NeighborList:
+    '''Verlet neighbor list built with a KD-tree and reused while atoms stay close.
+
+    The list stores every pair closer than `cutoff + skin` and is only rebuilt when
+    some atom has moved more than half of the skin distance since the last build,
+    so during a local minimization the pairs are usually computed a handful of times.
+
+    Args:
+        cutoff: (float) Interaction cutoff radius (Å).
+        skin: (float) Extra buffer distance added to the cutoff (Å).
+
+    Example:
+        neighbors = NeighborList(cutoff=6.0, skin=0.5)
+        ai, aj = neighbors.update(coords) # Pair indices with ai < aj
+    '''
+
+    def __init__(self, cutoff: float, skin: float = 0.5) -> None:
+        self.cutoff = float(cutoff)
+        self.skin = float(skin)
+        self.ai = np.zeros(0, dtype=int)
+        self.aj = np.zeros(0, dtype=int)
+        self.rebuilds = 0
+        self._reference = None
+        self._lock = threading.Lock()
+
+
+    def needs_rebuild(self, coords: np.ndarray) -> bool:
+        """
+        Check whether the stored pairs are still valid for the given coordinates.
+
+        Args:
+            coords: A matrix with shape (n, 3) (np.ndarray).
+
+        Returns:
+            True if the list must be rebuilt (bool).
+        """
+        if self._reference is None or self._reference.shape != coords.shape:
+            return True
+        displacement = np.sum((coords - self._reference)**2, axis=1)
+        return bool(np.max(displacement) > (0.5 * self.skin)**2)
+
+
+    def update(self, coords: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rebuild the list if needed and return the current pair indices.
+
+        Args:
+            coords: A matrix with shape (n, 3) (np.ndarray).
+
+        Returns:
+            Two index arrays (ai, aj) with ai < aj for every pair within range.
+        """
+        coords = np.asarray(coords, dtype=float)
+        with self._lock:
+            if self.needs_rebuild(coords):
+                tree = cKDTree(coords)
+                pairs = tree.query_pairs(self.cutoff + self.skin, output_type="ndarray")
+                # Sort the pairs so memory access follows the atom order
+                order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+                self.ai = pairs[order, 0].astype(int)
+                self.aj = pairs[order, 1].astype(int)
+                self._reference = coords.copy()
+                self.rebuilds += 1
+            return self.ai, self.aj
@@ -1,5 +1,191 @@
+import io
+import mmap
+import os
+from typing import BinaryIO, Iterator
 import numpy as np
 
+# Bytes of a memory-mapped file searched for line breaks at once by XYZIndex
+SCAN_CHUNK = 64 * 2**20
+
+def parse_frame(lines: list[bytes]) -> tuple[list[str], np.ndarray]:
+    """
+    Parse the atom lines of one xyz frame.
+
+    The lines are split into a single token array and converted column-wise by
+    NumPy, so no per-atom Python float objects are created. Extra columns
+    (e.g. forces) are ignored.
+
+    Args:
+        lines: atom lines of the frame as bytes.
+
+    Returns:
+        A tuple containing the atom types (list[str]) and the coordinates (np.ndarray).
+    """
+    if not lines:
+        return [], np.zeros((0, 3))
+    tokens = np.array(b" ".join(lines).split())
+    columns = len(lines[0].split())
+    if columns >= 4 and tokens.size == columns * len(lines):
+        table = tokens.reshape(len(lines), columns)
+    else:
+        # Rows with different numbers of columns, keep the first four of each
+        table = np.array([line.split()[:4] for line in lines])
+    return table[:, 0].astype(str).tolist(), table[:, 1:4].astype(float)
+
+def _read_frames(file: BinaryIO) -> Iterator[tuple[list[str], np.ndarray, str]]:
+    # Frames of an open binary stream, blank lines between frames are skipped
+    while True:
+        header = file.readline()
+        if not header:
+            return
+        if not header.strip():
+            continue
+        num_atoms = int(header)
+        comment = file.readline().decode().rstrip("\r\n")
+        lines = [file.readline() for _ in range(num_atoms)]
+        if lines and not lines[-1]:
+            raise ValueError(f"Truncated frame: expected {num_atoms} atoms.")
+        atoms, coords = parse_frame(lines)
+        yield atoms, coords, comment
+
+def iter_xyz_frames(path: str) -> Iterator[tuple[list[str], np.ndarray, str]]:
+    """
+    Lazily read the frames of a (multi-frame) xyz file.
+
+    Only one frame is held in memory at a time, so trajectories of any size can be
+    processed with constant memory.
+
+    Args:
+        path: path to the xyz file.
+
+    Yields:
+        Tuples with the atom types (list[str]), the coordinates (np.ndarray) and the
+        comment line (str) of every frame.
+    """
+    with open(path, "rb") as file:
+        yield from _read_frames(file)
+
+def parse_xyz_frames(content: str) -> Iterator[tuple[list[str], np.ndarray, str]]:
+    """
+    Parse the text of a (multi-frame) xyz file, see `iter_xyz_frames`.
+
+    Args:
+        content: text with one or more concatenated xyz frames.
+
+    Yields:
+        Tuples with the atom types, the coordinates and the comment line of every frame.
+    """
+    yield from _read_frames(io.BytesIO(content.encode()))
+
+class XYZIndex:
+    '''Byte-offset index of a multi-frame xyz file for random access to frames.
+
+    The file is memory mapped and scanned once to record where every frame starts.
+    The offsets can be saved next to the file (`<path>.idx.npy`) and are reused as
+    long as the file size and modification time are unchanged.
+
+    Args:
+        path: (str) Path to the xyz file.
+        cache: (bool) Load and store the offsets in `<path>.idx.npy`.
+
+    Example:
+        index = XYZIndex("trajectory.xyz")
+        len(index) # Number of frames
+        atoms, coords, comment = index[1000]
+    '''
+
+    def __init__(self, path: str, cache: bool = True) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        stat = os.stat(path)
+        stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        index_path = f"{path}.idx.npy"
+
+        offsets = None
+        if cache and os.path.exists(index_path):
+            stored = np.load(index_path)
+            if np.array_equal(stored[:2], stamp):
+                offsets = stored[2:]
+        if offsets is None:
+            offsets = self._scan()
+            if cache:
+                try:
+                    np.save(index_path, np.concatenate([stamp, offsets]))
+                except OSError:
+                    pass
+        # The last offset marks the end of the last frame
+        self.offsets = offsets
+
+    def _scan(self) -> np.ndarray:
+        # The line starts are found with NumPy, chunk by chunk to bound the memory, so the
+        # Python loop only visits the frame headers
+        data = self._map
+        end = len(data)
+        newlines = [np.flatnonzero(np.frombuffer(data, dtype=np.uint8, count=min(SCAN_CHUNK, end - start),
+                                                 offset=start) == ord("\n")) + start
+                    for start in range(0, end, SCAN_CHUNK)]
+        starts = np.concatenate([[0]] + newlines).astype(np.int64)
+        starts[1:] += 1
+        starts = starts[starts < end]
+
+        offsets = []
+        line = 0
+        while line < len(starts):
+            line_end = starts[line + 1] if line + 1 < len(starts) else end
+            header = data[starts[line]:line_end].strip()
+            if not header:
+                line += 1
+                continue
+            offsets.append(starts[line])
+            # Skip the comment line and the atom lines
+            line += int(header) + 2
+        offsets.append(starts[line] if line < len(starts) else end)
+        return np.array(offsets, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k: int) -> tuple[list[str], np.ndarray, str]:
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(f"Frame {k} out of range for {len(self)} frames.")
+        lines = self._map[self.offsets[k]:self.offsets[k + 1]].splitlines()
+        num_atoms = int(lines[0])
+        atoms, coords = parse_frame(lines[2:2 + num_atoms])
+        return atoms, coords, lines[1].decode().rstrip("\r") if len(lines) > 1 else ""
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "XYZIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def parse_xyz(content: str) -> tuple[list[str], np.ndarray]:
+    """
+    Parse the text of an xyz file and return atoms types and the coordinates.
+
+    Args:
+        content: text of the xyz file (atom count, comment line and atom lines).
+
+    Returns:
+        A tuple containing the atom types (list[str]) and the coordinates (np.ndarray).
+    """
+    lines = content.encode().splitlines()
+    num_atoms = int(lines[0])
+    atoms, coordinates = parse_frame(lines[2:2 + num_atoms])
+
+    if len(atoms) != num_atoms:
+        raise ValueError(f"Expected {num_atoms} atoms but found {len(atoms)}.")
+    return atoms, coordinates
+
 def read_xyz_file(path: str) -> tuple[list[str], np.ndarray]:
     """
     Read an xyz file and return atoms types and the coordinates.
@@ -10,14 +196,5 @@ def read_xyz_file(path: str) -> tuple[list[str], np.ndarray]:
     Returns:
         A tuple containing the coordinates (np.ndarray) and atom types (list[str]).
     """
-    atoms = []
-    coordinates = []
     with open(path, "r") as file:
-        for i, line in enumerate(file):
-            if i < 2:
-                continue
-            atom, *xyz = line.split()
-            atoms.append(atom)
-            coordinates.append(xyz)
-    
-    return atoms, np.array(coordinates, dtype=float)
+        return parse_xyz(file.read())
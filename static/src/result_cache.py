@@ -0,0 +1,224 @@
+# Content-addressed cache of optimization results with a memory tier and a disk tier
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+# Bump when the cached values or the key layout change
+CACHE_VERSION = 1
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                 ".cache", "results")
+
+
+def cache_key(atoms: list[str], coords: np.ndarray, method: str, options: Optional[dict] = None,
+              tolerance: float = 1e-4) -> str:
+    """
+    Build the canonical hash of an optimization request.
+
+    Args:
+        atoms: list of atom types.
+        coords: coordinates with shape (n, 3).
+        method: optimization method.
+        options: optimizer settings that change the result (JSON serializable).
+        tolerance: coordinates are rounded to multiples of this value (Å).
+    Returns:
+        A hexadecimal SHA-256 digest (str).
+    """
+    rounded = np.round(np.asarray(coords, dtype=float) / tolerance).astype(np.int64)
+    header = json.dumps({"version": CACHE_VERSION, "atoms": list(atoms), "method": method,
+                         "options": options or {}, "tolerance": tolerance},
+                        sort_keys=True, default=str)
+    digest = hashlib.sha256(header.encode())
+    digest.update(rounded.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    '''Two-tier cache of optimization results keyed by `cache_key`.
+
+    Recent results live in an in-process LRU dictionary. All results are also
+    written as small JSON files to a directory shared by every worker process.
+    Files are replaced atomically, and the disk tier is trimmed to its size
+    limit under an advisory file lock. Entries unused for `ttl` seconds expire.
+
+    Args:
+        directory: (str | None) Location of the disk tier, None keeps results in memory only.
+        max_entries: (int) Number of results kept in memory.
+        max_bytes: (int) Size limit of the disk tier.
+        ttl: (float) Seconds after the last use before a disk entry expires.
+
+    Example:
+        cache = ResultCache("/tmp/results")
+        key = cache_key(atoms, coords, "L-BFGS-B")
+        if (value := cache.get(key)) is None:
+            cache.put(key, {"energy": -46.0})
+    '''
+
+    def __init__(self, directory: Optional[str] = DEFAULT_DIRECTORY, max_entries: int = 256,
+                 max_bytes: int = 256 * 2**20, ttl: float = 7 * 24 * 3600) -> None:
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_trim = 0.0
+
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Look up a result, promoting disk entries to the memory tier.
+
+        Args:
+            key: key built with `cache_key`.
+        Returns:
+            The cached value or None (dict | None).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self._memory[key] = (now, entry[1])
+                self.hits += 1
+                return entry[1]
+
+        value = self._read(key, now) if self.directory else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, now)
+        return value
+
+
+    def put(self, key: str, value: dict) -> None:
+        """
+        Store a result in both tiers.
+
+        Args:
+            key: key built with `cache_key`.
+            value: JSON serializable result.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if not self.directory:
+            return
+        try:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Result cache write failed: {e}")
+            return
+        if now - self._last_trim > 60.0:
+            self._last_trim = now
+            self.trim()
+
+
+    def _remember(self, key: str, value: dict, now: float) -> None:
+        # Called with the lock held
+        self._memory[key] = (now, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+    def _read(self, key: str, now: float) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            if now - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r") as f:
+                value = json.load(f)
+            # The modification time tracks the last use for the LRU and TTL policies
+            os.utime(path, (now, now))
+            return value
+        except (OSError, ValueError):
+            return None
+
+
+    def trim(self) -> None:
+        """
+        Remove expired disk entries and the least recently used ones above the size
+        limit. Only one process trims at a time, the others skip the pass.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            now = time.time()
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith(".json"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.ttl:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass  # Already removed by a reader or another process
+                    else:
+                        entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters of this process.
+
+        Returns:
+            A dictionary with the counters and the memory tier size (dict).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "memory_entries": len(self._memory)}
+
+
+# Process-wide cache configured from the environment
+result_cache = ResultCache(
+    directory=os.environ.get("CLUSTERWEBLAB_CACHE_DIR", DEFAULT_DIRECTORY) or None,
+    max_entries=int(os.environ.get("CLUSTERWEBLAB_CACHE_ENTRIES", 256)),
+    max_bytes=int(float(os.environ.get("CLUSTERWEBLAB_CACHE_MB", 256)) * 2**20),
+    ttl=float(os.environ.get("CLUSTERWEBLAB_CACHE_TTL", 7 * 24 * 3600)))
@@ -3,7 +3,15 @@
 import sys
 import re
 import numpy as np
+from typing import Optional
 from write_xyz import write_xyz_file
+from potentials.gupta import get_potential, parameters
+
+# Initial cluster shapes of generate_cluster_coordinates
+SHAPES = ("sphere", "shell", "fcc", "icosahedral")
+
+# Volume of the starting sphere relative to a close-packed cluster of the same atoms
+EXPANSION = 1.5
 
 def parse_atom_sequence(sequence: str) -> list[str]:
     """
@@ -24,29 +32,213 @@ def parse_atom_sequence(sequence: str) -> list[str]:
         atoms.extend([atom] * count)  # Add the atom 'count' times to the list
     return atoms
 
-def generate_random_coordinates(num_atoms: int) -> np.ndarray:
+def generate_random_coordinates(num_atoms: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
     """
     Generate random coordinates for a given number of atoms.
     
     Args:
         num_atoms: number of atoms.
+        rng: random number generator, for reproducible structures. Default is the
+             global NumPy generator.
     Returns:
         Array of random coordinates.
     """
-    return np.random.uniform(low=-5.0, high=5.0, size=(num_atoms, 3))
+    return (rng or np.random).uniform(low=-5.0, high=5.0, size=(num_atoms, 3))
+
+def generate_screened_coordinates(atoms: list[str], num_candidates: int = 1000, keep: int = 1,
+                                  chunk_size: int = 256,
+                                  rng: Optional[np.random.Generator] = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generate many random structures and keep only the lowest-energy candidates.
+
+    The candidates are generated and evaluated in chunks with the batched Gupta
+    potential, so memory stays bounded whatever the number of candidates.
+
+    Args:
+        atoms: list of atom types.
+        num_candidates: number of random structures to evaluate.
+        keep: number of lowest-energy structures to return.
+        chunk_size: number of structures generated and evaluated together.
+        rng: random number generator of the candidates, see `generate_random_coordinates`.
+    Returns:
+        The kept coordinates with shape (keep, n, 3) and their energies, sorted by energy.
+    """
+    gupta = get_potential(atoms)
+    keep = max(1, min(keep, num_candidates))
+    best_coords = np.zeros((0, len(atoms), 3))
+    best_energies = np.zeros(0)
+    for start in range(0, num_candidates, chunk_size):
+        size = min(chunk_size, num_candidates - start)
+        coords = np.stack([generate_random_coordinates(len(atoms), rng) for _ in range(size)])
+        energies = gupta.potential_batch(coords)
+
+        # Merge with the current best candidates and keep the lowest ones
+        best_coords = np.concatenate([best_coords, coords])
+        best_energies = np.concatenate([best_energies, energies])
+        order = np.argsort(best_energies)[:keep]
+        best_coords, best_energies = best_coords[order], best_energies[order]
+    return best_coords, best_energies
+
+def _nearest_neighbor_distances(atoms: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Element index of every atom and the R0 distances of every pair of elements.
+    """
+    species = sorted(set(atoms))
+    types = np.array([species.index(atom) for atom in atoms])
+    r0 = np.array([[parameters[f"{a}-{b}"][4] for b in species] for a in species])
+    return types, r0
+
+def _rejection_sample(types: np.ndarray, min_dist: np.ndarray, propose, rng: np.random.Generator,
+                      max_attempts: int = 1000) -> np.ndarray:
+    """
+    Place atoms one by one at random positions that keep the minimum distances.
+
+    Accepted atoms are stored in a hash grid with cells as wide as the largest minimum
+    distance, so every trial position is only compared with the atoms of the 27 cells
+    around it.
+
+    Args:
+        types: Element index of every atom.
+        min_dist: Minimum distance between every pair of elements.
+        propose: Function (rng, scale) returning a random trial position; `scale` grows
+                 by 5% whenever an atom cannot be placed in `max_attempts` trials.
+        rng: Random number generator.
+        max_attempts: Trials per atom before the region is enlarged.
+    Returns:
+        Coordinates with shape (n, 3).
+    """
+    cell = min_dist.max()
+    grid: dict[tuple, list[int]] = {}
+    coords = np.zeros((len(types), 3))
+    scale = 1.0
+    offsets = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)]
+    for atom, t in enumerate(types):
+        attempts = 0
+        while True:
+            position = propose(rng, scale)
+            key = tuple(np.floor(position / cell).astype(int))
+            neighbors = [other for offset in offsets
+                         for other in grid.get((key[0] + offset[0], key[1] + offset[1], key[2] + offset[2]), ())]
+            if not neighbors or np.all(np.linalg.norm(coords[neighbors] - position, axis=1)
+                                       >= min_dist[t, types[neighbors]]):
+                break
+            attempts += 1
+            if attempts >= max_attempts:
+                scale *= 1.05
+                attempts = 0
+        coords[atom] = position
+        grid.setdefault(key, []).append(atom)
+    return coords
+
+def _fcc_points(num_atoms: int, distance: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    The `num_atoms` points of an fcc lattice closest to a slightly shifted centre.
+    """
+    a = distance * np.sqrt(2.0)  # Lattice constant
+    size = int(np.ceil((num_atoms / 4.0) ** (1.0 / 3.0))) + 2
+    cells = np.arange(-size, size + 1)
+    corners = np.stack(np.meshgrid(cells, cells, cells, indexing="ij"), axis=-1).reshape(-1, 3)
+    basis = np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]])
+    points = a * (corners[:, None, :] + basis[None, :, :]).reshape(-1, 3)
+    centre = rng.uniform(-0.25, 0.25, 3) * distance
+    order = np.argsort(np.linalg.norm(points - centre, axis=1), kind="stable")
+    return points[order[:num_atoms]] - centre
+
+def _icosahedral_points(num_atoms: int, distance: float) -> np.ndarray:
+    """
+    The `num_atoms` innermost points of a Mackay icosahedron (complete for 13, 55, 147, ...).
+    """
+    phi = (1.0 + np.sqrt(5.0)) / 2.0
+    vertices = np.array([[0, 1, phi], [0, -1, phi], [0, 1, -phi], [0, -1, -phi],
+                         [1, phi, 0], [-1, phi, 0], [1, -phi, 0], [-1, -phi, 0],
+                         [phi, 0, 1], [-phi, 0, 1], [phi, 0, -1], [-phi, 0, -1]], dtype=float)
+    vertices *= distance / 2.0  # Edges of the first shell are one neighbor distance long
+    edge = np.linalg.norm(vertices[:, None] - vertices[None, :], axis=2)
+    faces = [(i, j, k) for i in range(12) for j in range(i + 1, 12) for k in range(j + 1, 12)
+             if np.allclose([edge[i, j], edge[j, k], edge[i, k]], distance)]
+
+    points = [np.zeros(3)]
+    shell = 0
+    while len(points) < num_atoms:
+        shell += 1
+        # Integer barycentric grid on each face of shell `shell`
+        layer = [(i * vertices[a] + j * vertices[b] + (shell - i - j) * vertices[c])
+                 for a, b, c in faces for i in range(shell + 1) for j in range(shell + 1 - i)]
+        points.extend(np.unique(np.round(np.array(layer), 6), axis=0))
+    points = np.array(points)
+    order = np.argsort(np.linalg.norm(points, axis=1), kind="stable")
+    return points[order[:num_atoms]]
+
+def generate_cluster_coordinates(atoms: list[str], shape: str = "sphere", min_distance: float = 0.8,
+                                 seed: Optional[int] = None) -> np.ndarray:
+    """
+    Generate a compact starting structure sized to the number of atoms and their radii.
+
+    The cluster volume is scaled with N and the R0 nearest-neighbor distances of the
+    Gupta parameters, so small clusters are not a dilute gas and large ones have no
+    overlapping atoms. Random shapes use a grid-based rejection sampler that keeps
+    every pair at least `min_distance` x R0 apart.
+
+    Args:
+        atoms: list of atom types.
+        shape: "sphere" (random inside a sphere), "shell" (random on a spherical shell),
+               "fcc" (fcc lattice fragment) or "icosahedral" (Mackay icosahedron).
+        min_distance: minimum pair distance as a fraction of R0 for the random shapes.
+        seed: random seed, for reproducible structures.
+    Returns:
+        Array of coordinates with shape (n, 3).
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown cluster shape: {shape}")
+    rng = np.random.default_rng(seed)
+    n = len(atoms)
+    types, r0 = _nearest_neighbor_distances(atoms)
+    distance = float(np.mean(r0[types[:, None], types[None, :]])) if n > 1 else float(r0[0, 0])
+
+    if shape == "fcc":
+        return _fcc_points(n, distance, rng)[rng.permutation(n)]
+    if shape == "icosahedral":
+        return _icosahedral_points(n, distance)[rng.permutation(n)]
+
+    min_dist = min_distance * r0
+    if shape == "sphere":
+        # Close-packed volume per atom is d^3 / sqrt(2)
+        radius = (3.0 * EXPANSION * n * distance**3 / (4.0 * np.pi * np.sqrt(2.0))) ** (1.0 / 3.0)
+
+        def propose(rng, scale):
+            while True:
+                point = rng.uniform(-1.0, 1.0, 3)
+                if point @ point <= 1.0:
+                    return point * radius * scale
+    else:
+        # Close-packed area per atom on a surface is sqrt(3) / 2 d^2
+        radius = np.sqrt(EXPANSION * n * np.sqrt(3.0) / 2.0 * distance**2 / (4.0 * np.pi))
+
+        def propose(rng, scale):
+            point = rng.normal(size=3)
+            return point / np.linalg.norm(point) * radius * scale
+
+    return _rejection_sample(types, min_dist, propose, rng)
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python script.py <atom_sequence>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python script.py <atom_sequence> [num_candidates | shape]")
         print("Example: python script.py Fe2Co10Ni")
+        print("Example: python script.py Fe2Co10Ni 5000  # keep the best of 5000 random structures")
+        print(f"Example: python script.py Fe2Co10Ni sphere  # compact start, shapes: {', '.join(SHAPES)}")
         sys.exit(1)
     
     atom_sequence = sys.argv[1]
     atoms = parse_atom_sequence(atom_sequence)
     num_atoms = len(atoms)
     
-    # Generate random coordinates
-    coords = generate_random_coordinates(num_atoms)
+    # Generate random coordinates, optionally pre-screened by energy or with a compact shape
+    if len(sys.argv) == 3 and sys.argv[2] in SHAPES:
+        coords = generate_cluster_coordinates(atoms, shape=sys.argv[2])
+    elif len(sys.argv) == 3:
+        coords = generate_screened_coordinates(atoms, num_candidates=int(sys.argv[2]))[0][0]
+    else:
+        coords = generate_random_coordinates(num_atoms)
     
     # Create the output file name
     output_file = f"rnd-{atom_sequence.lower()}.xyz"
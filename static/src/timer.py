@@ -1,9 +1,11 @@
 import time
+from functools import wraps
 
 def timeit(func):
     """
     Decorator to measure the execution time of a function.
     """
+    @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
         result = func(*args, **kwargs)
@@ -0,0 +1,143 @@
+# Compact binary structure format, response compression and structure ETags for the web API
+import gzip
+import hashlib
+import json
+import struct
+from typing import Iterable, Optional
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Media type of the packed format, selected with the Accept and Content-Type headers
+STRUCTURE_MIMETYPE = "application/vnd.clusterweblab.structure"
+
+# Layout (little-endian, every array starts at a multiple of 4 bytes):
+#   header   magic "CWLS", version u16, species count S u16, frame count F u32
+#   species  S element symbols of 2 ASCII bytes (zero padded), padded to 4 bytes
+#   frames   atom count n u32, reserved u32, energy f64 (NaN when unknown),
+#            n species indices u8 padded to 4 bytes, n x 3 coordinates f32 (Å)
+MAGIC = b"CWLS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_FRAME = struct.Struct("<IId")
+
+# Responses smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Media types worth compressing; everything else (images, streams) is sent as is
+COMPRESSIBLE = {"application/json", "text/plain", "chemical/x-xyz", STRUCTURE_MIMETYPE}
+
+
+def _pad(payload: bytes) -> bytes:
+    return payload + b"\0" * (-len(payload) % 4)
+
+
+def pack_frames(frames: Iterable[tuple[list[str], np.ndarray, Optional[float]]]) -> bytes:
+    """
+    Pack structures into the binary format: one species table for all frames, one byte
+    per atom for its species and float32 coordinates.
+
+    Args:
+        frames: iterable of (atoms, coords, energy) tuples, energy may be None.
+    Returns:
+        The packed structures (bytes).
+    Raises:
+        ValueError: If a symbol is longer than 2 characters or there are over 255 species.
+    """
+    frames = [(list(atoms), np.asarray(coords, dtype=float).reshape(-1, 3), energy)
+              for atoms, coords, energy in frames]
+    species = list(dict.fromkeys(atom for atoms, _, _ in frames for atom in atoms))
+    if len(species) > 255 or any(len(atom) > 2 or not atom.isascii() for atom in species):
+        raise ValueError("The packed format needs at most 255 species of 1 or 2 ASCII characters")
+    index = {atom: k for k, atom in enumerate(species)}
+
+    parts = [_HEADER.pack(MAGIC, VERSION, len(species), len(frames)),
+             _pad(b"".join(atom.encode().ljust(2, b"\0") for atom in species))]
+    for atoms, coords, energy in frames:
+        if len(atoms) != len(coords):
+            raise ValueError(f"Expected {len(atoms)} coordinates but found {len(coords)}.")
+        parts.append(_FRAME.pack(len(atoms), 0, np.nan if energy is None else float(energy)))
+        parts.append(_pad(np.fromiter((index[atom] for atom in atoms), dtype=np.uint8, count=len(atoms)).tobytes()))
+        parts.append(coords.astype("<f4").tobytes())
+    return b"".join(parts)
+
+
+def unpack_frames(data: bytes) -> list[tuple[list[str], np.ndarray, Optional[float]]]:
+    """
+    Read structures packed with `pack_frames`.
+
+    Args:
+        data: the packed structures.
+    Returns:
+        A list of (atoms, coords, energy) tuples, energy is None when unknown.
+    Raises:
+        ValueError: If the data is not a valid packed structure.
+    """
+    if data[:4] != MAGIC or len(data) < _HEADER.size or _HEADER.unpack_from(data, 0)[1] != VERSION:
+        raise ValueError(f"Not a packed structure (version {VERSION})")
+    _, _, n_species, n_frames = _HEADER.unpack_from(data, 0)
+    try:
+        offset = _HEADER.size
+        table = data[offset:offset + 2 * n_species]
+        species = np.array([table[k:k + 2].rstrip(b"\0").decode("ascii") for k in range(0, len(table), 2)])
+        offset += len(_pad(table))
+
+        frames = []
+        for _ in range(n_frames):
+            n, _, energy = _FRAME.unpack_from(data, offset)
+            offset += _FRAME.size
+            types = np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)
+            offset += n + (-n % 4)
+            coords = np.frombuffer(data, dtype="<f4", count=3 * n, offset=offset).reshape(n, 3)
+            offset += 12 * n
+            frames.append((species[types].tolist(), coords.astype(float), None if np.isnan(energy) else energy))
+    except (struct.error, IndexError, ValueError) as e:
+        # Truncated buffers, bad species indices or symbols that are not ASCII
+        raise ValueError(f"Malformed packed structure: {e}") from None
+    if offset != len(data):
+        raise ValueError("Malformed packed structure: unexpected trailing data")
+    return frames
+
+
+def structure_etag(atoms: list[str], coords: np.ndarray, representation: str = "") -> str:
+    """
+    Entity tag of a structure: a hash of the symbols and the exact coordinates only, so a
+    response carrying the same structure in the same representation can be reused.
+
+    Args:
+        atoms: list of atom types.
+        coords: coordinates with shape (n, 3).
+        representation: suffix distinguishing the formats of the same structure.
+    Returns:
+        The tag without quotes (str).
+    """
+    digest = hashlib.sha1(json.dumps(list(atoms)).encode())
+    digest.update(np.ascontiguousarray(coords, dtype=np.float64).tobytes())
+    return f"{digest.hexdigest()[:24]}-{representation}" if representation else digest.hexdigest()[:24]
+
+
+def encodings() -> list[str]:
+    """
+    Content encodings this process can produce, best first.
+    """
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(payload: bytes, encoding: str) -> bytes:
+    """
+    Compress a response body with a fast setting of "br" or "gzip".
+
+    Args:
+        payload: the response body.
+        encoding: one of `encodings()`.
+    Returns:
+        The compressed body (bytes).
+    """
+    if encoding == "br":
+        return brotli.compress(payload, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(payload, compresslevel=6, mtime=0)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -0,0 +1,106 @@
+# Harmonic vibrational analysis of clusters from the analytic Gupta Hessian
+import numpy as np
+from scipy import sparse
+from scipy.linalg import null_space
+from scipy.sparse.linalg import LinearOperator, eigsh
+from potentials.gupta import get_potential
+
+# Atomic masses (amu) of the supported elements
+MASSES = {
+    "Fe": 55.845, "Co": 58.933, "Ni": 58.693, "Cu": 63.546,
+    "Pd": 106.42, "Ag": 107.868, "Pt": 195.084, "Au": 196.967,
+}
+
+# Converts sqrt(eV / (Å^2 amu)) to wavenumbers (cm^-1)
+EV_A2_AMU_TO_CM1 = 521.4708
+
+# Largest number of coordinates diagonalized with a dense eigensolver
+DENSE_LIMIT = 3000
+
+
+def _rigid_modes(coords: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    """
+    Orthonormal basis of the mass-weighted translations and rotations (6 vectors,
+    or 5 for linear structures).
+    """
+    n = len(coords)
+    sqrt_m = np.sqrt(masses)[:, None]
+    centered = coords - np.average(coords, axis=0, weights=masses)
+    modes = []
+    for k in range(3):
+        translation = np.zeros((n, 3))
+        translation[:, k] = 1.0
+        modes.append((sqrt_m * translation).ravel())
+        axis = np.zeros(3)
+        axis[k] = 1.0
+        modes.append((sqrt_m * np.cross(axis, centered)).ravel())
+    U, S, _ = np.linalg.svd(np.array(modes).T, full_matrices=False)
+    return U[:, S > 1e-8 * S.max()]
+
+
+def vibrational_analysis(atoms: list[str], coords: np.ndarray, num_modes: int | None = None,
+                         cutoff: tuple[float, float] | None = None,
+                         tolerance: float = 1e-4, gradient_tolerance: float = 1e-3) -> dict:
+    """
+    Compute the harmonic frequencies of a structure and check whether it is a true minimum.
+
+    A true minimum is a stationary point (every gradient component below
+    `gradient_tolerance`) without imaginary modes. The frequencies of a structure that
+    is not stationary are still returned, but it is not reported as a minimum.
+
+    The sparse analytic Hessian is mass weighted and the rigid translations and rotations
+    are projected out. Small systems are diagonalized densely; for large ones only the
+    `num_modes` lowest modes are computed with a sparse eigensolver.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Coordinates with shape (n, 3).
+        num_modes: Number of lowest modes to compute. Default is all of them.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+        tolerance: Most negative eigenvalue (eV / (Å^2 amu)) still considered zero.
+        gradient_tolerance: Largest gradient component (eV/Å) of a stationary point.
+
+    Returns:
+        A dictionary with the sorted `frequencies` in cm^-1 (imaginary modes as negative
+        values), the number of `imaginary` modes, the largest gradient component
+        (`max_gradient`, eV/Å), whether the structure is `stationary` and `is_minimum`.
+    """
+    coords = np.asarray(coords, dtype=float)
+    gupta = get_potential(atoms, cutoff=cutoff)
+    masses = np.array([MASSES[atom] for atom in atoms])
+
+    # Mass-weighted Hessian M^-1/2 H M^-1/2
+    inv_sqrt_m = sparse.diags(np.repeat(1.0 / np.sqrt(masses), 3))
+    H = inv_sqrt_m @ gupta.sparse_hessian(coords) @ inv_sqrt_m
+    rigid = _rigid_modes(coords, masses)
+    dim = H.shape[0] - rigid.shape[1]
+    num_modes = dim if num_modes is None else max(1, min(num_modes, dim))
+
+    if H.shape[0] <= DENSE_LIMIT or num_modes >= dim - 1:
+        # Diagonalize in the complement of the rigid-body modes
+        basis = null_space(rigid.T)
+        eigenvalues = np.linalg.eigvalsh(basis.T @ (H @ basis))[:num_modes]
+    else:
+        # Shift the rigid-body modes far up so the lowest eigenvalues are vibrations
+        shift = 10.0 * abs(H).sum(axis=1).max()
+
+        def matvec(v):
+            v = np.ravel(v)
+            projected = v - rigid @ (rigid.T @ v)
+            Hv = H @ projected
+            return Hv - rigid @ (rigid.T @ Hv) + shift * (rigid @ (rigid.T @ v))
+
+        operator = LinearOperator(H.shape, matvec=matvec, dtype=float)
+        eigenvalues = np.sort(eigsh(operator, k=num_modes, which="SA", return_eigenvectors=False))
+
+    frequencies = np.sign(eigenvalues) * np.sqrt(np.abs(eigenvalues)) * EV_A2_AMU_TO_CM1
+    imaginary = int(np.sum(eigenvalues < -tolerance))
+    max_gradient = float(np.abs(gupta.gradient(coords)).max())
+    stationary = max_gradient < gradient_tolerance
+    return {
+        "frequencies": frequencies.tolist(),
+        "imaginary": imaginary,
+        "max_gradient": max_gradient,
+        "stationary": stationary,
+        "is_minimum": stationary and imaginary == 0,
+    }
@@ -0,0 +1,194 @@
+# Parallel basin hopping with several independent walkers running in worker processes
+import multiprocessing
+import threading
+import time
+import numpy as np
+import scipy.optimize as spo
+from concurrent.futures import ProcessPoolExecutor, wait
+from potentials.gupta import get_potential
+from potentials.kernels import active_backend, use_backend
+from minima import Minimum, get_database
+from jobs import worker_share
+from typing import Callable, Optional
+
+# Seconds between two checks for a cancellation while the walkers run
+POLL_INTERVAL = 0.1
+
+# Set in the walker processes to end their round at the next hop, see _init_walker
+_stop = None
+
+
+def _init_walker(stop) -> None:
+    global _stop
+    _stop = stop
+
+
+def _walk(atoms: list[str], x0: np.ndarray, niter: int, stepsize: float, temperature: float,
+          seed: int, cutoff: Optional[tuple[float, float]], known: list[Minimum], backend: str) -> dict:
+    """
+    Run one basin hopping walker for `niter` hops (executed in a worker process).
+
+    The minima already known to the parent process are merged into the minima database
+    of the worker first, so minimizations into known basins are short-circuited.
+
+    Returns:
+        A dictionary with the lowest minimum found, the new minima and the walker
+        statistics (dict).
+    """
+    gupta = get_potential(atoms, cutoff=cutoff)
+    database = get_database(atoms, cutoff=cutoff)
+    database.merge(known)
+    first = len(database)
+    before = database.stats()
+
+    def potential(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(-1, 3))
+        return energy, grad.ravel()
+
+    # The first call reports the initial minimization, not a hop
+    accepted = -1
+    hops = -1
+
+    def on_hop(x, energy, accept):
+        nonlocal accepted, hops
+        accepted += bool(accept)
+        hops += 1
+        return _stop is not None and _stop.is_set()
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    # Same kernel backend as the parent, single-threaded since the walkers run in parallel
+    with use_backend(backend, parallel=False):
+        sol = spo.basinhopping(
+            potential,
+            x0,
+            niter=niter,
+            T=temperature,
+            stepsize=stepsize,
+            minimizer_kwargs={"method": database.minimizer(atoms), "jac": True},
+            callback=on_hop,
+            rng=np.random.default_rng(seed),
+            disp=False)
+    after = database.stats()
+    return {
+        "x": sol.x,
+        "fun": float(sol.fun),
+        "nfev": int(sol.nfev),
+        "accepted": accepted,
+        "hops": max(hops, 0),
+        "stepsize": float(stepsize),
+        "time": time.perf_counter() - start,
+        "cpu_time": time.process_time() - cpu_start,
+        "minima": database.export(first),
+        "counters": {name: after[name] - before[name] for name in ("lookups", "avoided", "duplicates")},
+    }
+
+
+def parallel_basinhopping(atoms: list[str], coords: np.ndarray, walkers: Optional[int] = None,
+                          niter: int = 250, rounds: int = 5, stepsize: float = 0.5,
+                          temperature: float = 1.0, seed: Optional[int] = None,
+                          cutoff: Optional[tuple[float, float]] = None,
+                          callback: Optional[Callable[[float], bool]] = None,
+                          cancel: Optional[threading.Event] = None) -> spo.OptimizeResult:
+    """
+    Global optimization with several basin hopping walkers running in parallel.
+
+    Every walker has its own seed and step size (spread between 0.5x and 1.5x of
+    `stepsize`). The hops are split into `rounds`; after each round the walker with the
+    worst minimum restarts from the best minimum found by any walker, so the walkers
+    periodically share their progress while the others keep exploring on their own.
+
+    Args:
+        atoms: List of atomic symbols.
+        coords: Initial coordinates with shape (n, 3).
+        walkers: Number of walkers (and worker processes). Default is the CPU count,
+                 divided among the jobs running at once inside a job worker.
+        niter: Number of hops per walker.
+        rounds: Number of exchange rounds the hops are split into.
+        stepsize: Mean step size of the walkers (Å).
+        temperature: Basin hopping temperature (eV).
+        seed: Seed for the walker seeds, for reproducible runs.
+        cutoff: Optional (r_on, r_off) radii of the Gupta potential in Å.
+        callback: Called with the best energy after every round; returning True stops
+                  the search and keeps the best structure found so far.
+        cancel: Optional event that stops the walkers at their next hop once it is set.
+
+    Returns:
+        An OptimizeResult with the best minimum (`x`, `fun`), the total `nfev`, the
+        per-walker statistics (`walkers`), the `wall_time`, the summed CPU time of the
+        walkers (`cpu_time`), the resulting parallel `speedup` and the reason the search
+        ended (`stop_reason`: "rounds" or "cancelled").
+    """
+    walkers = walkers or worker_share()
+    rounds = max(1, min(rounds, niter))
+    seeds = np.random.SeedSequence(seed).generate_state(walkers * rounds).reshape(rounds, walkers)
+    stepsizes = stepsize * np.linspace(0.5, 1.5, walkers) if walkers > 1 else np.array([stepsize])
+    hops = np.diff(np.linspace(0, niter, rounds + 1).astype(int))
+
+    positions = [np.asarray(coords, dtype=float).ravel()] * walkers
+    stats = [{"walker": k, "seed": [], "stepsize": float(stepsizes[k]), "best_energy": np.inf,
+              "nfev": 0, "hops": 0, "accepted": 0, "time": 0.0, "cpu_time": 0.0}
+             for k in range(walkers)]
+    best_x, best_energy = positions[0], np.inf
+
+    # Minima found by earlier requests and by the walkers are shared through this database
+    database = get_database(atoms, cutoff=cutoff)
+
+    stop = multiprocessing.Event()
+    stop_reason = "rounds"
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=walkers, initializer=_init_walker, initargs=(stop,)) as executor:
+        for r in range(rounds):
+            known = database.export()
+            futures = [executor.submit(_walk, atoms, positions[k], int(hops[r]), stepsizes[k],
+                                       temperature, int(seeds[r, k]), cutoff, known, active_backend())
+                       for k in range(walkers)]
+            # Stop the walkers at their next hop when cancelled, keeping their minima
+            pending = futures
+            while pending:
+                pending = wait(pending, timeout=POLL_INTERVAL).not_done
+                if cancel is not None and cancel.is_set():
+                    stop.set()
+            results = [future.result() for future in futures]
+            for result in results:
+                database.merge(result["minima"], result["counters"])
+
+            # Collect the statistics and the global best of this round
+            for k, result in enumerate(results):
+                walker = stats[k]
+                walker["seed"].append(int(seeds[r, k]))
+                walker["nfev"] += result["nfev"]
+                walker["hops"] += result["hops"]
+                walker["accepted"] += result["accepted"]
+                walker["time"] += result["time"]
+                walker["cpu_time"] += result["cpu_time"]
+                walker["best_energy"] = min(walker["best_energy"], result["fun"])
+                positions[k] = result["x"]
+                if result["fun"] < best_energy:
+                    best_x, best_energy = result["x"], result["fun"]
+
+            # Restart the worst walker from the global best minimum
+            worst = int(np.argmax([result["fun"] for result in results]))
+            if walkers > 1 and results[worst]["fun"] > best_energy:
+                positions[worst] = best_x
+
+            if stop.is_set() or (callback is not None and callback(best_energy)):
+                stop_reason = "cancelled"
+                break
+    wall_time = time.perf_counter() - start
+
+    cpu_time = sum(walker["cpu_time"] for walker in stats)
+    for walker in stats:
+        walker["acceptance_rate"] = walker["accepted"] / walker["hops"] if walker["hops"] else 0.0
+    return spo.OptimizeResult(
+        x=best_x,
+        fun=best_energy,
+        nfev=sum(walker["nfev"] for walker in stats),
+        nit=sum(walker["hops"] for walker in stats),
+        walkers=stats,
+        wall_time=wall_time,
+        cpu_time=cpu_time,
+        speedup=cpu_time / wall_time if wall_time > 0 else 0.0,
+        stop_reason=stop_reason,
+        success=True,
+        message="Parallel basin hopping finished")
@@ -0,0 +1,352 @@
+# Bounded per-session workspaces with copy-on-write example files and TTL/LRU eviction
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tmp")
+
+# Session ids and file names are used as path components
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+# Workspaces being deleted are first renamed with this prefix (never a valid session id)
+_TRASH_PREFIX = ".trash-"
+
+
+class WorkspaceQuotaError(ValueError):
+    """Raised when a write would take a workspace over its size quota."""
+
+
+@dataclass
+class Workspace:
+    """
+    Index entry of one session workspace.
+
+    Attributes:
+        last_used (float): Time of the last read or write (s since the epoch).
+        files (dict): Size and SHA-1 digest of every stored file, by name.
+        refs (dict): Shared example file referenced by name instead of a copy.
+        data (dict): File contents of the in-memory backend, by name.
+    """
+    last_used: float
+    files: dict = field(default_factory=dict)
+    refs: dict = field(default_factory=dict)
+    data: dict = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(size for size, _ in self.files.values())
+
+
+class WorkspaceStore:
+    '''Files of every session, created on the first write and evicted when idle.
+
+    Reading a file that a session has not written falls back to a shared example
+    (a per-session reference set with `link`, or a store-wide default), so new
+    sessions cost nothing until they save something. Writes are atomic, identical
+    rewrites are skipped and every workspace has a size quota. Every call that
+    indexes a workspace also runs a bounded eviction step: expired and least
+    recently used workspaces go first, and a resumable scan of the directory removes
+    the workspaces of earlier processes, so no request pays for a full cleanup pass.
+    The index lives in this process: like the job queue, it expects a single web
+    process.
+
+    Args:
+        directory: (str | None) Root of the workspaces, None keeps the files in memory.
+        quota_bytes: (int) Size limit of one workspace.
+        max_bytes: (int) Size limit of all workspaces together.
+        max_sessions: (int) Number of workspaces kept.
+        ttl: (float) Seconds after the last use before a workspace expires.
+        defaults: (dict | None) Shared file returned for a name no session has written.
+
+    Example:
+        store = WorkspaceStore("/tmp/workspaces", defaults={"input.xyz": "examples/pd12pt1.xyz"})
+        store.read(session_id, "input.xyz") # The example until the session writes its own
+        store.write(session_id, "input.xyz", xyz_content)
+    '''
+
+    def __init__(self, directory: Optional[str] = DEFAULT_DIRECTORY, quota_bytes: int = 4 * 2**20,
+                 max_bytes: int = 512 * 2**20, max_sessions: int = 10000, ttl: float = 2 * 24 * 3600,
+                 defaults: Optional[dict] = None) -> None:
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.defaults = dict(defaults or {})
+        self.evictions = 0
+        self.skipped_writes = 0
+        self._workspaces: OrderedDict[str, Workspace] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._scan = None
+
+
+    def _path(self, session_id: str, name: Optional[str] = None) -> str:
+        return os.path.join(self.directory, session_id, *([name] if name else []))
+
+
+    def _workspace(self, session_id: str, now: float) -> Workspace:
+        # Called with the lock held: find or index a workspace and mark it as used
+        if not _SAFE_NAME.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        workspace = self._workspaces.get(session_id)
+        if workspace is None:
+            workspace = Workspace(now)
+            if self.directory and os.path.isdir(self._path(session_id)):
+                # Files left by an earlier process, their digests are computed on demand
+                for entry in os.scandir(self._path(session_id)):
+                    if entry.is_file() and _SAFE_NAME.match(entry.name):
+                        workspace.files[entry.name] = (entry.stat().st_size, None)
+                self._bytes += workspace.size
+            self._workspaces[session_id] = workspace
+        workspace.last_used = now
+        self._workspaces.move_to_end(session_id)
+        return workspace
+
+
+    def touch(self, session_id: str) -> None:
+        """
+        Mark a workspace as used without creating anything on disk.
+        """
+        with self._lock:
+            self._workspace(session_id, time.time())
+        self.evict()
+
+
+    def link(self, session_id: str, name: str, source: str) -> None:
+        """
+        Make `name` refer to a shared file until the session writes its own copy.
+
+        Args:
+            session_id: Session identifier.
+            name: File name inside the workspace.
+            source: Path of the shared file, which is never modified.
+        """
+        if not _SAFE_NAME.match(name):
+            raise ValueError(f"Invalid file name: {name!r}")
+        with self._lock:
+            workspace = self._workspace(session_id, time.time())
+            if name not in workspace.files:
+                workspace.refs[name] = source
+        self.evict()
+
+
+    def read(self, session_id: str, name: str) -> Optional[str]:
+        """
+        Content of a workspace file, falling back to its shared reference.
+
+        Returns:
+            The file content or None if neither exists (str | None).
+        """
+        if not _SAFE_NAME.match(name):
+            raise ValueError(f"Invalid file name: {name!r}")
+        with self._lock:
+            workspace = self._workspace(session_id, time.time())
+            if name in workspace.data:
+                return workspace.data[name].decode()
+            source = workspace.refs.get(name, self.defaults.get(name))
+            stored = name in workspace.files
+        try:
+            with open(self._path(session_id, name) if stored else source, "r") as f:
+                return f.read()
+        except (OSError, TypeError):
+            return None
+
+
+    def write(self, session_id: str, name: str, content: str) -> str:
+        """
+        Store a file in the workspace, replacing its shared reference if any.
+
+        Args:
+            session_id: Session identifier.
+            name: File name inside the workspace.
+            content: Text to store.
+
+        Returns:
+            The location of the file, "<session_id>/<name>" (str).
+
+        Raises:
+            WorkspaceQuotaError: If the workspace would exceed its quota.
+        """
+        if not _SAFE_NAME.match(name):
+            raise ValueError(f"Invalid file name: {name!r}")
+        payload = content.encode()
+        digest = hashlib.sha1(payload).hexdigest()
+        now = time.time()
+        with self._lock:
+            workspace = self._workspace(session_id, now)
+            old_size, old_digest = workspace.files.get(name, (0, None))
+            if old_digest is None and name in workspace.files and self.directory:
+                old_digest = self._digest(session_id, name)
+            if old_digest == digest:
+                self.skipped_writes += 1
+                return f"{session_id}/{name}"
+            if workspace.size - old_size + len(payload) > self.quota_bytes:
+                raise WorkspaceQuotaError(f"Workspace quota of {self.quota_bytes // 1024} KiB exceeded")
+            if self.directory:
+                self._write_file(session_id, name, payload)
+            else:
+                workspace.data[name] = payload
+            workspace.files[name] = (len(payload), digest)
+            workspace.refs.pop(name, None)
+            self._bytes += len(payload) - old_size
+        self.evict()
+        return f"{session_id}/{name}"
+
+
+    def _digest(self, session_id: str, name: str) -> Optional[str]:
+        try:
+            with open(self._path(session_id, name), "rb") as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return None
+
+
+    def _write_file(self, session_id: str, name: str, payload: bytes) -> None:
+        # Write to a temporary file first so readers never see partial content
+        directory = self._path(session_id)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(session_id, name))
+
+
+    def delete(self, session_id: str) -> None:
+        """
+        Remove a workspace and its files.
+        """
+        trash = []
+        with self._lock:
+            self._remove(session_id, trash)
+        self._purge(trash)
+
+
+    def _remove(self, session_id: str, trash: list) -> None:
+        # Called with the lock held
+        workspace = self._workspaces.pop(session_id, None)
+        if workspace is not None:
+            self._bytes -= workspace.size
+        if self.directory:
+            self._detach(self._path(session_id), trash)
+
+
+    def _detach(self, path: str, trash: list) -> bool:
+        # Called with the lock held: rename an entry out of the way, so a session indexed
+        # again meanwhile starts empty. The renamed entry is deleted by _purge without the lock.
+        target = os.path.join(self.directory, f"{_TRASH_PREFIX}{os.path.basename(path)}-{os.urandom(4).hex()}")
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            return True  # Never written, or removed by another process in the meantime
+        except OSError as e:
+            print(f"Removing workspace {path} failed: {e}")
+            return False
+        trash.append(target)
+        return True
+
+
+    @staticmethod
+    def _purge(trash: list) -> None:
+        for path in trash:
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass  # Retried when the directory scan reaches it again
+
+
+    def evict(self, budget: int = 8) -> int:
+        """
+        One bounded eviction step: drop up to `budget` expired or least recently used
+        workspaces beyond the limits, then check up to `budget` directory entries that
+        are not indexed (left by earlier processes) and remove the expired ones.
+
+        Args:
+            budget: Maximum number of workspaces removed and entries scanned.
+
+        Returns:
+            The number of workspaces removed (int).
+        """
+        now = time.time()
+        removed = 0
+        trash = []
+        with self._lock:
+            while self._workspaces and removed < budget:
+                session_id, workspace = next(iter(self._workspaces.items()))
+                if (now - workspace.last_used <= self.ttl and self._bytes <= self.max_bytes
+                        and len(self._workspaces) <= self.max_sessions):
+                    break
+                self._remove(session_id, trash)
+                removed += 1
+            if self.directory:
+                removed += self._scan_step(now, budget, trash)
+            self.evictions += removed
+        # Delete the files after releasing the lock, requests only wait for the renames
+        self._purge(trash)
+        return removed
+
+
+    def _scan_step(self, now: float, budget: int, trash: list) -> int:
+        # Called with the lock held: resume the scan of the root directory
+        removed = 0
+        for _ in range(budget):
+            if self._scan is None:
+                try:
+                    self._scan = os.scandir(self.directory)
+                except OSError:
+                    return removed
+            entry = next(self._scan, None)
+            if entry is None:
+                self._scan.close()
+                self._scan = None
+                return removed
+            if entry.name in self._workspaces:
+                continue
+            if entry.name.startswith(_TRASH_PREFIX):
+                trash.append(entry.path)  # Left by a deletion that failed or was interrupted
+                continue
+            try:
+                expired = now - entry.stat().st_mtime > self.ttl
+            except OSError:
+                continue
+            # Only counted once the entry is gone, so sweep() ends on an entry it cannot remove
+            if expired and self._detach(entry.path, trash):
+                removed += 1
+        return removed
+
+
+    def sweep(self) -> int:
+        """
+        Evict until every limit holds and finish the directory scan, for periodic
+        maintenance when there is no traffic to drive the incremental steps.
+
+        Returns:
+            The number of workspaces removed (int).
+        """
+        total = 0
+        while (removed := self.evict(budget=256)) or self._scan is not None:
+            total += removed
+        return total
+
+
+    def stats(self) -> dict:
+        """
+        Size and eviction counters of the store.
+
+        Returns:
+            A dictionary with the number of indexed workspaces, their total size and
+            the eviction and skipped write counters (dict).
+        """
+        with self._lock:
+            return {"backend": "disk" if self.directory else "memory", "workspaces": len(self._workspaces),
+                    "bytes": self._bytes, "evictions": self.evictions, "skipped_writes": self.skipped_writes}
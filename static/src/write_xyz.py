@@ -1,6 +1,44 @@
+from typing import Iterable, Optional
 import numpy as np
 
 
+def format_atom_lines(atoms: list[str], coords: np.ndarray, precision: Optional[int] = None) -> str:
+    """
+    Format the atom lines of an xyz frame with a single string operation.
+
+    Args:
+        atoms: list of atom types.
+        coords: array of coordinates with shape (n, 3).
+        precision: number of decimals, None writes the shortest exact representation.
+    Returns:
+        The atom lines, each terminated by a newline (str).
+    """
+    n = len(atoms)
+    if n == 0:
+        return ""
+    table = np.empty((n, 4), dtype=object)
+    table[:, 0] = atoms
+    table[:, 1:] = np.asarray(coords, dtype=float).reshape(n, 3)
+    number = "%s" if precision is None else f"%.{precision}f"
+    return (f"%s   {number}   {number}   {number}\n" * n) % tuple(table.ravel())
+
+
+def format_xyz(atoms: list[str], coords: np.ndarray, comment: str = "",
+               precision: Optional[int] = None) -> str:
+    """
+    Format atoms and coordinates as the text of an xyz file.
+
+    Args:
+        atoms: list of atom types.
+        coords: array of coordinates.
+        comment: optional comment line.
+        precision: optional number of decimals of the coordinates.
+    Returns:
+        The xyz file content (str).
+    """
+    return f"{len(atoms)}\n{comment}\n" + format_atom_lines(atoms, coords, precision)
+
+
 def write_xyz_file(path: str, atoms: list[str], coords: np.ndarray, comment: str = "") -> None:
     """
     Write an xyz file with the given atoms and coordinates.
@@ -14,7 +52,38 @@ def write_xyz_file(path: str, atoms: list[str], coords: np.ndarray, comment: str
         None
     """
     with open(path, "w") as file:
-        file.write(f"{len(atoms)}\n")
-        file.write(f"{comment}\n")
-        for atom, coord in zip(atoms, coords):
-            file.write(f"{atom}   {'   '.join(map(str, coord))}\n")
+        file.write(format_xyz(atoms, coords, comment))
+
+
+def write_xyz_frames(path: str, frames: Iterable[tuple[list[str], np.ndarray, str]],
+                     append: bool = False, precision: Optional[int] = None,
+                     buffer_size: int = 2**22) -> int:
+    """
+    Write many frames to a multi-frame xyz file.
+
+    Frames are consumed lazily (e.g. from `iter_xyz_frames` or a generator) and written
+    in blocks of about `buffer_size` characters, so memory use does not grow with the
+    number of frames.
+
+    Args:
+        path: path to the xyz file.
+        frames: iterable of (atoms, coords, comment) tuples.
+        append: add the frames to the end of an existing file.
+        precision: optional number of decimals of the coordinates.
+        buffer_size: number of characters collected before each write.
+    Returns:
+        The number of frames written (int).
+    """
+    count = 0
+    chunks, size = [], 0
+    with open(path, "a" if append else "w") as file:
+        for atoms, coords, comment in frames:
+            text = format_xyz(atoms, coords, comment, precision)
+            chunks.append(text)
+            size += len(text)
+            count += 1
+            if size >= buffer_size:
+                file.write("".join(chunks))
+                chunks, size = [], 0
+        file.write("".join(chunks))
+    return count
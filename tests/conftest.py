@@ -0,0 +1,5 @@
+# The optimizer modules import each other by bare name, as app.py arranges at runtime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "src"))
@@ -0,0 +1,152 @@
+# Analytic derivatives of the Gupta potential against central finite differences
+import numpy as np
+import pytest
+from potentials import gupta as gupta_module
+from potentials.gupta import Gupta
+from potentials.incremental import IncrementalGupta
+from potentials import kernels
+from potentials.kernels import PARALLEL_THRESHOLD, available_backends, use_backend
+
+# Step of the central differences (Å), their error is O(STEP**2)
+STEP = 1e-5
+
+# Cutoffs: none, and a switching region that a 38-atom cluster straddles
+CUTOFFS = [None, (4.0, 5.5)]
+
+# Every kernel backend, the compiled ones only where they are installed
+BACKENDS = ["numpy", pytest.param("numba", marks=pytest.mark.skipif(
+    "numba" not in available_backends(), reason="numba is not installed"))]
+
+
+def cluster(n: int, seed: int = 0) -> tuple[list[str], np.ndarray]:
+    # A compact, slightly disordered bimetallic cluster away from any minimum
+    rng = np.random.default_rng(seed)
+    atoms = (["Pd", "Pt", "Au"] * n)[:n]
+    coords = rng.uniform(-1.0, 1.0, (n, 3)) * 1.5 * n ** (1.0 / 3.0)
+    return atoms, coords
+
+
+def numerical_gradient(f, coords: np.ndarray) -> np.ndarray:
+    grad = np.zeros_like(coords)
+    for index in np.ndindex(coords.shape):
+        step = np.zeros_like(coords)
+        step[index] = STEP
+        grad[index] = (f(coords + step) - f(coords - step)) / (2.0 * STEP)
+    return grad
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("cutoff", CUTOFFS)
+def test_energy_and_forces(cutoff, backend):
+    atoms, coords = cluster(38)
+    gupta = Gupta(atoms, cutoff=cutoff)
+    with use_backend(backend):
+        energy, grad = gupta.energy_and_forces(coords)
+        assert energy == pytest.approx(gupta.potential(coords), rel=1e-12)
+        expected = numerical_gradient(lambda x: gupta.energy_and_forces(x)[0], coords)
+    np.testing.assert_allclose(grad, expected, rtol=1e-6, atol=1e-7)
+
+
+def test_energy_and_forces_batch():
+    atoms, coords = cluster(13)
+    gupta = Gupta(atoms)
+    rng = np.random.default_rng(1)
+    batch = coords + rng.normal(scale=0.05, size=(5, *coords.shape))
+    with use_backend("numpy"):
+        energies, grads = gupta.energy_and_forces_batch(batch, chunk_size=2)
+        for coords, energy, grad in zip(batch, energies, grads):
+            expected = gupta.energy_and_forces(coords)
+            assert energy == pytest.approx(expected[0], rel=1e-12)
+            np.testing.assert_allclose(grad, expected[1], rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(gupta.potential_batch(batch), energies, rtol=1e-12)
+
+
+@pytest.mark.parametrize("cutoff", CUTOFFS)
+def test_hessian(cutoff):
+    atoms, coords = cluster(13 if cutoff is None else 38)
+    gupta = Gupta(atoms, cutoff=cutoff)
+    with use_backend("numpy"):
+        hessian = gupta.hessian(coords)
+        expected = np.array([numerical_gradient(lambda x: gupta.gradient(x)[index], coords).ravel()
+                             for index in np.ndindex(coords.shape)])
+    np.testing.assert_allclose(hessian, hessian.T, atol=1e-10)
+    np.testing.assert_allclose(hessian, expected, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("cutoff", CUTOFFS)
+def test_hessian_vector_product(cutoff):
+    atoms, coords = cluster(38)
+    gupta = Gupta(atoms, cutoff=cutoff)
+    v = np.random.default_rng(2).normal(size=coords.shape)
+    product = gupta.hessian_vector_product(coords, v)
+    np.testing.assert_allclose(product.ravel(), gupta.sparse_hessian(coords) @ v.ravel(), rtol=1e-10, atol=1e-10)
+    # Directional derivative of the gradient
+    with use_backend("numpy"):
+        expected = (gupta.gradient(coords + STEP * v) - gupta.gradient(coords - STEP * v)) / (2.0 * STEP)
+    np.testing.assert_allclose(product, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_gradient_matches_autograd(monkeypatch):
+    # The energy without cutoff only uses array operations, so autograd can trace it as written
+    autograd = pytest.importorskip("autograd")
+    atoms, coords = cluster(38)
+    gupta = Gupta(atoms)
+    with use_backend("numpy"):
+        grad = gupta.energy_and_forces(coords)[1]
+    monkeypatch.setattr(gupta_module, "np", autograd.numpy)
+    expected = autograd.grad(gupta.potential)(coords)
+    np.testing.assert_allclose(grad, expected, rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize("backend", BACKENDS[1:])
+@pytest.mark.parametrize("n, cutoff", [(13, None), (38, (4.0, 5.5)), (PARALLEL_THRESHOLD, None)])
+def test_backend_matches_reference(backend, n, cutoff):
+    # Covers the pair kernel with and without cutoff and the parallel all-pairs kernel
+    atoms, coords = cluster(n)
+    gupta = Gupta(atoms, cutoff=cutoff)
+    with use_backend("numpy"):
+        energy, grad = gupta.energy_and_forces(coords)
+    with use_backend(backend):
+        e, g = gupta.energy_and_forces(coords)
+    assert e == pytest.approx(energy, rel=1e-10)
+    np.testing.assert_allclose(g, grad, rtol=1e-9, atol=1e-10)
+    if n >= PARALLEL_THRESHOLD:
+        # The parallel kernel is only selected with more than two threads, call it directly
+        e, g = kernels._all_pairs_kernel(coords, gupta.types, gupta.table)
+        assert e == pytest.approx(energy, rel=1e-10)
+        np.testing.assert_allclose(g, grad, rtol=1e-9, atol=1e-10)
+
+
+@pytest.mark.parametrize("cutoff", CUTOFFS)
+def test_incremental_matches_full_evaluation(cutoff):
+    atoms, coords = cluster(38)
+    state = IncrementalGupta(atoms, coords, cutoff=cutoff)
+    rng = np.random.default_rng(3)
+
+    def reference(atoms, coords):
+        return Gupta(atoms, cutoff=cutoff).energy_and_forces(coords)[0]
+
+    with use_backend("numpy"):
+        assert state.energy == pytest.approx(reference(atoms, coords), rel=1e-12)
+        for step in range(40):
+            before = state.energy
+            if step % 2:
+                a, b = rng.choice(len(atoms), 2, replace=False)
+                delta = state.propose_swap(a, b)
+                atoms_new, coords_new = list(state.atoms), state.coords
+                atoms_new[a], atoms_new[b] = atoms_new[b], atoms_new[a]
+            else:
+                k = rng.integers(len(atoms))
+                position = state.coords[k] + rng.normal(scale=0.3, size=3)
+                delta = state.propose_move(k, position)
+                atoms_new, coords_new = state.atoms, state.coords.copy()
+                coords_new[k] = position
+            assert before + delta == pytest.approx(reference(atoms_new, coords_new), rel=1e-10)
+            if step % 3:
+                assert state.accept() == pytest.approx(reference(atoms_new, coords_new), rel=1e-10)
+                assert state.atoms == atoms_new
+                np.testing.assert_array_equal(state.coords, coords_new)
+            else:
+                state.rollback()
+                assert state.energy == before
+            assert state.energy == pytest.approx(reference(state.atoms, state.coords), rel=1e-10)
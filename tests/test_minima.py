@@ -0,0 +1,82 @@
+# Structural fingerprints and the short-circuiting minimizer of the minima database
+import numpy as np
+import pytest
+import scipy.optimize as spo
+from minima import MinimaDatabase, fingerprint
+from potentials.gupta import Gupta
+from potentials.kernels import use_backend
+
+
+def cluster(seed: int = 0) -> tuple[list[str], np.ndarray]:
+    rng = np.random.default_rng(seed)
+    atoms = ["Pd"] * 6 + ["Pt"] * 7
+    return atoms, rng.uniform(-2.0, 2.0, (len(atoms), 3))
+
+
+def rotation(seed: int = 0) -> np.ndarray:
+    # Random proper rotation from the QR decomposition of a Gaussian matrix
+    q, r = np.linalg.qr(np.random.default_rng(seed).normal(size=(3, 3)))
+    q *= np.sign(np.diag(r))
+    return q if np.linalg.det(q) > 0 else -q
+
+
+def assert_same_fingerprint(a, b):
+    np.testing.assert_allclose(a[0], b[0], atol=1e-10)
+    np.testing.assert_allclose(a[1], b[1], atol=1e-5)
+
+
+def test_fingerprint_invariance():
+    atoms, coords = cluster()
+    expected = fingerprint(atoms, coords)
+    assert_same_fingerprint(fingerprint(atoms, coords @ rotation().T), expected)
+    assert_same_fingerprint(fingerprint(atoms, coords + np.array([3.0, -1.0, 0.5])), expected)
+
+    # Exchange atoms of the same element, and list the elements in another order
+    order = np.concatenate([np.random.default_rng(1).permutation(6), 6 + np.random.default_rng(2).permutation(7)])
+    assert_same_fingerprint(fingerprint(atoms, coords[order]), expected)
+    assert_same_fingerprint(fingerprint(atoms[::-1], coords[::-1]), expected)
+
+
+def test_fingerprint_distinguishes_homotops():
+    atoms, coords = cluster()
+    swapped = list(atoms)
+    swapped[0], swapped[-1] = swapped[-1], swapped[0]
+    assert not np.allclose(fingerprint(swapped, coords)[1], fingerprint(atoms, coords)[1], atol=1e-3)
+
+
+def test_minimizer_short_circuits_known_minimum():
+    atoms, coords = cluster()
+    gupta = Gupta(atoms)
+    database = MinimaDatabase()
+
+    def fun(x):
+        energy, grad = gupta.energy_and_forces(x.reshape(-1, 3))
+        return energy, grad.ravel()
+
+    with use_backend("numpy"):
+        first = spo.minimize(fun, coords.ravel(), jac=True, method=database.minimizer(atoms))
+        assert database.stats()["minima"] == 1 and database.stats()["avoided"] == 0
+
+        # The same start, rotated and with the atoms of each element reordered
+        order = np.concatenate([np.arange(6)[::-1], 6 + np.arange(7)[::-1]])
+        start = (coords @ rotation().T)[order]
+        second = spo.minimize(fun, start.ravel(), jac=True, method=database.minimizer(atoms))
+
+    assert second.message == "Matched a known minimum"
+    assert second.nit < first.nit
+    assert second.fun == pytest.approx(first.fun, abs=1e-8)
+    assert database.stats() == {"minima": 1, "lookups": 2, "avoided": 1, "duplicates": 0}
+    # The returned structure is the stored minimum in the order of `atoms`
+    np.testing.assert_allclose(second.x.reshape(-1, 3), first.x.reshape(-1, 3), atol=1e-8)
+    assert database.lookup(atoms, second.x.reshape(-1, 3), second.fun).visits == 2
+
+
+def test_add_rejects_high_minima_when_full():
+    atoms, coords = cluster()
+    database = MinimaDatabase(max_entries=2)
+    assert database.add(atoms, coords, -10.0) == (0, True)
+    assert database.add(atoms, cluster(1)[1], -9.0) == (1, True)
+    assert database.add(atoms, coords, -10.0) == (0, False)  # A new visit
+    assert database.add(atoms, cluster(2)[1], -8.0) == (-1, False)  # Higher than every stored one
+    assert database.add(atoms, cluster(3)[1], -11.0)[1]  # Replaces the highest
+    assert sorted(minimum.energy for minimum in database.export()) == [-11.0, -10.0]
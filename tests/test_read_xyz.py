@@ -0,0 +1,87 @@
+# Streaming and indexed readers of multi-frame xyz files
+import os
+import numpy as np
+import pytest
+import read_xyz
+from read_xyz import XYZIndex, iter_xyz_frames, parse_xyz_frames
+
+
+def trajectory(num_frames: int = 5) -> list:
+    rng = np.random.default_rng(0)
+    return [((["Pd", "Pt", "Au"] * 3)[:k + 2], rng.normal(size=(k + 2, 3)), f"frame {k}") for k in range(num_frames)]
+
+
+def write(path, frames, blank_lines: bool = False) -> None:
+    with open(path, "w") as f:
+        for atoms, coords, comment in frames:
+            f.write(f"{len(atoms)}\n{comment}\n")
+            f.writelines(f"{atom} {x:.10f} {y:.10f} {z:.10f}\n" for atom, (x, y, z) in zip(atoms, coords))
+            if blank_lines:
+                f.write("\n")
+
+
+def assert_frames_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for (atoms, coords, comment), (atoms2, coords2, comment2) in zip(actual, expected):
+        assert atoms == atoms2 and comment == comment2
+        np.testing.assert_allclose(coords, coords2, atol=1e-9)
+
+
+@pytest.mark.parametrize("blank_lines", [False, True])
+def test_iter_xyz_frames(tmp_path, blank_lines):
+    path = tmp_path / "trajectory.xyz"
+    write(path, trajectory(), blank_lines)
+    assert_frames_equal(list(iter_xyz_frames(path)), trajectory())
+    assert_frames_equal(list(parse_xyz_frames(path.read_text())), trajectory())
+
+
+def test_iter_xyz_frames_truncated(tmp_path):
+    path = tmp_path / "truncated.xyz"
+    path.write_text("3\ncomment\nPd 0 0 0\nPt 1 0 0\n")
+    with pytest.raises(ValueError):
+        list(iter_xyz_frames(path))
+
+
+@pytest.mark.parametrize("blank_lines", [False, True])
+def test_index_random_access(tmp_path, monkeypatch, blank_lines):
+    # A small chunk makes the line scan cross chunk boundaries
+    monkeypatch.setattr(read_xyz, "SCAN_CHUNK", 7)
+    path = tmp_path / "trajectory.xyz"
+    write(path, trajectory(), blank_lines)
+    expected = trajectory()
+    with XYZIndex(str(path), cache=False) as index:
+        assert len(index) == len(expected)
+        assert_frames_equal([index[k] for k in (3, 0, 4, 1)], [expected[k] for k in (3, 0, 4, 1)])
+        assert_frames_equal([index[-1]], [expected[-1]])
+        with pytest.raises(IndexError):
+            index[len(expected)]
+    assert not os.path.exists(f"{path}.idx.npy")
+
+    empty = tmp_path / "empty.xyz"
+    empty.write_text("")
+    with XYZIndex(str(empty), cache=False) as index:
+        assert len(index) == 0
+
+
+def test_index_cache(tmp_path, monkeypatch):
+    path = tmp_path / "trajectory.xyz"
+    write(path, trajectory())
+    with XYZIndex(str(path)) as index:
+        offsets = index.offsets
+    assert os.path.exists(f"{path}.idx.npy")
+
+    # An unchanged file reuses the stored offsets without scanning
+    def scan(self):
+        raise AssertionError("The file was scanned again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(XYZIndex, "_scan", scan)
+        with XYZIndex(str(path)) as index:
+            np.testing.assert_array_equal(index.offsets, offsets)
+            assert_frames_equal([index[2]], [trajectory()[2]])
+
+    # A modified file is scanned again
+    write(path, trajectory(3))
+    with XYZIndex(str(path)) as index:
+        assert len(index) == 3
+        assert_frames_equal([index[k] for k in range(3)], trajectory(3))
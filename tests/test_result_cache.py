@@ -0,0 +1,84 @@
+# Keys and eviction policies of the optimization result cache
+import os
+import time
+import numpy as np
+import optimizer
+from result_cache import ResultCache, cache_key
+
+
+def structure() -> tuple[list[str], np.ndarray]:
+    return ["Pd", "Pt", "Pd"], np.random.default_rng(0).normal(size=(3, 3))
+
+
+def test_cache_key_stability():
+    atoms, coords = structure()
+    key = cache_key(atoms, coords, "basinhopping", {"seed": 1, "niter": 10, "cutoff": None})
+    assert key == cache_key(list(atoms), coords.copy(), "basinhopping", {"cutoff": None, "niter": 10, "seed": 1})
+    # Differences below the rounding tolerance keep the key
+    assert key == cache_key(atoms, coords + 1e-6, "basinhopping", {"seed": 1, "niter": 10, "cutoff": None})
+
+    # The result is returned in the atom order of the request, so the order is part of the key
+    order = [1, 0, 2]
+    assert cache_key(atoms, coords, "L-BFGS-B") != cache_key([atoms[k] for k in order], coords[order], "L-BFGS-B")
+    assert key != cache_key(atoms, coords, "basinhopping", {"seed": 2, "niter": 10, "cutoff": None})
+    assert key != cache_key(atoms, coords, "monte-carlo", {"seed": 1, "niter": 10, "cutoff": None})
+    assert key != cache_key(atoms, coords + 1e-3, "basinhopping", {"seed": 1, "niter": 10, "cutoff": None})
+
+
+def keys(count: int) -> list[str]:
+    atoms, coords = structure()
+    return [cache_key(atoms, coords + k, "L-BFGS-B") for k in range(count)]
+
+
+def test_memory_lru():
+    cache = ResultCache(directory=None, max_entries=2)
+    a, b, c = keys(3)
+    cache.put(a, {"energy": 1.0})
+    cache.put(b, {"energy": 2.0})
+    assert cache.get(a) == {"energy": 1.0}  # Now the most recently used
+    cache.put(c, {"energy": 3.0})
+    assert cache.get(b) is None
+    assert cache.get(a) == {"energy": 1.0} and cache.get(c) == {"energy": 3.0}
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_disk_ttl(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), ttl=60.0)
+    a, b = keys(2)
+    cache.put(a, {"energy": 1.0})
+    cache.put(b, {"energy": 2.0})
+    old = time.time() - 120.0
+    for key in (a, b):
+        os.utime(cache._path(key), (old, old))
+
+    # A new process only sees the disk tier: expired entries are misses and are removed
+    fresh = ResultCache(directory=str(tmp_path), ttl=60.0)
+    assert fresh.get(a) is None
+    assert not os.path.exists(cache._path(a))
+    fresh.trim()
+    assert not os.path.exists(cache._path(b))
+
+
+def test_disk_trim_removes_least_recently_used(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    entries = keys(4)
+    now = time.time()
+    for k, key in enumerate(entries):
+        cache.put(key, {"energy": float(k), "padding": "x" * 1000})
+        os.utime(cache._path(key), (now - 100 + k, now - 100 + k))
+    # Reading an entry from disk marks it as used
+    assert ResultCache(directory=str(tmp_path)).get(entries[0])["energy"] == 0.0
+
+    size = os.path.getsize(cache._path(entries[0]))
+    cache.max_bytes = 2 * size
+    cache.trim()
+    assert [os.path.exists(cache._path(key)) for key in entries] == [True, False, False, True]
+
+
+def test_unseeded_searches_are_not_cached(monkeypatch):
+    monkeypatch.setattr(optimizer, "result_cache", ResultCache(directory=None))
+    atoms, coords = structure()
+    for seed, cached in ((None, False), (1, True)):
+        options = {"nsteps": 20, "seed": seed}
+        optimizer.optimize_coordinates(atoms, coords, "monte-carlo", options=options)
+        assert optimizer.optimize_coordinates(atoms, coords, "monte-carlo", options=options).cached == cached
@@ -0,0 +1,44 @@
+# Packed binary structure format of the web API
+import struct
+import numpy as np
+import pytest
+from transport import pack_frames, unpack_frames
+
+
+def frames() -> list:
+    rng = np.random.default_rng(0)
+    return [(["Pd", "Pt", "Pd", "H"], rng.normal(size=(4, 3)) * 3.0, -12.5),
+            (["Au"] * 3, rng.normal(size=(3, 3)), None),
+            ([], np.zeros((0, 3)), 0.0)]
+
+
+def test_round_trip():
+    data = pack_frames(frames())
+    assert len(data) % 4 == 0
+    unpacked = unpack_frames(data)
+    assert len(unpacked) == 3
+    for (atoms, coords, energy), (atoms2, coords2, energy2) in zip(frames(), unpacked):
+        assert atoms2 == atoms and energy2 == energy
+        # Coordinates are stored as float32
+        np.testing.assert_allclose(coords2, coords, rtol=1e-6, atol=1e-6)
+    assert unpack_frames(pack_frames([])) == []
+
+
+def test_pack_rejects_invalid_structures():
+    with pytest.raises(ValueError):
+        pack_frames([(["Xyz"], np.zeros((1, 3)), None)])
+    with pytest.raises(ValueError):
+        pack_frames([(["Pd", "Pt"], np.zeros((1, 3)), None)])
+
+
+def test_unpack_rejects_malformed_input():
+    data = pack_frames(frames()[:2])
+    # Every truncation, trailing bytes, a wrong magic or version, and a bad species index
+    malformed = [data[:k] for k in range(len(data))] + [data + b"\0\0\0\0", b"XXXX" + data[4:],
+                                                         data[:4] + struct.pack("<H", 2) + data[6:]]
+    bad_index = bytearray(data)
+    bad_index[12 + 8 + 16] = 200  # After the header, 4 species and the first frame header
+    malformed.append(bytes(bad_index))
+    for payload in malformed:
+        with pytest.raises(ValueError):
+            unpack_frames(payload)